@@ -1,11 +1,15 @@
-import requests
 import sqlite3
 import logging
 from functools import wraps
-from flask import session, redirect, url_for, flash, request
+from flask import session, redirect, url_for, flash, request, jsonify
 
 from config import Config
 from database import get_db_connection
+from lazy import lazy_import
+
+# requests is the heaviest import in the app and only needed on /callback
+requests = lazy_import("requests")
+discord_client = lazy_import("discord_client")
 
 logger = logging.getLogger(__name__)
 
@@ -19,23 +23,23 @@ def require_login(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def require_admin(f):
+    """Restrict a JSON endpoint to the users listed in ADMIN_USER_IDS"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        user = session.get("user")
+        if not user or str(user.get("id")) not in Config.ADMIN_USER_IDS:
+            return jsonify({"error": "Forbidden"}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
 def authenticate_with_discord(code):
     """Handle Discord OAuth2 authentication"""
-    data = {
-        "client_id": Config.DISCORD_CLIENT_ID,
-        "client_secret": Config.DISCORD_CLIENT_SECRET,
-        "grant_type": "authorization_code", 
-        "code": code,
-        "redirect_uri": Config.DISCORD_REDIRECT_URI,
-        "scope": "identify guilds"
-    }
-
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    discord = discord_client.get_discord_client()
 
     try:
         # Get access token
-        token_res = requests.post(f"{Config.DISCORD_API_BASE}/oauth2/token", 
-                                data=data, headers=headers, timeout=10)
+        token_res = discord.exchange_code(code)
         
         if token_res.status_code != 200:
             logger.error(f"Token request failed: {token_res.status_code}")
@@ -48,16 +52,10 @@ def authenticate_with_discord(code):
             return None, "No access token received"
 
         # Get user info
-        user_res = requests.get(
-            f"{Config.DISCORD_API_BASE}/users/@me",
-            headers={"Authorization": f"Bearer {access_token}"},
-            timeout=10
-        )
+        user = discord.get_current_user(access_token)
 
-        if user_res.status_code != 200:
+        if user is None:
             return None, "Failed to fetch user info"
-
-        user = user_res.json()
         
         if not user.get("id") or not user.get("username"):
             return None, "Invalid user data received"
@@ -66,7 +64,10 @@ def authenticate_with_discord(code):
         try:
             conn = get_db_connection()
             c = conn.cursor()
-            c.execute("INSERT OR REPLACE INTO users (id, username, avatar, discriminator) VALUES (?, ?, ?, ?)",
+            # Upsert rather than REPLACE so verification and premium state survive a login
+            c.execute("""INSERT INTO users (id, username, avatar, discriminator) VALUES (?, ?, ?, ?)
+                         ON CONFLICT (id) DO UPDATE SET username = excluded.username,
+                           avatar = excluded.avatar, discriminator = excluded.discriminator""",
                       (user["id"], user["username"], user.get("avatar"), user.get("discriminator", "0000")))
             conn.commit()
         except sqlite3.Error as e:
@@ -0,0 +1,73 @@
+"""Measure autoresponder matching throughput in messages per second.
+
+    python -m benchmarks.autoresponder --triggers 5000 --messages 20000
+"""
+import sys
+import json
+import time
+import random
+import argparse
+
+from modules.autoresponder import AutoresponderEngine
+
+WORDS = ("buy sell trade account rank champion diamond plat gold price cheap boost help ticket vouch "
+         "legit scam middleman paypal crypto refund giveaway invite discord server rules verify "
+         "operator ash thermite jager skin black ice glacier elite renown credits level").split()
+
+def make_triggers(count, rng):
+    triggers = []
+    seen = set()
+    while len(triggers) < count:
+        phrase = " ".join(rng.sample(WORDS, rng.randint(1, 3))) + ("" if rng.random() < 0.7 else f" {rng.randint(1, 9999)}")
+        if phrase in seen:
+            continue
+        seen.add(phrase)
+        triggers.append({"id": len(triggers) + 1, "trigger_phrase": phrase, "response": f"reply {len(triggers)}",
+                         "embed": None, "case_sensitive": rng.random() < 0.1, "whole_word": rng.random() < 0.8})
+    return triggers
+
+def make_messages(count, rng):
+    return [" ".join(rng.choices(WORDS, k=rng.randint(5, 40))) for _ in range(count)]
+
+def naive_match(triggers, message):
+    """Baseline: test every trigger against the message"""
+    lowered = message.lower()
+    return [t["id"] for t in triggers
+            if (t["trigger_phrase"] in message if t["case_sensitive"] else t["trigger_phrase"].lower() in lowered)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Autoresponder matching throughput")
+    parser.add_argument("--triggers", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--skip-naive", action="store_true")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    triggers = make_triggers(args.triggers, rng)
+    messages = make_messages(args.messages, rng)
+
+    started = time.perf_counter()
+    engine = AutoresponderEngine(triggers)
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matches = sum(len(result) for result in engine.match_many(messages))
+    match_seconds = time.perf_counter() - started
+
+    results = {
+        "triggers": args.triggers, "messages": args.messages,
+        "build_ms": round(build_seconds * 1000, 2),
+        "engine_msgs_per_sec": round(args.messages / match_seconds, 1),
+        "matches": matches,
+    }
+    if not args.skip_naive:
+        sample = messages[:max(1, args.messages // 10)]
+        started = time.perf_counter()
+        for message in sample:
+            naive_match(triggers, message)
+        results["naive_msgs_per_sec"] = round(len(sample) / (time.perf_counter() - started), 1)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    sys.exit(main())
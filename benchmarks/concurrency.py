@@ -0,0 +1,143 @@
+"""Measure how many concurrent Discord logins one gunicorn worker sustains.
+
+Starts a single-worker gunicorn per worker class against a Discord stub with
+a fixed response delay, then ramps the number of simultaneous /callback
+logins and reports throughput and latency at each level:
+
+    python -m benchmarks.concurrency --discord-latency 0.2 --out logins.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import requests
+
+from benchmarks.load import summarize
+from benchmarks.seed import seed_database
+from benchmarks.stub_discord import StubDiscord
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class GunicornServer:
+    """One gunicorn worker of the given class, configured from gunicorn.conf.py"""
+
+    def __init__(self, worker_class, threads, db_path, discord_base):
+        self.port = _free_port()
+        env = dict(os.environ, PORT=str(self.port), WEB_CONCURRENCY="1",
+                   GUNICORN_WORKER_CLASS=worker_class, GUNICORN_THREADS=str(threads),
+                   DATABASE_PATH=db_path, DISCORD_API_BASE=discord_base,
+                   DISCORD_CLIENT_ID="bench", DISCORD_CLIENT_SECRET="bench",
+                   DISCORD_REDIRECT_URI="http://localhost/callback",
+                   SLOW_REQUEST_MS="600000", GIVEAWAY_SCHEDULER="0",
+                   RATE_LIMIT_ENABLED="0")
+        env.pop("DB_POOL_SIZE", None)
+        self.cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                    "--bind", f"127.0.0.1:{self.port}", "--log-level", "warning"]
+        self.env = env
+        self.process = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.cmd, cwd=ROOT, env=self.env)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                requests.get(self.base_url + "/", timeout=1)
+                return self
+            except requests.RequestException:
+                time.sleep(0.1)
+        self.process.kill()
+        raise RuntimeError("gunicorn did not start")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+def run_level(base_url, concurrency, rounds, user_ids):
+    """Fire concurrency simultaneous logins, rounds times, and summarize them"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency)
+
+    def client(index):
+        session = requests.Session()
+        for round_number in range(rounds):
+            user_id = user_ids[(round_number * concurrency + index) % len(user_ids)]
+            barrier.wait()
+            t0 = time.perf_counter()
+            try:
+                response = session.get(f"{base_url}/callback", params={"code": user_id},
+                                       allow_redirects=False, timeout=60)
+                ok = response.status_code == 302
+            except requests.RequestException:
+                ok = False
+            with lock:
+                if ok:
+                    latencies.append(time.perf_counter() - t0)
+                else:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for c in clients:
+        c.start()
+    for c in clients:
+        c.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+def capacity(levels, slo_ms):
+    """Highest concurrency whose p95 stays within slo_ms without errors"""
+    passing = [level for level, result in levels.items()
+               if not result["errors"] and result["p95_ms"] <= slo_ms]
+    return max(passing, default=0)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--worker-classes", nargs="+", default=["sync", "gthread"])
+    parser.add_argument("--threads", type=int, default=8, help="Threads per gthread worker")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--rounds", type=int, default=5, help="Logins per client at each level")
+    parser.add_argument("--discord-latency", type=float, default=0.2, help="Stub Discord response delay")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--out", help="Write JSON results to this file")
+    args = parser.parse_args(argv)
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="iceai-bench-"), "bench.db")
+    user_ids, _ = seed_database(db_path, args.users)
+    # A login makes two Discord round trips; allow as much again for queueing
+    slo_ms = args.discord_latency * 2 * 1000 * 2
+
+    results = {"meta": {"discord_latency": args.discord_latency, "threads": args.threads,
+                        "rounds": args.rounds, "slo_p95_ms": slo_ms}}
+    with StubDiscord(latency=args.discord_latency) as discord:
+        for worker_class in args.worker_classes:
+            with GunicornServer(worker_class, args.threads, db_path, discord.base_url) as server:
+                levels = {level: run_level(server.base_url, level, args.rounds, user_ids)
+                          for level in args.levels}
+            results[worker_class] = {"levels": levels, "max_concurrent_logins": capacity(levels, slo_ms)}
+            print(f"{worker_class:<8} max concurrent logins within p95 {slo_ms:.0f}ms: "
+                  f"{results[worker_class]['max_concurrent_logins']}", file=sys.stderr)
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+if __name__ == "__main__":
+    main()
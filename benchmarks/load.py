@@ -0,0 +1,136 @@
+import time
+import random
+import threading
+from itertools import count
+
+import requests
+from werkzeug.serving import make_server
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies, errors, elapsed):
+    """Reduce raw latencies (seconds) into the JSON result shape"""
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0,
+    }
+
+def build_scenarios(user_ids, seed=99):
+    """Endpoint name -> callable(client, user_id) producing (method, path, json body)"""
+    rng = random.Random(seed)
+    ranks = ["Gold", "Platinum", "Diamond"]
+    return {
+        "dashboard": lambda: ("GET", "/dashboard", None),
+        "marketplace_feed": lambda: ("GET", "/api/marketplace/accounts", None),
+        "marketplace_filtered": lambda: ("GET", f"/api/marketplace/accounts?rank={rng.choice(ranks)}&sort=price_asc", None),
+        "create_vouch": lambda: ("POST", "/api/vouches/create",
+                                 {"target": rng.choice(user_ids), "message": "bench", "rating": rng.randint(1, 5)}),
+        "create_ticket": lambda: ("POST", "/api/tickets/create",
+                                  {"type": "support", "subject": "bench", "description": "bench"}),
+        "create_listing": lambda: ("POST", "/api/marketplace/accounts",
+                                   {"title": "Bench account", "rank": rng.choice(ranks), "level": 100, "price": 25}),
+    }
+
+def run_test_client(app, user_ids, requests_per_endpoint):
+    """Drive each scenario sequentially through Flask's test client (no network)"""
+    results = {}
+    scenarios = build_scenarios(user_ids)
+    client = app.test_client()
+    for name, scenario in scenarios.items():
+        latencies = []
+        errors = 0
+        started = time.perf_counter()
+        for i in range(requests_per_endpoint):
+            with client.session_transaction() as sess:
+                sess["user"] = {"id": user_ids[i % len(user_ids)], "username": "bench"}
+            method, path, body = scenario()
+            t0 = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            elapsed = time.perf_counter() - t0
+            if response.status_code >= 400:
+                errors += 1
+            else:
+                latencies.append(elapsed)
+        results[name] = summarize(latencies, errors, time.perf_counter() - started)
+    return results
+
+class LiveServer:
+    """Serve the app over real HTTP from a background thread"""
+
+    def __init__(self, app, threaded=True):
+        self.server = make_server("127.0.0.1", 0, app, threaded=threaded)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+
+def login_sessions(base_url, user_ids):
+    """Log virtual users in through /callback (backed by the Discord stub)"""
+    sessions = []
+    for user_id in user_ids:
+        session = requests.Session()
+        response = session.get(f"{base_url}/callback", params={"code": user_id}, allow_redirects=False)
+        if response.status_code != 302 or "session" not in session.cookies:
+            raise RuntimeError(f"Login failed for {user_id}: {response.status_code}")
+        sessions.append(session)
+    return sessions
+
+def run_http_load(base_url, sessions, user_ids, threads, duration):
+    """Hammer every scenario from many threads for duration seconds over HTTP"""
+    scenarios = build_scenarios(user_ids)
+    results = {}
+    for name, scenario in scenarios.items():
+        latencies = []
+        errors = [0]
+        lock = threading.Lock()
+        ticket = count()
+        deadline = time.perf_counter() + duration
+
+        def worker():
+            local = []
+            local_errors = 0
+            while time.perf_counter() < deadline:
+                session = sessions[next(ticket) % len(sessions)]
+                method, path, body = scenario()
+                t0 = time.perf_counter()
+                try:
+                    response = session.request(method, base_url + path, json=body, allow_redirects=False)
+                    ok = response.status_code < 400
+                except requests.RequestException:
+                    ok = False
+                if ok:
+                    local.append(time.perf_counter() - t0)
+                else:
+                    local_errors += 1
+            with lock:
+                latencies.extend(local)
+                errors[0] += local_errors
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        results[name] = summarize(latencies, errors[0], time.perf_counter() - started)
+    return results
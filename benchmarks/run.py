@@ -0,0 +1,107 @@
+"""Seed a synthetic database and benchmark the app against it.
+
+    python -m benchmarks.run --scale small --out bench.json
+    python -m benchmarks.run --compare before.json after.json
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+
+from config import Config
+from benchmarks.seed import SCALES, seed_database
+from benchmarks.stub_discord import StubDiscord
+from benchmarks.load import run_test_client, LiveServer, login_sessions, run_http_load
+
+logger = logging.getLogger(__name__)
+
+def run(args):
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="iceai-bench-"), "bench.db")
+    users = args.users or SCALES[args.scale]
+
+    seed_started = time.perf_counter()
+    user_ids, counts = seed_database(db_path, users, seed=args.seed)
+    seed_seconds = time.perf_counter() - seed_started
+
+    with StubDiscord(latency=args.discord_latency) as discord:
+        Config.DISCORD_API_BASE = discord.base_url
+        Config.DISCORD_CLIENT_ID = Config.DISCORD_CLIENT_ID or "bench"
+        Config.DISCORD_CLIENT_SECRET = Config.DISCORD_CLIENT_SECRET or "bench"
+        Config.DISCORD_REDIRECT_URI = Config.DISCORD_REDIRECT_URI or "http://localhost/callback"
+        # Every virtual user shares one IP and hammers the write endpoints
+        Config.RATE_LIMIT_ENABLED = False
+
+        from main import create_app
+        app = create_app()
+        app.logger.setLevel(logging.WARNING)
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        logging.getLogger("slow_requests").setLevel(logging.ERROR)
+
+        results = {
+            "meta": {
+                "scale": args.scale, "users": users, "rows": counts, "seed": args.seed,
+                "seed_seconds": round(seed_seconds, 2), "threads": args.threads,
+                "duration": args.duration, "python": platform.python_version(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "test_client": run_test_client(app, user_ids, args.requests),
+        }
+
+        if not args.skip_http:
+            with LiveServer(app) as server:
+                sessions = login_sessions(server.base_url, user_ids[:args.sessions])
+                results["http"] = run_http_load(server.base_url, sessions, user_ids,
+                                                args.threads, args.duration)
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+def compare(before_path, after_path):
+    """Print per-endpoint p50/p95/p99 and throughput deltas between two result files"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    for mode in ("test_client", "http"):
+        if mode not in before or mode not in after:
+            continue
+        print(f"[{mode}]")
+        for endpoint in sorted(set(before[mode]) & set(after[mode])):
+            old, new = before[mode][endpoint], after[mode][endpoint]
+            cells = []
+            for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+                delta = (new[key] - old[key]) / old[key] * 100 if old[key] else 0
+                cells.append(f"{key}={new[key]:.2f} ({delta:+.1f}%)")
+            print(f"  {endpoint:<22} " + "  ".join(cells))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="IceAI Dashboard benchmark and load test")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--users", type=int, help="Override the number of seeded users")
+    parser.add_argument("--db", help="Database path (defaults to a temporary file)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--requests", type=int, default=500, help="Test-client requests per endpoint")
+    parser.add_argument("--threads", type=int, default=8, help="HTTP load generator threads")
+    parser.add_argument("--sessions", type=int, default=50, help="Logged-in virtual users for HTTP load")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of HTTP load per endpoint")
+    parser.add_argument("--discord-latency", type=float, default=0.0, help="Stub Discord response delay")
+    parser.add_argument("--skip-http", action="store_true", help="Only run the test-client pass")
+    parser.add_argument("--out", help="Write JSON results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import random
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+
+from config import Config
+from database import init_db
+
+logger = logging.getLogger(__name__)
+
+SCALES = {"small": 1000, "medium": 10000, "large": 100000}
+
+RANKS = ["Copper", "Bronze", "Silver", "Gold", "Platinum", "Emerald", "Diamond", "Champion"]
+OPERATORS = ["Ash", "Thermite", "Jager", "Bandit", "Sledge", "Thatcher", "Doc", "Rook", "Caveira",
+             "Valkyrie", "Frost", "Mira", "Jackal", "Ela", "Zofia", "Vigil", "Maverick", "Kali", "Iana"]
+SKINS = ["Black Ice", "Glacier", "Dust Line", "Pro League", "Elite", "Seasonal", "Alpha Pack"]
+
+def _timestamp(rng, now):
+    return (now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))).strftime("%Y-%m-%d %H:%M:%S")
+
+def _heavy_tail(rng, alpha, cap):
+    """Pareto-distributed count: most users have few rows, a handful have many"""
+    return min(cap, int(rng.paretovariate(alpha)) - 1)
+
+def seed_database(path, users, seed=1234, batch_size=5000):
+    """Create the real schema at path and fill it with synthetic users and activity"""
+    Config.DATABASE_PATH = path
+    init_db()
+
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1)
+    user_ids = [str(100000000000000000 + i) for i in range(users)]
+    conn = sqlite3.connect(path)
+    counts = {}
+
+    def insert(table, sql, rows):
+        batch = []
+        total = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.executemany(sql, batch)
+                total += len(batch)
+                batch.clear()
+        if batch:
+            conn.executemany(sql, batch)
+            total += len(batch)
+        conn.commit()
+        counts[table] = total
+
+    insert("users", "INSERT OR IGNORE INTO users (id, username, avatar, discriminator, created_at) VALUES (?, ?, ?, ?, ?)",
+           ((uid, f"user{uid[-6:]}", None, "0000", _timestamp(rng, now)) for uid in user_ids))
+
+    def vouches():
+        for target in user_ids:
+            for _ in range(_heavy_tail(rng, 1.3, 500)):
+                yield (rng.choice(user_ids), target, "Smooth trade, would recommend",
+                       rng.choices([5, 4, 3, 2, 1], weights=[70, 18, 6, 3, 3])[0],
+                       rng.choice(["account", "boost", "coaching"]), rng.choice(RANKS),
+                       round(rng.uniform(5, 300), 2), rng.choice(["paypal", "crypto", "cashapp"]),
+                       _timestamp(rng, now))
+    insert("vouches", """INSERT INTO vouches (user_id, target_user_id, message, rating, trade_type,
+                         account_rank, price, payment_method, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+           vouches())
+
+    def tickets():
+        for uid in user_ids:
+            for _ in range(rng.choices([0, 1, 2, 5], weights=[60, 25, 10, 5])[0]):
+                yield (uid, rng.choice(["support", "report", "purchase"]), "Need help with an order",
+                       "Details about the issue", rng.choice(["open", "closed", "closed", "pending"]),
+                       _timestamp(rng, now))
+    insert("tickets", """INSERT INTO tickets (user_id, ticket_type, subject, description, status, created_at)
+                         VALUES (?, ?, ?, ?, ?, ?)""", tickets())
+
+    def listings():
+        for uid in rng.sample(user_ids, max(1, users // 5)):
+            for _ in range(_heavy_tail(rng, 1.2, 200) + 1):
+                ops = rng.sample(OPERATORS, 3)
+                yield (uid, f"{rng.choice(RANKS)} account with {' '.join(ops)} {rng.choice(SKINS)}",
+                       rng.choice(RANKS), rng.randint(20, 400), rng.randint(10, 70), rng.randint(0, 500000),
+                       rng.randint(0, 5000), round(rng.uniform(5, 500), 2),
+                       f"Includes {rng.choice(SKINS)} skins for {', '.join(ops)}",
+                       rng.choices(["available", "sold", "pending"], weights=[85, 12, 3])[0],
+                       _timestamp(rng, now))
+    insert("r6_accounts", """INSERT INTO r6_accounts (seller_id, title, rank, level, operators_count, renown,
+                             r6_credits, price, description, status, created_at)
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", listings())
+
+    def invites():
+        code = 0
+        for uid in rng.sample(user_ids, max(1, users * 3 // 10)):
+            for _ in range(_heavy_tail(rng, 1.5, 1000) + 1):
+                code += 1
+                yield (uid, rng.choice(user_ids), f"inv{code}", _timestamp(rng, now))
+    insert("invites", "INSERT INTO invites (inviter_id, invited_id, invite_code, created_at) VALUES (?, ?, ?, ?)",
+           invites())
+
+    conn.execute("ANALYZE")
+    conn.close()
+    logger.info(f"Seeded {path}: {counts}")
+    return user_ids, counts
@@ -0,0 +1,113 @@
+import json
+import time
+import threading
+from collections import Counter
+from urllib.parse import parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Minimal Discord OAuth2 stand-in: the code doubles as token and user id"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _injected_failure(self, endpoint):
+        """Count the call and send the next queued failure for endpoint, if any"""
+        with self.server.lock:
+            self.server.calls[endpoint] += 1
+            queued = self.server.failures.get(endpoint)
+            failure = queued.pop(0) if queued else None
+        if failure is None:
+            return None
+        status, headers = failure
+        payload = json.dumps({"message": "stub failure", "retry_after": 0}).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        return status
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        if self.path.rstrip("/").endswith("/oauth2/token") and form.get("code"):
+            code = form["code"][0]
+            if self.server.single_use_codes:
+                with self.server.lock:
+                    reused = code in self.server.used_codes
+                    self.server.used_codes.add(code)
+                if reused:
+                    self.server.calls["/oauth2/token"] += 1
+                    return self._send(400, {"error": "invalid_grant"})
+            status = self._injected_failure("/oauth2/token")
+            if status is not None:
+                # Rate limits are refused up front; anything else happened after the code was used
+                if status == 429:
+                    with self.server.lock:
+                        self.server.used_codes.discard(code)
+                return
+            time.sleep(self.server.latency)
+            return self._send(200, {"access_token": code, "token_type": "Bearer"})
+        self._send(400, {"error": "invalid_request"})
+
+    def do_GET(self):
+        auth = self.headers.get("Authorization", "")
+        if self.path.rstrip("/").endswith("/users/@me") and auth.startswith("Bearer "):
+            if self._injected_failure("/users/@me") is not None:
+                return
+            time.sleep(self.server.latency)
+            user_id = auth.split(" ", 1)[1]
+            return self._send(200, {"id": user_id, "username": f"bench-{user_id}", "discriminator": "0000"})
+        self._send(401, {"message": "401: Unauthorized"})
+
+class StubDiscord:
+    """Local Discord API stub served from a background thread
+
+    With single_use_codes, a reused authorization code gets invalid_grant as
+    from Discord. fail() queues error responses for an endpoint and calls
+    counts requests per endpoint.
+    """
+
+    def __init__(self, latency=0.0, single_use_codes=False):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.server.single_use_codes = single_use_codes
+        self.server.used_codes = set()
+        self.server.failures = {}
+        self.server.calls = Counter()
+        self.server.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def calls(self):
+        return self.server.calls
+
+    def fail(self, endpoint, status, times=1, headers=None):
+        """Answer the next times requests to endpoint ("/oauth2/token" or "/users/@me") with status"""
+        with self.server.lock:
+            self.server.failures.setdefault(endpoint, []).extend([(status, headers or {})] * times)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/api"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
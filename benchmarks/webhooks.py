@@ -0,0 +1,158 @@
+"""Replay and throughput test for the SellHub webhook against a local sender.
+
+Signs a mix of listing-sale and premium events, delivers each one several
+times in shuffled order from many threads (as SellHub does when it retries),
+sprinkles in forged signatures, then waits for the background processor and
+checks every event was applied exactly once:
+
+    python -m benchmarks.webhooks --events 2000 --replays 3 --out webhooks.json
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+
+import requests
+
+from config import Config
+from benchmarks.load import summarize, LiveServer
+from benchmarks.seed import seed_database
+
+SECRET = "bench-webhook-secret"
+
+def build_deliveries(conn, events, replays, forged, rng):
+    """Signed request bodies for events (each repeated replays times) plus forged ones"""
+    listing_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM r6_accounts WHERE status = 'available' ORDER BY random() LIMIT ?", (events // 2,))]
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users LIMIT ?", (events,))]
+
+    bodies = []
+    for i in range(events):
+        if i < len(listing_ids):
+            data = {"custom_fields": {"listing_id": str(listing_ids[i])}}
+        else:
+            data = {"custom_fields": {"discord_id": user_ids[i % len(user_ids)]}, "premium_days": 30}
+        bodies.append(json.dumps({"id": f"evt_{i}", "event": "order.completed", "data": data}).encode())
+
+    deliveries = []
+    for body in bodies:
+        signature = hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+        deliveries.extend([(body, signature, True)] * replays)
+    for i in range(forged):
+        deliveries.append((json.dumps({"id": f"forged_{i}", "event": "order.completed"}).encode(), "0" * 64, False))
+    rng.shuffle(deliveries)
+    return deliveries, len(listing_ids)
+
+def send_all(base_url, deliveries, threads):
+    """Deliver everything from threads senders; returns (summary, unexpected statuses)"""
+    latencies = []
+    unexpected = []
+    errors = [0]
+    lock = threading.Lock()
+    position = iter(range(len(deliveries)))
+
+    def sender():
+        session = requests.Session()
+        local = []
+        while True:
+            with lock:
+                index = next(position, None)
+            if index is None:
+                break
+            body, signature, valid = deliveries[index]
+            t0 = time.perf_counter()
+            response = session.post(f"{base_url}/webhooks/sellhub", data=body,
+                                    headers={"Content-Type": "application/json",
+                                             Config.SELLHUB_SIGNATURE_HEADER: signature})
+            elapsed = time.perf_counter() - t0
+            if response.status_code != (200 if valid else 401):
+                with lock:
+                    unexpected.append(response.status_code)
+                    errors[0] += 1
+            else:
+                local.append(elapsed)
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    senders = [threading.Thread(target=sender) for _ in range(threads)]
+    for s in senders:
+        s.start()
+    for s in senders:
+        s.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started), unexpected
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=2000, help="Unique events to deliver")
+    parser.add_argument("--replays", type=int, default=3, help="Deliveries per event")
+    parser.add_argument("--forged", type=int, default=100, help="Deliveries with a bad signature")
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent senders")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for processing")
+    parser.add_argument("--out", help="Write JSON results to this file")
+    args = parser.parse_args(argv)
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="iceai-bench-"), "bench.db")
+    seed_database(db_path, args.users)
+    Config.SELLHUB_SECRET = SECRET
+    Config.RATE_LIMIT_ENABLED = False
+    Config.DISCORD_CLIENT_ID = Config.DISCORD_CLIENT_ID or "bench"
+    Config.DISCORD_CLIENT_SECRET = Config.DISCORD_CLIENT_SECRET or "bench"
+    Config.DISCORD_REDIRECT_URI = Config.DISCORD_REDIRECT_URI or "http://localhost/callback"
+
+    from main import create_app
+    app = create_app()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    logging.getLogger("webhooks").setLevel(logging.ERROR)
+
+    conn = sqlite3.connect(db_path)
+    deliveries, listing_events = build_deliveries(conn, args.events, args.replays, args.forged,
+                                                  random.Random(7))
+    sold_before = conn.execute("SELECT COUNT(*) FROM r6_accounts WHERE status = 'sold'").fetchone()[0]
+
+    with LiveServer(app) as server:
+        acks, unexpected = send_all(server.base_url, deliveries, args.threads)
+        acked_at = time.perf_counter()
+        deadline = acked_at + args.timeout
+        while time.perf_counter() < deadline:
+            if not conn.execute("SELECT 1 FROM webhook_events WHERE status = 'pending' LIMIT 1").fetchone():
+                break
+            time.sleep(0.05)
+        drain_seconds = time.perf_counter() - acked_at
+
+    statuses = dict(conn.execute("SELECT status, COUNT(*) FROM webhook_events GROUP BY status").fetchall())
+    sold = conn.execute("SELECT COUNT(*) FROM r6_accounts WHERE status = 'sold'").fetchone()[0] - sold_before
+    checks = {
+        "events_recorded_once": sum(statuses.values()) == args.events,
+        "all_processed": statuses.get("processed", 0) == args.events,
+        "listings_sold_once": sold == listing_events,
+        "forged_rejected": not unexpected,
+    }
+    results = {
+        "meta": {"events": args.events, "replays": args.replays, "forged": args.forged,
+                 "threads": args.threads},
+        "acks": acks,
+        "drain_seconds": round(drain_seconds, 3),
+        "event_statuses": statuses,
+        "checks": checks,
+    }
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    if not all(checks.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
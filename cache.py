@@ -0,0 +1,80 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class TTLCache:
+    """Bounded in-process cache with per-key TTL and LRU eviction"""
+
+    def __init__(self, name, maxsize, ttl):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidations": 0}
+
+    def get(self, key, default=None):
+        """Get a live entry, counting the lookup as a hit or miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.stats["misses"] += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store an entry, evicting the least recently used ones when full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def delete(self, *keys):
+        """Invalidate specific keys"""
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, _MISSING) is not _MISSING:
+                    self.stats["invalidations"] += 1
+
+    def clear(self):
+        """Invalidate every key"""
+        with self._lock:
+            self.stats["invalidations"] += len(self._data)
+            self._data.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({"size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl})
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0
+        return stats
+
+# Per-user dashboard stats, invalidated per user by the write paths
+stats_cache = TTLCache("user_stats", Config.CACHE_MAX_ENTRIES, Config.STATS_CACHE_TTL)
+
+# Marketplace listing feed, invalidated globally whenever a listing is created
+listings_cache = TTLCache("listings", Config.CACHE_MAX_ENTRIES, Config.LISTINGS_CACHE_TTL)
+
+def get_cache_stats():
+    """Get hit/miss counters for every read cache"""
+    return {cache.name: cache.get_stats() for cache in (stats_cache, listings_cache)}
@@ -8,9 +8,95 @@ class Config:
     DISCORD_CLIENT_ID = os.getenv("DISCORD_CLIENT_ID")
     DISCORD_CLIENT_SECRET = os.getenv("DISCORD_CLIENT_SECRET") 
     DISCORD_REDIRECT_URI = os.getenv("DISCORD_REDIRECT_URI")
-    DISCORD_API_BASE = "https://discord.com/api"
+    DISCORD_API_BASE = os.getenv("DISCORD_API_BASE", "https://discord.com/api")
+    DISCORD_HTTP_TIMEOUT = float(os.getenv("DISCORD_HTTP_TIMEOUT", "10"))
+    DISCORD_MAX_RETRIES = int(os.getenv("DISCORD_MAX_RETRIES", "3"))
+    DISCORD_MAX_RETRY_WAIT = float(os.getenv("DISCORD_MAX_RETRY_WAIT", "5"))
+    DISCORD_POOL_SIZE = int(os.getenv("DISCORD_POOL_SIZE", "10"))
+    DISCORD_USER_CACHE_TTL = float(os.getenv("DISCORD_USER_CACHE_TTL", "30"))
     SELLHUB_SECRET = os.getenv("SELLHUB_SECRET", "")
     
+    # Database Configuration
+    DATABASE_PATH = os.getenv("DATABASE_PATH", "iceai.db")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+    DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+    DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+    DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+    DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "1") == "1"
+    
+    # Write-behind group commit for vouch and ticket inserts
+    WRITE_BEHIND = os.getenv("WRITE_BEHIND", "0") == "1"
+    WRITE_QUEUE_SIZE = int(os.getenv("WRITE_QUEUE_SIZE", "1000"))
+    WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "100"))
+    WRITE_LINGER_MS = float(os.getenv("WRITE_LINGER_MS", "5"))
+    WRITE_QUEUE_PUT_TIMEOUT = float(os.getenv("WRITE_QUEUE_PUT_TIMEOUT", "2"))
+    WRITE_RESULT_TIMEOUT = float(os.getenv("WRITE_RESULT_TIMEOUT", "10"))
+    
+    # Read Cache Configuration (seconds)
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "30"))
+    LISTINGS_CACHE_TTL = float(os.getenv("LISTINGS_CACHE_TTL", "10"))
+    
+    # Marketplace search: newest N matches are ranked per query
+    SEARCH_CANDIDATE_LIMIT = int(os.getenv("SEARCH_CANDIDATE_LIMIT", "5000"))
+    
+    # Bulk listing import
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+    IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "50000"))
+    IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+    
+    # Metrics and slow-request logging
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+    SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+    
+    # Autoresponder engine
+    AUTORESPONDER_CHECK_INTERVAL = float(os.getenv("AUTORESPONDER_CHECK_INTERVAL", "1"))
+    AUTORESPONDER_MAX_BATCH = int(os.getenv("AUTORESPONDER_MAX_BATCH", "1000"))
+    
+    # Streaming exports
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+    
+    # Background threads (giveaway scheduler, webhook processor); gunicorn.conf.py
+    # turns this off when preloading and starts them in each forked worker instead
+    START_BACKGROUND_WORKERS = os.getenv("START_BACKGROUND_WORKERS", "1") == "1"
+    
+    # Giveaway scheduler
+    GIVEAWAY_SCHEDULER = os.getenv("GIVEAWAY_SCHEDULER", "1") == "1"
+    GIVEAWAY_RESYNC_INTERVAL = float(os.getenv("GIVEAWAY_RESYNC_INTERVAL", "60"))
+    GIVEAWAY_FETCH_SIZE = int(os.getenv("GIVEAWAY_FETCH_SIZE", "1000"))
+    
+    # Settings cache
+    SETTINGS_CHECK_INTERVAL = float(os.getenv("SETTINGS_CHECK_INTERVAL", "1"))
+    ADMIN_USER_IDS = {user_id.strip() for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()}
+    
+    # Listing images
+    IMAGE_STORAGE_PATH = os.getenv("IMAGE_STORAGE_PATH", "media")
+    IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(5 * 1024 * 1024)))
+    IMAGE_MAX_PER_LISTING = int(os.getenv("IMAGE_MAX_PER_LISTING", "10"))
+    IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+    
+    # Rate limiting (endpoint:scope=count/period, see ratelimit.parse_rules)
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+    RATE_LIMITS = os.getenv("RATE_LIMITS", "callback:ip=10/minute,"
+                            "create_vouch:user=10/minute,create_vouch:ip=30/minute,"
+                            "create_ticket:user=5/minute,create_ticket:ip=20/minute,"
+                            "import_marketplace_accounts:user=5/hour,"
+                            "upload_listing_images:user=30/hour,"
+                            "enter_giveaway:user=30/minute")
+    RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "memory")
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    RATE_LIMIT_MAX_IDLE = float(os.getenv("RATE_LIMIT_MAX_IDLE", "86400"))
+    RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+    
+    # SellHub webhooks
+    SELLHUB_SIGNATURE_HEADER = os.getenv("SELLHUB_SIGNATURE_HEADER", "X-Signature")
+    SELLHUB_PREMIUM_DAYS = int(os.getenv("SELLHUB_PREMIUM_DAYS", "30"))
+    WEBHOOK_MAX_BYTES = int(os.getenv("WEBHOOK_MAX_BYTES", "65536"))
+    WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "200"))
+    WEBHOOK_POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL", "2"))
+    
     @classmethod
     def validate(cls):
         """Validate required environment variables"""
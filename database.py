@@ -1,60 +1,224 @@
+import os
+import time
+import queue
 import sqlite3
 import logging
+import threading
+
+from flask import g, has_app_context
+
+from config import Config
+from metrics import observe_query
+import migrations
 
 logger = logging.getLogger(__name__)
 
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that times every statement it executes"""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            observe_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            observe_query(sql, time.perf_counter() - started)
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose statements are timed and grouped by normalized SQL"""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def open_connection(path=None, factory=TracedConnection):
+    """Open a standalone SQLite connection with WAL and tuned pragmas"""
+    conn = sqlite3.connect(path or Config.DATABASE_PATH, factory=factory,
+                           timeout=Config.DB_BUSY_TIMEOUT_MS / 1000,
+                           check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(Config.DB_BUSY_TIMEOUT_MS)}")
+    conn.execute(f"PRAGMA cache_size=-{int(Config.DB_CACHE_SIZE_KB)}")
+    conn.execute(f"PRAGMA mmap_size={int(Config.DB_MMAP_SIZE)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+class PooledConnection(TracedConnection):
+    """SQLite connection that returns itself to its pool instead of closing"""
+    pool = None
+    bound = False
+
+    def close(self):
+        if self.pool is None:
+            return super().close()
+        # Connections bound to an app context are released at teardown
+        if self.bound:
+            return
+        self.pool.release(self)
+
+    def really_close(self):
+        super().close()
+
+class ConnectionPool:
+    """Per-process pool of tuned, long-lived SQLite connections"""
+
+    def __init__(self, path, size, timeout):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self.stats = {"hits": 0, "misses": 0, "waits": 0, "timeouts": 0, "discarded": 0}
+
+    def _connect(self):
+        conn = open_connection(self.path, factory=PooledConnection)
+        conn.pool = self
+        return conn
+
+    def acquire(self):
+        """Take an idle connection, open a new one, or wait for a release"""
+        try:
+            conn = self._idle.get_nowait()
+            self._count("hits")
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            self._count("misses")
+            try:
+                return self._connect()
+            except sqlite3.Error:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        self._count("waits")
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            self._count("timeouts")
+            raise sqlite3.OperationalError("Timed out waiting for a pooled database connection")
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction"""
+        conn.bound = False
+        if self.pid != os.getpid():
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding broken pooled connection: {e}")
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    def _discard(self, conn):
+        self._count("discarded")
+        with self._lock:
+            self._created -= 1
+        try:
+            conn.really_close()
+        except sqlite3.Error:
+            pass
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({"size": self.size, "open": self._created, "idle": self._idle.qsize()})
+        return stats
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Get the connection pool for the current process"""
+    global _pool
+    pid = os.getpid()
+    if _pool is None or _pool.pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool.pid != pid:
+                # Connections inherited across fork must never be reused
+                _pool = ConnectionPool(Config.DATABASE_PATH, Config.DB_POOL_SIZE, Config.DB_POOL_TIMEOUT)
+    return _pool
+
+def get_pool_stats():
+    """Get connection pool hit/miss/wait counters"""
+    return get_pool().get_stats()
+
 def get_db_connection():
     """Get database connection with error handling"""
     try:
-        conn = sqlite3.connect('iceai.db')
-        conn.row_factory = sqlite3.Row
-        return conn
+        if has_app_context():
+            conn = g.get("_db_conn")
+            if conn is None:
+                conn = get_pool().acquire()
+                conn.bound = True
+                g._db_conn = conn
+            return conn
+        return get_pool().acquire()
     except sqlite3.Error as e:
         logger.error(f"Database connection error: {e}")
         raise
 
+def close_db(exception=None):
+    """Release the app context's connection back to the pool"""
+    conn = g.pop("_db_conn", None)
+    if conn is not None and conn.pool is not None:
+        conn.pool.release(conn)
+
+def init_app(app):
+    """Tie pooled connections to the Flask app context lifecycle"""
+    app.teardown_appcontext(close_db)
+
 def init_db():
-    """Initialize database with all required tables"""
+    """Bring the database schema up to date, skipping all DDL when current"""
+    conn = None
     try:
-        conn = sqlite3.connect('iceai.db')
-        c = conn.cursor()
-        
-        # Users table
-        c.execute('''CREATE TABLE IF NOT EXISTS users
-                     (id TEXT PRIMARY KEY, username TEXT, avatar TEXT, discriminator TEXT,
-                      verified INTEGER DEFAULT 0, verification_code TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-        
-        # Vouches table
-        c.execute('''CREATE TABLE IF NOT EXISTS vouches
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, target_user_id TEXT,
-                      message TEXT, rating INTEGER CHECK(rating >= 1 AND rating <= 5), 
-                      trade_type TEXT, account_rank TEXT, price REAL CHECK(price >= 0), 
-                      payment_method TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                      FOREIGN KEY(user_id) REFERENCES users(id))''')
-        
-        # Tickets table
-        c.execute('''CREATE TABLE IF NOT EXISTS tickets
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, ticket_type TEXT,
-                      status TEXT DEFAULT 'open' CHECK(status IN ('open', 'closed', 'pending')), 
-                      subject TEXT NOT NULL, description TEXT NOT NULL,
-                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, closed_at TIMESTAMP,
-                      FOREIGN KEY(user_id) REFERENCES users(id))''')
-        
-        # R6 Accounts table
-        c.execute('''CREATE TABLE IF NOT EXISTS r6_accounts
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT, seller_id TEXT, title TEXT NOT NULL,
-                      rank TEXT, level INTEGER CHECK(level >= 0), operators_count INTEGER CHECK(operators_count >= 0), 
-                      renown INTEGER CHECK(renown >= 0), r6_credits INTEGER CHECK(r6_credits >= 0), 
-                      price REAL CHECK(price >= 0), description TEXT, 
-                      status TEXT DEFAULT 'available' CHECK(status IN ('available', 'sold', 'pending')),
-                      images TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                      FOREIGN KEY(seller_id) REFERENCES users(id))''')
-        
-        # Additional tables (keeping essential ones only for space)
-        _create_additional_tables(c)
-        
-        conn.commit()
-        logger.info("Database initialized successfully")
+        conn = sqlite3.connect(Config.DATABASE_PATH)
+        if migrations.is_current(conn):
+            logger.info(f"Database schema is current (v{migrations.LATEST_VERSION})")
+            return
+
+        if not Config.DB_AUTO_MIGRATE:
+            logger.warning("Database schema is out of date; run `python manage.py migrate`")
+            return
+
+        applied = migrations.migrate(conn)
+        logger.info(f"Database initialized successfully (applied {applied})")
         
     except sqlite3.Error as e:
         logger.error(f"Database initialization error: {e}")
@@ -62,29 +226,3 @@ def init_db():
     finally:
         if conn:
             conn.close()
-
-def _create_additional_tables(cursor):
-    """Create additional tables"""
-    tables = [
-        '''CREATE TABLE IF NOT EXISTS invites
-           (id INTEGER PRIMARY KEY AUTOINCREMENT, inviter_id TEXT, invited_id TEXT,
-            invite_code TEXT UNIQUE, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(inviter_id) REFERENCES users(id))''',
-        
-        '''CREATE TABLE IF NOT EXISTS giveaways
-           (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, description TEXT,
-            prize TEXT NOT NULL, winners_count INTEGER CHECK(winners_count > 0), 
-            end_time TIMESTAMP, channel_id TEXT, message_id TEXT, 
-            status TEXT DEFAULT 'active' CHECK(status IN ('active', 'ended', 'cancelled')))''',
-        
-        '''CREATE TABLE IF NOT EXISTS settings
-           (key TEXT PRIMARY KEY, value TEXT)''',
-        
-        '''CREATE TABLE IF NOT EXISTS autoresponder
-           (id INTEGER PRIMARY KEY AUTOINCREMENT, trigger_phrase TEXT NOT NULL,
-            response TEXT NOT NULL, embed_enabled INTEGER DEFAULT 0,
-            embed_data TEXT, enabled INTEGER DEFAULT 1)'''
-    ]
-    
-    for table_sql in tables:
-        cursor.execute(table_sql)
\ No newline at end of file
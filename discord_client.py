@@ -0,0 +1,139 @@
+import os
+import time
+import random
+import hashlib
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+from config import Config
+from cache import TTLCache
+from metrics import observe_http
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 502, 503, 504)
+
+def _never_sent(error):
+    """Whether a connection error happened before any of the request reached Discord"""
+    # urllib3 reports refused and timed-out connects as ConnectTimeoutError subclasses
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.exceptions.ConnectTimeout) or isinstance(reason, ConnectTimeoutError)
+
+class DiscordClient:
+    """Keep-alive Discord API client with rate-limit-aware retries"""
+
+    def __init__(self, base_url, timeout, max_retries, max_retry_wait, pool_size, user_cache_ttl):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+        self.pid = os.getpid()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = "IceAI-Dashboard (https://github.com/FutureOTP/IceAI-Dashboard, 1.0)"
+        self.user_cache = TTLCache("discord_users", 1024, user_cache_ttl) if user_cache_ttl > 0 else None
+
+    def _retry_delay(self, response, attempt):
+        """Seconds to wait before retrying, honoring Discord's rate-limit hints"""
+        if response is not None and response.status_code == 429:
+            for header in ("Retry-After", "X-RateLimit-Reset-After"):
+                try:
+                    return float(response.headers[header])
+                except (KeyError, ValueError):
+                    pass
+            try:
+                return float(response.json().get("retry_after", 1))
+            except (ValueError, AttributeError):
+                return 1.0
+        # Exponential backoff with jitter for transient failures
+        return min(self.max_retry_wait, 0.25 * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+    def request(self, method, path, idempotent=True, **kwargs):
+        """Send a request, retrying 429s, 5xx gateway errors and failed connects
+
+        Non-idempotent requests are only retried when Discord cannot have acted
+        on them: a 429, or a connect that never completed. A gateway error or a
+        dropped connection may come after the request was processed.
+        """
+        url = f"{self.base_url}{path}"
+        kwargs.setdefault("timeout", self.timeout)
+        retry_statuses = RETRY_STATUSES if idempotent else (429,)
+        for attempt in range(self.max_retries + 1):
+            response = None
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                observe_http("discord", method, path, "error", time.perf_counter() - started)
+                # Read timeouts are not retried since Discord may have processed the request
+                if not (idempotent or _never_sent(e)) or attempt == self.max_retries:
+                    raise
+            else:
+                observe_http("discord", method, path, response.status_code, time.perf_counter() - started)
+                if response.status_code not in retry_statuses or attempt == self.max_retries:
+                    return response
+
+            delay = self._retry_delay(response, attempt)
+            if delay > self.max_retry_wait:
+                logger.warning(f"Discord asked to wait {delay:.1f}s on {path}; giving up")
+                if response is None:
+                    raise requests.exceptions.RetryError(f"Retry wait too long for {path}")
+                return response
+            status = response.status_code if response is not None else "connection error"
+            logger.info(f"Retrying Discord {method} {path} after {status} in {delay:.2f}s")
+            time.sleep(delay)
+        return response
+
+    def exchange_code(self, code):
+        """Exchange an OAuth2 authorization code for an access token"""
+        data = {
+            "client_id": Config.DISCORD_CLIENT_ID,
+            "client_secret": Config.DISCORD_CLIENT_SECRET,
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": Config.DISCORD_REDIRECT_URI,
+            "scope": "identify guilds"
+        }
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        # Codes are single use: a retry after Discord consumed one fails with invalid_grant
+        return self.request("POST", "/oauth2/token", idempotent=False, data=data, headers=headers)
+
+    def get_current_user(self, access_token):
+        """Get the token owner's user object, or None if Discord refuses"""
+        cache_key = hashlib.sha256(access_token.encode()).hexdigest()
+        if self.user_cache is not None:
+            cached = self.user_cache.get(cache_key)
+            if cached is not None:
+                return dict(cached)
+
+        response = self.request("GET", "/users/@me", headers={"Authorization": f"Bearer {access_token}"})
+        if response.status_code != 200:
+            logger.error(f"User info request failed: {response.status_code}")
+            return None
+
+        user = response.json()
+        if self.user_cache is not None:
+            self.user_cache.set(cache_key, user)
+        return dict(user)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_discord_client():
+    """Get the shared Discord client for the current process"""
+    global _client
+    pid = os.getpid()
+    if _client is None or _client.pid != pid:
+        with _client_lock:
+            if _client is None or _client.pid != pid:
+                # Pooled sockets must not be shared with a forked parent
+                _client = DiscordClient(Config.DISCORD_API_BASE, Config.DISCORD_HTTP_TIMEOUT,
+                                        Config.DISCORD_MAX_RETRIES, Config.DISCORD_MAX_RETRY_WAIT,
+                                        Config.DISCORD_POOL_SIZE, Config.DISCORD_USER_CACHE_TTL)
+    return _client
@@ -0,0 +1,110 @@
+import io
+import csv
+import json
+import sqlite3
+import logging
+from datetime import datetime
+
+from config import Config
+from database import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Export kind -> (table, owner column, exported columns)
+EXPORTS = {
+    "tickets": ("tickets", "user_id",
+                ("id", "user_id", "ticket_type", "status", "subject", "description", "created_at", "closed_at")),
+    "vouches": ("vouches", "user_id",
+                ("id", "user_id", "target_user_id", "message", "rating", "trade_type", "account_rank",
+                 "price", "payment_method", "created_at")),
+    "vouches_received": ("vouches", "target_user_id",
+                         ("id", "user_id", "target_user_id", "message", "rating", "trade_type", "account_rank",
+                          "price", "payment_method", "created_at")),
+    "listings": ("r6_accounts", "seller_id",
+                 ("id", "seller_id", "title", "rank", "level", "operators_count", "renown", "r6_credits",
+                  "price", "description", "status", "created_at")),
+}
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+class ExportError(ValueError):
+    """Raised for invalid export kind, format or date range"""
+
+def _parse_date(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise ExportError(f"{name} must be an ISO date or datetime")
+
+def parse_export_request(kind, params):
+    """Validate export parameters into (kind, format, since, until)"""
+    if kind not in EXPORTS:
+        raise ExportError(f"kind must be one of: {', '.join(EXPORTS)}")
+    fmt = params.get("format") or "ndjson"
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    return kind, fmt, _parse_date(params.get("since"), "since"), _parse_date(params.get("until"), "until")
+
+def _csv_chunk(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+def stream_export(user_id, kind, fmt, since=None, until=None):
+    """Yield an export as NDJSON or CSV chunks in constant memory
+
+    Rows are read in keyset-paged batches on (created_at, id), each on a pooled
+    connection released before the batch is yielded, so a slow client holds
+    neither a pool slot nor a read snapshot between batches. Connections come
+    straight from the pool because the generator outlives the request context.
+    """
+    table, owner, columns = EXPORTS[kind]
+    where = [f"{owner} = ?"]
+    args = [user_id]
+    if since:
+        where.append("created_at >= ?")
+        args.append(since)
+    if until:
+        where.append("created_at < ?")
+        args.append(until)
+
+    if fmt == "csv":
+        # Header goes out before the query runs so the first byte is immediate
+        yield _csv_chunk([columns])
+
+    after = None
+    while True:
+        batch_where, batch_args = list(where), list(args)
+        if after is not None:
+            created_at, last_id = after
+            if created_at is None:
+                # NULL timestamps sort first; finish them by id, then take every dated row
+                batch_where.append("(created_at IS NOT NULL OR id > ?)")
+                batch_args.append(last_id)
+            else:
+                batch_where.append("(created_at, id) > (?, ?)")
+                batch_args.extend([created_at, last_id])
+        sql = (f"SELECT {', '.join(columns)} FROM {table} WHERE {' AND '.join(batch_where)} "
+               f"ORDER BY created_at, id LIMIT ?")
+
+        conn = get_pool().acquire()
+        try:
+            rows = conn.execute(sql, batch_args + [Config.EXPORT_BATCH_SIZE]).fetchall()
+        except sqlite3.Error as e:
+            # Headers are already sent; all we can do is log and end the stream early
+            logger.error(f"Database error exporting {kind}: {e}")
+            return
+        finally:
+            conn.close()
+
+        if not rows:
+            return
+        after = (rows[-1]["created_at"], rows[-1]["id"])
+        if fmt == "csv":
+            yield _csv_chunk(tuple(row) for row in rows)
+        else:
+            yield "".join(json.dumps(dict(row), separators=(",", ":")) + "\n" for row in rows)
+        if len(rows) < Config.EXPORT_BATCH_SIZE:
+            return
@@ -0,0 +1,45 @@
+import gc
+import os
+
+# Render's free plan sleeps idle instances, so every wake pays for app startup.
+# Preloading builds the app once in the master; workers fork from it and share
+# its memory copy-on-write. Pooled DB connections, the Discord HTTP session and
+# the write-behind thread are all created lazily per worker process.
+wsgi_app = "main:create_app()"
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+
+# Handlers mostly wait on Discord or SQLite, so each worker serves requests
+# from a thread pool; a slow /callback only holds one thread. SQLite access is
+# already per-thread safe (one pooled connection per request, single writer
+# thread), but the pool must have a connection for every worker thread. The
+# background threads (write queue, webhook processor, giveaway scheduler) open
+# their own connections and exports release theirs between batches, so request
+# threads are the pool's only users.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+# gunicorn silently upgrades sync workers to gthread when threads > 1
+threads = int(os.getenv("GUNICORN_THREADS", "8")) if worker_class == "gthread" else 1
+if worker_class == "gthread":
+    os.environ.setdefault("DB_POOL_SIZE", str(threads))
+    os.environ.setdefault("DISCORD_POOL_SIZE", str(threads))
+
+# Threads do not survive fork, so with a preloaded app the background
+# threads start in each worker (post_fork) rather than in the master
+if preload_app:
+    os.environ["START_BACKGROUND_WORKERS"] = "0"
+
+def post_fork(server, worker):
+    if preload_app:
+        from main import start_background_workers
+        start_background_workers()
+
+def when_ready(server):
+    if preload_app:
+        # Import the lazily-loaded modules once here so workers inherit them
+        from lazy import load_all
+        load_all()
+        # Move everything allocated so far out of GC tracking so collections in
+        # workers do not touch (and un-share) the inherited pages
+        gc.freeze()
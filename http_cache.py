@@ -0,0 +1,143 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import threading
+from functools import wraps
+
+from flask import request, session, make_response, abort, send_from_directory
+from werkzeug.security import safe_join
+
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+STATIC_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_GZIP_SIZE = 512
+
+def get_data_version(*tables):
+    """Get the change counters for tables, maintained by triggers on every write"""
+    conn = get_db_connection()
+    try:
+        placeholders = ", ".join("?" for _ in tables)
+        rows = conn.execute(f"SELECT name, version FROM table_versions WHERE name IN ({placeholders})",
+                            tables).fetchall()
+        versions = {row["name"]: row["version"] for row in rows}
+        return tuple(versions.get(table, 0) for table in tables)
+    finally:
+        conn.close()
+
+def conditional(*tables, per_user=False, key=None):
+    """Answer GET requests with 304 when the underlying tables have not changed
+
+    The weak ETag is derived from the tables' change counters and the request
+    path and query, so no response body is built or serialized to compare.
+    key is an optional callable for anything else the response depends on,
+    such as the current leaderboard period.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != "GET":
+                return f(*args, **kwargs)
+
+            parts = [request.full_path, *map(str, get_data_version(*tables))]
+            if per_user:
+                parts.append(str((session.get("user") or {}).get("id")))
+            if key is not None:
+                parts.append(str(key()))
+            etag = hashlib.blake2b("|".join(parts).encode(), digest_size=12).hexdigest()
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response("", 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+        return decorated_function
+    return decorator
+
+class StaticAssets:
+    """Content-hashed static URLs with immutable caching and gzip variants"""
+
+    def __init__(self, app):
+        self.folder = app.static_folder
+        self._hashes = {}
+        self._gzipped = {}
+        self._lock = threading.Lock()
+
+    def content_hash(self, filename):
+        """Get the short content hash of a static file, computed once per process"""
+        digest = self._hashes.get(filename)
+        if digest is None:
+            path = safe_join(self.folder, filename)
+            if path is None:
+                return None
+            try:
+                with open(path, "rb") as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()[:12]
+            except OSError:
+                return None
+            with self._lock:
+                self._hashes[filename] = digest
+        return digest
+
+    def url(self, filename):
+        """Build a fingerprinted URL for a static file"""
+        digest = self.content_hash(filename)
+        return f"/static/{filename}?v={digest}" if digest else f"/static/{filename}"
+
+    def gzipped(self, filename):
+        """Get the pre-compressed body of a static file, or None if not worth it"""
+        if filename not in self._gzipped:
+            mimetype = mimetypes.guess_type(filename)[0] or ""
+            body = None
+            if mimetype.startswith(COMPRESSIBLE_TYPES):
+                with open(safe_join(self.folder, filename), "rb") as f:
+                    raw = f.read()
+                if len(raw) >= MIN_GZIP_SIZE:
+                    body = gzip.compress(raw, compresslevel=9, mtime=0)
+            with self._lock:
+                self._gzipped[filename] = body
+        return self._gzipped[filename]
+
+    def serve(self, filename):
+        """Serve a static file, marking fingerprinted requests immutable"""
+        digest = self.content_hash(filename)
+        if digest is None:
+            abort(404)
+        fingerprinted = request.args.get("v") == digest
+
+        body = None
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            body = self.gzipped(filename)
+
+        if body is not None:
+            response = make_response(body)
+            response.mimetype = mimetypes.guess_type(filename)[0]
+            response.headers["Content-Encoding"] = "gzip"
+            response.set_etag(f"{digest}-gz")
+            response.make_conditional(request)
+        else:
+            response = send_from_directory(self.folder, filename)
+            response.set_etag(digest)
+            response.make_conditional(request)
+        response.vary.add("Accept-Encoding")
+
+        if fingerprinted:
+            response.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}, immutable"
+        else:
+            response.headers["Cache-Control"] = "public, no-cache"
+        return response
+
+def init_app(app):
+    """Install fingerprinted static asset serving and the static_url template helper"""
+    assets = StaticAssets(app)
+    app.extensions["static_assets"] = assets
+    app.view_functions["static"] = assets.serve
+    app.jinja_env.globals["static_url"] = assets.url
+    return assets
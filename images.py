@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import sqlite3
+import tempfile
+import threading
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes -> mimetype; uploads are identified by content, never by the client's claim
+SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+# Variant name -> longest edge in pixels; variants are always JPEG
+VARIANTS = {"thumb": 320, "preview": 1024}
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+CHUNK_SIZE = 64 * 1024
+
+# Pillow is optional: without it uploads still work and variants serve the original
+HAS_PIL = importlib.util.find_spec("PIL") is not None
+if not HAS_PIL:
+    logger.warning("Pillow is not installed; listing images will not be thumbnailed")
+
+class ImageError(ValueError):
+    """Raised for uploads that are too large or not a supported image"""
+
+def sniff_mimetype(head):
+    """Identify an image from its first bytes, or None if unsupported"""
+    for signature, mimetype in SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+def image_path(digest, variant=None):
+    """Storage path of an original (variant None) or a generated variant"""
+    name = digest if variant is None else f"{digest}.{variant}.jpg"
+    return os.path.join(Config.IMAGE_STORAGE_PATH, digest[:2], name)
+
+def image_urls(digest):
+    """URLs for an image and its variants (variants fall back to the original until rendered)"""
+    urls = {"url": f"/media/{digest}"}
+    urls.update({variant: f"/media/{digest}/{variant}" for variant in VARIANTS})
+    return urls
+
+def parse_image_list(value):
+    """Decode an r6_accounts.images value into a list of digests"""
+    if not value:
+        return []
+    try:
+        digests = json.loads(value)
+    except ValueError:
+        return []
+    if not isinstance(digests, list):
+        return []
+    return [d for d in digests if isinstance(d, str) and DIGEST_PATTERN.match(d)]
+
+def store_upload(stream):
+    """Stream an upload to disk under its SHA-256, storing identical content once
+
+    Returns (digest, mimetype, size, created).
+    """
+    os.makedirs(Config.IMAGE_STORAGE_PATH, exist_ok=True)
+    hasher = hashlib.sha256()
+    size = 0
+    mimetype = None
+    fd, tmp_path = tempfile.mkstemp(dir=Config.IMAGE_STORAGE_PATH, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if mimetype is None:
+                    mimetype = sniff_mimetype(chunk)
+                    if mimetype is None:
+                        raise ImageError("Unsupported image type (PNG, JPEG, GIF or WebP only)")
+                size += len(chunk)
+                if size > Config.IMAGE_MAX_BYTES:
+                    raise ImageError(f"Image exceeds {Config.IMAGE_MAX_BYTES} bytes")
+                hasher.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise ImageError("Empty upload")
+
+        digest = hasher.hexdigest()
+        path = image_path(digest)
+        if os.path.exists(path):
+            return digest, mimetype, size, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        tmp_path = None
+        return digest, mimetype, size, True
+    finally:
+        if tmp_path is not None:
+            os.unlink(tmp_path)
+
+def is_stored(digest):
+    """Whether the original for a digest is on disk"""
+    return os.path.exists(image_path(digest))
+
+def remove_orphans(digests, conn):
+    """Delete stored originals that no images row refers to, after a failed upload
+
+    Runs under the write lock. An upload that deduplicated onto one of these
+    files re-checks is_stored under the same lock before recording its row, so
+    it either commits first (and the file is kept) or sees the file gone.
+    """
+    if not digests:
+        return
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for digest in digests:
+                if conn.execute("SELECT 1 FROM images WHERE digest = ?", (digest,)).fetchone() is None:
+                    try:
+                        os.unlink(image_path(digest))
+                    except OSError as e:
+                        logger.warning(f"Could not remove orphaned image {digest[:12]}: {e}")
+        finally:
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+    except sqlite3.Error as e:
+        logger.warning(f"Could not check {len(digests)} orphaned images: {e}")
+    finally:
+        conn.isolation_level = previous_isolation
+
+def render_variants(source, targets):
+    """Render {variant: (path, edge)} from source; runs in the worker process pool
+
+    Paths are passed in rather than derived from Config, which is re-read from
+    the environment in spawned workers.
+    """
+    from PIL import Image
+
+    rendered = []
+    with Image.open(source) as original:
+        original.draft("RGB", (max(edge for _, edge in targets.values()),) * 2)
+        for variant, (target, edge) in targets.items():
+            image = original.convert("RGB")
+            image.thumbnail((edge, edge))
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".variant-")
+            with os.fdopen(fd, "wb") as out:
+                image.save(out, "JPEG", quality=82, optimize=True, progressive=True)
+            os.replace(tmp_path, target)
+            rendered.append(variant)
+    return rendered
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Get this process's thumbnail pool, created lazily and never inherited across fork"""
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                # spawn, not fork: forking a threaded server process can deadlock the child
+                _executor = ProcessPoolExecutor(max_workers=Config.IMAGE_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+                _executor_pid = pid
+    return _executor
+
+def _log_result(digest, future):
+    try:
+        rendered = future.result()
+        if rendered:
+            logger.info(f"Rendered {', '.join(rendered)} for image {digest[:12]}")
+    except Exception as e:
+        logger.error(f"Failed to render variants for image {digest[:12]}: {e}")
+
+def schedule_variants(digest):
+    """Queue variant rendering off the request thread; returns the future or None"""
+    if not HAS_PIL:
+        return None
+    targets = {variant: (image_path(digest, variant), edge) for variant, edge in VARIANTS.items()
+               if not os.path.exists(image_path(digest, variant))}
+    if not targets:
+        return None
+    future = get_executor().submit(render_variants, image_path(digest), targets)
+    future.add_done_callback(lambda f: _log_result(digest, f))
+    return future
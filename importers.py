@@ -0,0 +1,74 @@
+import io
+import csv
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+class ImportFormatError(ValueError):
+    """Raised when an upload's format cannot be determined or read"""
+
+def detect_format(explicit, content_type, filename=None):
+    """Pick csv or ndjson from an explicit parameter, content type or file extension"""
+    if explicit:
+        if explicit not in ("csv", "ndjson"):
+            raise ImportFormatError("format must be csv or ndjson")
+        return explicit
+    mimetype = (content_type or "").split(";")[0].strip().lower()
+    if mimetype in IMPORT_FORMATS:
+        return IMPORT_FORMATS[mimetype]
+    if filename:
+        extension = filename.rsplit(".", 1)[-1].lower()
+        if extension == "csv":
+            return "csv"
+        if extension in ("ndjson", "jsonl"):
+            return "ndjson"
+    raise ImportFormatError("Could not determine upload format; pass ?format=csv or ?format=ndjson")
+
+def _text_stream(stream):
+    if not hasattr(stream, "readable"):
+        stream = io.BufferedReader(stream)
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+def iter_csv_rows(stream):
+    """Yield (row number, dict or None, error) from a CSV stream with a header row"""
+    reader = csv.DictReader(_text_stream(stream))
+    try:
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, "Too many columns"
+                continue
+            # Blank cells mean "not provided" so optional fields fall back to defaults
+            yield reader.line_num, {k: v for k, v in row.items() if v not in ("", None)}, None
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ImportFormatError(f"Unreadable CSV near line {reader.line_num}: {e}")
+
+def iter_ndjson_rows(stream):
+    """Yield (line number, dict or None, error) from an NDJSON stream"""
+    try:
+        for line_no, line in enumerate(_text_stream(stream), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_no, None, "Invalid JSON"
+                continue
+            if not isinstance(row, dict):
+                yield line_no, None, "Each line must be a JSON object"
+                continue
+            yield line_no, row, None
+    except UnicodeDecodeError as e:
+        raise ImportFormatError(f"Upload is not valid UTF-8: {e}")
+
+def iter_rows(stream, fmt):
+    """Stream rows from an upload in the given format"""
+    return iter_csv_rows(stream) if fmt == "csv" else iter_ndjson_rows(stream)
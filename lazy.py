@@ -0,0 +1,36 @@
+import importlib
+import threading
+
+_registry = []
+
+class LazyModule:
+    """Module proxy that defers the real import until first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "deferred"
+        return f"<lazy module {self._name!r} ({state})>"
+
+def lazy_import(name):
+    """Return a proxy for a module that is imported on first use"""
+    return LazyModule(name)
+
+def load_all():
+    """Import every deferred module now, e.g. in a preloading master before fork"""
+    for module in _registry:
+        module._load()
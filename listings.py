@@ -0,0 +1,233 @@
+import re
+import html
+import json
+import base64
+import binascii
+
+from images import image_urls, parse_image_list
+
+# Columns returned for marketplace listings, mapped by name rather than position
+LISTING_COLUMNS = ("id", "seller_id", "title", "rank", "level", "operators_count", "renown",
+                   "r6_credits", "price", "description", "images", "created_at")
+
+# Sort name -> (keyset column, direction); every sort is tie-broken on id
+LISTING_SORTS = {
+    "newest": ("created_at", "DESC"),
+    "oldest": ("created_at", "ASC"),
+    "price_asc": ("price", "ASC"),
+    "price_desc": ("price", "DESC"),
+    "level_desc": ("level", "DESC"),
+    # Joined from seller_reputation; keyed on (bayes_rating, decayed_score, seller_id)
+    "trusted": ("trust", "DESC"),
+}
+
+TRUSTED_SORT = "trusted"
+_TRUST_KEY = ("seller_rating", "seller_activity", "seller_id")
+
+# Keyset column -> JSON types a cursor may carry for it (bool is excluded separately)
+_NUMBER = (int, float)
+_CURSOR_TYPES = {
+    "created_at": (str,),
+    "price": _NUMBER,
+    "level": (int,),
+    "trust": (_NUMBER, _NUMBER, (str,)),
+}
+
+DEFAULT_SORT = "newest"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+# Query parameter -> (column, operator, type)
+_FILTERS = {
+    "rank": ("rank", "=", str),
+    "seller": ("seller_id", "=", str),
+    "min_price": ("price", ">=", float),
+    "max_price": ("price", "<=", float),
+    "min_level": ("level", ">=", int),
+    "max_level": ("level", "<=", int),
+    "min_operators": ("operators_count", ">=", int),
+}
+
+MAX_SEARCH_TERMS = 8
+
+# Private-use markers let snippets be HTML-escaped before highlighting is applied
+_MARK_START, _MARK_END = "\ue000", "\ue001"
+_SEARCH_TERM = re.compile(r"\w+", re.UNICODE)
+
+class ListingQueryError(ValueError):
+    """Raised for invalid marketplace filter, sort or cursor parameters"""
+
+def encode_cursor(sort, row):
+    """Encode the keyset position after a row as an opaque cursor"""
+    column, _ = LISTING_SORTS[sort]
+    value = [row[key] for key in _TRUST_KEY] if sort == TRUSTED_SORT else row[column]
+    raw = json.dumps([sort, value, row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(sort, cursor):
+    """Decode a cursor into its (sort value, id) position"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError, binascii.Error):
+        raise ListingQueryError("Invalid cursor")
+    if cursor_sort != sort or not _is_type(last_id, (int,)):
+        raise ListingQueryError("Cursor does not match the requested sort")
+    types = _CURSOR_TYPES[LISTING_SORTS[sort][0]]
+    if sort == TRUSTED_SORT:
+        valid = (isinstance(value, list) and len(value) == len(types)
+                 and all(_is_type(part, part_types) for part, part_types in zip(value, types)))
+    else:
+        valid = _is_type(value, types)
+    if not valid:
+        raise ListingQueryError("Invalid cursor")
+    return value, last_id
+
+def _is_type(value, types):
+    # json gives bools for true/false, which isinstance would accept as ints
+    return isinstance(value, types) and not isinstance(value, bool)
+
+def parse_listing_query(params):
+    """Normalize request query parameters into a hashable listing query"""
+    filters = []
+    for name, (_, _, cast) in _FILTERS.items():
+        value = params.get(name)
+        if value is None or str(value).strip() == "":
+            continue
+        try:
+            value = cast(value)
+        except (ValueError, TypeError):
+            raise ListingQueryError(f"Invalid value for {name}")
+        if cast is not str and value < 0:
+            raise ListingQueryError(f"{name} must be non-negative")
+        filters.append((name, value))
+
+    sort = params.get("sort") or DEFAULT_SORT
+    if sort not in LISTING_SORTS:
+        raise ListingQueryError(f"sort must be one of: {', '.join(LISTING_SORTS)}")
+
+    try:
+        limit = int(params.get("limit", DEFAULT_PAGE_SIZE))
+    except (ValueError, TypeError):
+        raise ListingQueryError("Invalid value for limit")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    cursor = params.get("cursor") or None
+    if cursor:
+        decode_cursor(sort, cursor)
+
+    return tuple(filters), sort, cursor, limit
+
+def build_trusted_listing_sql(filters, cursor, limit):
+    """Build the trusted-sellers-first SQL: walk idx_seller_reputation_trust from the top
+    and pull each seller's available listings through the (seller_id, status) index"""
+    where = ["a.status = 'available'"]
+    args = []
+    for name, value in filters:
+        column, op, _ = _FILTERS[name]
+        where.append(f"a.{column} {op} ?")
+        args.append(value)
+
+    if cursor:
+        value, last_id = decode_cursor(TRUSTED_SORT, cursor)
+        where.append("(r.bayes_rating, r.decayed_score, r.seller_id, a.id) < (?, ?, ?, ?)")
+        args.extend([*value, last_id])
+
+    # CROSS JOIN pins seller_reputation as the outer loop so its index supplies the order
+    columns = ", ".join(f"a.{column}" for column in LISTING_COLUMNS)
+    sql = (f"SELECT {columns}, r.bayes_rating AS seller_rating, r.decayed_score AS seller_activity, "
+           f"r.vouch_count AS seller_vouches "
+           f"FROM seller_reputation r CROSS JOIN r6_accounts a ON a.seller_id = r.seller_id "
+           f"WHERE {' AND '.join(where)} "
+           f"ORDER BY r.bayes_rating DESC, r.decayed_score DESC, r.seller_id DESC, a.id DESC LIMIT ?")
+    args.append(limit + 1)
+    return sql, args
+
+def build_listing_sql(filters, sort, cursor, limit):
+    """Build the keyset-paginated SQL for a parsed listing query"""
+    if sort == TRUSTED_SORT:
+        return build_trusted_listing_sql(filters, cursor, limit)
+
+    where = ["status = 'available'"]
+    args = []
+    for name, value in filters:
+        column, op, _ = _FILTERS[name]
+        where.append(f"{column} {op} ?")
+        args.append(value)
+
+    column, direction = LISTING_SORTS[sort]
+    # A NULL sort value has no keyset position, so such rows are left out of the sort
+    where.append(f"{column} IS NOT NULL")
+    if cursor:
+        value, last_id = decode_cursor(sort, cursor)
+        where.append(f"({column}, id) {'<' if direction == 'DESC' else '>'} (?, ?)")
+        args.extend([value, last_id])
+
+    # Fetch one extra row to know whether another page exists
+    sql = (f"SELECT {', '.join(LISTING_COLUMNS)} FROM r6_accounts "
+           f"WHERE {' AND '.join(where)} "
+           f"ORDER BY {column} {direction}, id {direction} LIMIT ?")
+    args.append(limit + 1)
+    return sql, args
+
+def row_to_listing(row):
+    """Convert an r6_accounts row to its API representation"""
+    listing = {
+        "id": row["id"], "seller_id": row["seller_id"], "title": row["title"],
+        "rank": row["rank"], "level": row["level"], "operators": row["operators_count"],
+        "renown": row["renown"], "credits": row["r6_credits"], "price": row["price"],
+        "description": row["description"], "created_at": row["created_at"],
+        "images": [image_urls(digest) for digest in parse_image_list(row["images"])]
+    }
+    if "seller_rating" in row.keys():
+        listing["seller_reputation"] = {"rating": round(row["seller_rating"], 2),
+                                        "vouches": row["seller_vouches"]}
+    return listing
+
+def parse_search_query(params):
+    """Normalize a search request into (match expression, filters, limit)"""
+    terms = _SEARCH_TERM.findall(params.get("q") or "")[:MAX_SEARCH_TERMS]
+    if not terms:
+        raise ListingQueryError("q must contain at least one search term")
+    # Quote every term so user input can never inject FTS5 syntax
+    match = " ".join(f'"{term}"' for term in terms)
+
+    filters, _, _, limit = parse_listing_query({k: v for k, v in params.items()
+                                                if k not in ("sort", "cursor")})
+    return match, filters, limit
+
+def build_search_sql(match, filters, limit, candidates):
+    """Build the ranked full-text search SQL combined with structured filters
+
+    Only the newest ``candidates`` matches are scored, which bounds the cost of
+    very common terms; snippets are generated for the final page only.
+    """
+    where = ["r6_accounts_fts MATCH ?"]
+    args = [match]
+    for name, value in filters:
+        column, op, _ = _FILTERS[name]
+        where.append(f"a.{column} {op} ?")
+        args.append(value)
+    args.extend([candidates, limit, match])
+
+    columns = ", ".join(f"a.{column}" for column in LISTING_COLUMNS)
+    sql = f"""WITH top AS (
+                SELECT id, score FROM (
+                  SELECT a.id AS id, bm25(r6_accounts_fts, 10.0, 1.0) AS score
+                  FROM r6_accounts_fts JOIN r6_accounts a ON a.id = r6_accounts_fts.rowid
+                  WHERE {' AND '.join(where)}
+                  ORDER BY r6_accounts_fts.rowid DESC LIMIT ?)
+                ORDER BY score LIMIT ?)
+              SELECT {columns}, top.score AS score,
+                     snippet(r6_accounts_fts, -1, '{_MARK_START}', '{_MARK_END}', '…', 12) AS snippet
+              FROM top
+              CROSS JOIN r6_accounts_fts ON r6_accounts_fts.rowid = top.id
+              JOIN r6_accounts a ON a.id = top.id
+              WHERE r6_accounts_fts MATCH ? AND a.status = 'available'
+              ORDER BY top.score"""
+    return sql, args
+
+def highlight_snippet(snippet):
+    """HTML-escape a snippet and wrap matched terms in <mark>"""
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
@@ -1,3 +1,7 @@
+import time
+
+_import_started = time.perf_counter()
+
 import os
 from flask import Flask
 from flask_cors import CORS
@@ -5,15 +9,32 @@ from dotenv import load_dotenv
 import secrets
 import logging
 
+# Load environment variables before Config reads them
+load_dotenv()
+
 from config import Config
-from database import init_db
+from database import init_db, init_app as init_db_pool
 from routes import register_routes
 
-# Load environment variables
-load_dotenv()
+_import_seconds = time.perf_counter() - _import_started
+
+logger = logging.getLogger(__name__)
+
+def start_background_workers():
+    """Start this process's giveaway scheduler and webhook processor threads"""
+    if Config.GIVEAWAY_SCHEDULER:
+        from modules.giveaways import get_scheduler
+        get_scheduler()
+    if Config.SELLHUB_SECRET:
+        # Also drains events left pending by a previous process
+        from webhooks import get_processor
+        get_processor()
 
 def create_app():
     """Application factory pattern"""
+    started = time.perf_counter()
+    timings = {"imports": _import_seconds}
+    
     app = Flask(__name__, template_folder="templates", static_folder="static")
     
     # Configuration
@@ -25,15 +46,29 @@ def create_app():
     
     # Validate configuration
     Config.validate()
+    timings["config"] = time.perf_counter() - started
     
-    # Initialize database
+    # Initialize database (a header probe when the schema is already current)
+    phase_started = time.perf_counter()
     init_db()
+    init_db_pool(app)
+    timings["schema"] = time.perf_counter() - phase_started
     
     # Register routes
+    phase_started = time.perf_counter()
     register_routes(app)
+    timings["routes"] = time.perf_counter() - phase_started
+    
+    if Config.START_BACKGROUND_WORKERS:
+        start_background_workers()
+    
+    timings["total"] = _import_seconds + time.perf_counter() - started
+    app.config["STARTUP_TIMINGS"] = timings
+    logger.info("Cold start timing: " + ", ".join(f"{phase}={seconds * 1000:.1f}ms"
+                                                  for phase, seconds in timings.items()))
     
     return app
 
 if __name__ == "__main__":
     app = create_app()
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -0,0 +1,88 @@
+import os
+import sys
+import sqlite3
+import logging
+import argparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config import Config
+import migrations
+
+logger = logging.getLogger(__name__)
+
+def cmd_migrate(args):
+    """Apply pending schema migrations"""
+    conn = sqlite3.connect(Config.DATABASE_PATH)
+    try:
+        applied = migrations.migrate(conn, target=args.target)
+        if applied:
+            print(f"Applied migrations: {', '.join(map(str, applied))}")
+        else:
+            print(f"Schema already current (v{migrations.get_current_version(conn)})")
+    finally:
+        conn.close()
+
+def cmd_status(args):
+    """Show applied and pending migrations"""
+    conn = sqlite3.connect(Config.DATABASE_PATH)
+    try:
+        for version, description, applied_at in migrations.get_status(conn):
+            state = f"applied {applied_at}" if applied_at else "pending"
+            print(f"{version:>4}  {description:<40} {state}")
+    finally:
+        conn.close()
+
+def connect_migrated():
+    """Open the database, exiting if it is missing or behind the latest migration"""
+    if not os.path.exists(Config.DATABASE_PATH):
+        sys.exit(f"No database at {Config.DATABASE_PATH}; run `python manage.py migrate` first")
+    conn = sqlite3.connect(Config.DATABASE_PATH)
+    if not migrations.is_current(conn):
+        conn.close()
+        sys.exit("Database schema is not current; run `python manage.py migrate` first")
+    return conn
+
+def cmd_rebuild_stats(args):
+    """Recompute the user_stats summary table (run after bulk imports)"""
+    conn = connect_migrated()
+    try:
+        count = migrations.rebuild_user_stats(conn)
+        print(f"Rebuilt stats for {count} users")
+    finally:
+        conn.close()
+
+def cmd_rebuild_reputation(args):
+    """Recompute the seller_reputation table from vouches (run after bulk imports)"""
+    conn = connect_migrated()
+    try:
+        count = migrations.rebuild_seller_reputation(conn)
+        print(f"Rebuilt reputation for {count} sellers")
+    finally:
+        conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="IceAI Dashboard management commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser("migrate", help=cmd_migrate.__doc__)
+    migrate_parser.add_argument("--target", type=int, default=None, help="Migrate up to this version")
+    migrate_parser.set_defaults(func=cmd_migrate)
+
+    status_parser = subparsers.add_parser("status", help=cmd_status.__doc__)
+    status_parser.set_defaults(func=cmd_status)
+
+    rebuild_parser = subparsers.add_parser("rebuild-stats", help=cmd_rebuild_stats.__doc__)
+    rebuild_parser.set_defaults(func=cmd_rebuild_stats)
+
+    reputation_parser = subparsers.add_parser("rebuild-reputation", help=cmd_rebuild_reputation.__doc__)
+    reputation_parser.set_defaults(func=cmd_rebuild_reputation)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import re
+import time
+import logging
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+
+from flask import g, request
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger("slow_requests")
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+HTTP_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Labelled Prometheus-style histogram with fixed buckets"""
+
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count)
+                        for labels, (counts, total, count) in self._series.items()]
+        for label_values, counts, total, count in sorted(snapshot):
+            base = _format_labels(self.labels, label_values)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{base}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{base.rstrip(',')}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{base.rstrip(',')}}} {count}")
+        return lines
+
+class Counter:
+    """Labelled Prometheus-style counter"""
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for label_values, value in snapshot:
+            lines.append(f"{self.name}{{{_format_labels(self.labels, label_values).rstrip(',')}}} {value}")
+        return lines
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values):
+    return "".join(f'{name}="{_escape(value)}",' for name, value in zip(names, values))
+
+request_latency = Histogram("iceai_request_duration_seconds", "Request latency by endpoint",
+                            ("method", "endpoint"), REQUEST_BUCKETS)
+request_status = Counter("iceai_requests_total", "Requests by endpoint and status",
+                         ("method", "endpoint", "status"))
+query_latency = Histogram("iceai_sql_duration_seconds", "SQL statement execution time by normalized query",
+                          ("query",), QUERY_BUCKETS)
+http_latency = Histogram("iceai_outbound_http_duration_seconds", "Outbound HTTP latency",
+                         ("service", "method", "path", "status"), HTTP_BUCKETS)
+
+_SQL_STRING = re.compile(r"'(?:[^']|'')*'")
+_SQL_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SQL_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=512)
+def normalize_sql(sql):
+    """Collapse literals and whitespace so equivalent statements share a series"""
+    sql = _SQL_STRING.sub("?", sql)
+    sql = _SQL_NUMBER.sub("?", sql)
+    sql = _SQL_IN_LIST.sub("(?...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()[:200]
+
+def observe_query(sql, seconds):
+    """Record one SQL statement's execution time"""
+    if Config.METRICS_ENABLED:
+        query_latency.observe((normalize_sql(sql),), seconds)
+
+def observe_http(service, method, path, status, seconds):
+    """Record one outbound HTTP call's latency"""
+    if Config.METRICS_ENABLED:
+        http_latency.observe((service, method, path, str(status)), seconds)
+
+def _before_request():
+    g._request_started = time.perf_counter()
+
+def _after_request(response):
+    started = g.pop("_request_started", None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    # Label by route rule, not raw path, to keep series cardinality bounded
+    endpoint = request.url_rule.rule if request.url_rule else "<unmatched>"
+    request_latency.observe((request.method, endpoint), elapsed)
+    request_status.inc((request.method, endpoint, str(response.status_code)))
+    if elapsed * 1000 >= Config.SLOW_REQUEST_MS:
+        slow_logger.warning(f"Slow request: {request.method} {request.full_path.rstrip('?')} -> "
+                            f"{response.status_code} in {elapsed * 1000:.1f}ms")
+    return response
+
+def render_metrics(gauges=None):
+    """Render all metrics, plus extra {name: {label: value}} gauges, as Prometheus text"""
+    lines = []
+    for metric in (request_latency, request_status, query_latency, http_latency):
+        lines.extend(metric.render())
+    for name, values in (gauges or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        for label, value in sorted(values.items()):
+            lines.append(f'{name}{{key="{_escape(label)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+def init_app(app):
+    """Record per-endpoint latency and status counts for every request"""
+    if Config.METRICS_ENABLED:
+        app.before_request(_before_request)
+        app.after_request(_after_request)
@@ -0,0 +1,526 @@
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Recomputes user_stats from the source tables (backfill and bulk-import repair)
+REBUILD_USER_STATS_SQL = [
+    "DELETE FROM user_stats",
+    '''INSERT INTO user_stats (user_id, vouches, rating_sum, rating_count, tickets,
+                             accounts_listed, invites, total_trades, total_earnings)
+       SELECT user_id, SUM(vouches), SUM(rating_sum), SUM(rating_count), SUM(tickets),
+              SUM(accounts_listed), SUM(invites), SUM(total_trades), SUM(total_earnings)
+       FROM (
+         SELECT target_user_id AS user_id, 1 AS vouches, COALESCE(rating, 0) AS rating_sum,
+                rating IS NOT NULL AS rating_count, 0 AS tickets, 0 AS accounts_listed, 0 AS invites,
+                1 AS total_trades, COALESCE(price, 0) AS total_earnings
+         FROM vouches WHERE target_user_id IS NOT NULL
+         UNION ALL
+         SELECT user_id, 0, 0, 0, 0, 0, 0, 1, 0 FROM vouches WHERE user_id IS NOT NULL
+         UNION ALL
+         SELECT user_id, 0, 0, 0, 1, 0, 0, 0, 0 FROM tickets WHERE user_id IS NOT NULL
+         UNION ALL
+         SELECT seller_id, 0, 0, 0, 0, 1, 0, 0, 0 FROM r6_accounts WHERE seller_id IS NOT NULL
+         UNION ALL
+         SELECT inviter_id, 0, 0, 0, 0, 0, 1, 0, 0 FROM invites WHERE inviter_id IS NOT NULL
+       )
+       GROUP BY user_id''',
+]
+
+# Seller reputation (see reputation.py): a Bayesian average over 5 prior 3.5-star
+# vouches, and totals forward-weighted by exp(days since 2024-01-01 * ln 2 / 30).
+# Self-vouches never count and only an author's first 3 vouches for a seller do.
+# Plain SQL throughout, so any connection (sqlite CLI, a bot process) can write vouches.
+_VOUCH_ELIGIBLE = ("{v}.target_user_id IS NOT NULL AND {v}.user_id IS NOT {v}.target_user_id "
+                   "AND {v}.rating BETWEEN 1 AND 5 AND julianday({v}.created_at) IS NOT NULL")
+_VOUCH_PRICE = "MAX(COALESCE(CAST({v}.price AS REAL), 0.0), 0.0)"
+_VOUCH_WEIGHT = "exp((julianday({v}.created_at) - julianday('2024-01-01')) * ln(2) / 30)"
+
+def _counted_vouches(where="1"):
+    """Per-vouch rows (target_user_id, rating, created_at, price, weight, counted) for eligible vouches"""
+    return f"""SELECT v.target_user_id, v.rating, v.created_at, {_VOUCH_PRICE.format(v="v")} AS price,
+                      {_VOUCH_WEIGHT.format(v="v")} AS weight,
+                      ROW_NUMBER() OVER (PARTITION BY v.user_id, v.target_user_id ORDER BY v.id) <= 3 AS counted
+               FROM vouches v WHERE {_VOUCH_ELIGIBLE.format(v="v")} AND {where}"""
+
+_SELLER_TOTALS = """COALESCE(SUM(counted), 0), COALESCE(SUM(counted * rating), 0),
+                    COALESCE(SUM(counted * price), 0.0), COALESCE(SUM(counted * weight * (rating - 1) / 4.0), 0.0),
+                    COALESCE(SUM(counted * weight * price), 0.0),
+                    (17.5 + COALESCE(SUM(counted * rating), 0)) / (5.0 + COALESCE(SUM(counted), 0)), MAX(created_at)"""
+
+# Recomputes seller_reputation from vouches and listings (backfill and repair)
+REBUILD_SELLER_REPUTATION_SQL = [
+    "DELETE FROM seller_reputation",
+    f"""INSERT INTO seller_reputation
+        (seller_id, vouch_count, rating_sum, volume, decayed_score, decayed_volume, bayes_rating, last_vouch_at)
+        SELECT target_user_id, {_SELLER_TOTALS} FROM ({_counted_vouches()}) GROUP BY target_user_id""",
+    # Sellers without vouches get a prior-only row so the trusted sort can inner-join
+    """INSERT OR IGNORE INTO seller_reputation (seller_id)
+       SELECT DISTINCT seller_id FROM r6_accounts WHERE seller_id IS NOT NULL""",
+]
+
+# A new vouch is added in place; its earlier vouches for the same seller decide whether
+# it counts. A delete recomputes the seller's row, which promotes the author's next
+# vouch and avoids subtracting from large forward-weighted totals.
+_VOUCH_EARLIER = ("(SELECT COUNT(*) FROM vouches p WHERE p.user_id IS NEW.user_id "
+                  "AND p.target_user_id = NEW.target_user_id AND p.id < NEW.id "
+                  "AND p.rating BETWEEN 1 AND 5 AND julianday(p.created_at) IS NOT NULL)")
+SELLER_REPUTATION_TRIGGERS = [
+    f'''CREATE TRIGGER IF NOT EXISTS trg_vouches_reputation_ins AFTER INSERT ON vouches
+       WHEN {_VOUCH_ELIGIBLE.format(v="NEW")} BEGIN
+         INSERT INTO seller_reputation
+           (seller_id, vouch_count, rating_sum, volume, decayed_score, decayed_volume, bayes_rating, last_vouch_at)
+           SELECT NEW.target_user_id, counted, counted * NEW.rating, counted * {_VOUCH_PRICE.format(v="NEW")},
+                  counted * {_VOUCH_WEIGHT.format(v="NEW")} * (NEW.rating - 1) / 4.0,
+                  counted * {_VOUCH_WEIGHT.format(v="NEW")} * {_VOUCH_PRICE.format(v="NEW")},
+                  (17.5 + counted * NEW.rating) / (5.0 + counted), NEW.created_at
+           FROM (SELECT {_VOUCH_EARLIER} < 3 AS counted) WHERE true
+           ON CONFLICT (seller_id) DO UPDATE SET
+             vouch_count = vouch_count + excluded.vouch_count, rating_sum = rating_sum + excluded.rating_sum,
+             volume = volume + excluded.volume, decayed_score = decayed_score + excluded.decayed_score,
+             decayed_volume = decayed_volume + excluded.decayed_volume,
+             bayes_rating = (17.5 + rating_sum + excluded.rating_sum) / (5.0 + vouch_count + excluded.vouch_count),
+             last_vouch_at = MAX(COALESCE(last_vouch_at, ''), excluded.last_vouch_at);
+       END''',
+    f'''CREATE TRIGGER IF NOT EXISTS trg_vouches_reputation_del AFTER DELETE ON vouches
+       WHEN {_VOUCH_ELIGIBLE.format(v="OLD")} BEGIN
+         UPDATE seller_reputation SET
+           (vouch_count, rating_sum, volume, decayed_score, decayed_volume, bayes_rating, last_vouch_at) =
+           (SELECT {_SELLER_TOTALS} FROM ({_counted_vouches("v.target_user_id = OLD.target_user_id")}))
+         WHERE seller_id = OLD.target_user_id;
+       END''',
+]
+
+# Tables whose writes bump a change counter in table_versions
+VERSIONED_TABLES = ("r6_accounts", "vouches", "tickets", "invites")
+
+def _version_counter(table):
+    """Statements registering a table_versions counter and the triggers that bump it"""
+    return [f"INSERT OR IGNORE INTO table_versions (name) VALUES ('{table}')"] + [
+        f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+              UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+            END'''
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+# Leaderboard buckets an invite counts towards: all-time, ISO-ish week and month
+INVITE_BUCKETS = ("'all'",
+                  "'week:' || strftime('%Y-W%W', COALESCE({row}.created_at, CURRENT_TIMESTAMP))",
+                  "'month:' || strftime('%Y-%m', COALESCE({row}.created_at, CURRENT_TIMESTAMP))")
+
+def _invite_buckets(row):
+    return ", ".join(bucket.format(row=row) for bucket in INVITE_BUCKETS)
+
+def _count_invite(row):
+    values = ", ".join(f"({bucket.format(row=row)}, {row}.inviter_id, 1)" for bucket in INVITE_BUCKETS)
+    return f"""INSERT INTO invite_counts (bucket, inviter_id, invites) VALUES {values}
+                 ON CONFLICT (bucket, inviter_id) DO UPDATE SET invites = invites + 1;"""
+
+def _uncount_invite(row):
+    return f"""UPDATE invite_counts SET invites = invites - 1
+                 WHERE inviter_id = {row}.inviter_id AND bucket IN ({_invite_buckets(row)});
+               DELETE FROM invite_counts
+                 WHERE inviter_id = {row}.inviter_id AND bucket IN ({_invite_buckets(row)}) AND invites <= 0;"""
+
+def _bump_score(row, delta):
+    return f"""INSERT INTO invite_score_counts (bucket, invites, users) VALUES ({row}.bucket, {row}.invites, {delta})
+                 ON CONFLICT (bucket, invites) DO UPDATE SET users = users + {delta};
+               DELETE FROM invite_score_counts WHERE bucket = {row}.bucket AND invites = {row}.invites AND users <= 0;"""
+
+# Ordered schema migrations: (version, description, statements).
+# Never edit an applied migration; append a new one instead.
+MIGRATIONS = [
+    (1, "Initial schema", [
+        '''CREATE TABLE IF NOT EXISTS users
+           (id TEXT PRIMARY KEY, username TEXT, avatar TEXT, discriminator TEXT,
+            verified INTEGER DEFAULT 0, verification_code TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+
+        '''CREATE TABLE IF NOT EXISTS vouches
+           (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, target_user_id TEXT,
+            message TEXT, rating INTEGER CHECK(rating >= 1 AND rating <= 5), 
+            trade_type TEXT, account_rank TEXT, price REAL CHECK(price >= 0), 
+            payment_method TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id))''',
+
+        '''CREATE TABLE IF NOT EXISTS tickets
+           (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, ticket_type TEXT,
+            status TEXT DEFAULT 'open' CHECK(status IN ('open', 'closed', 'pending')), 
+            subject TEXT NOT NULL, description TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, closed_at TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id))''',
+
+        '''CREATE TABLE IF NOT EXISTS r6_accounts
+           (id INTEGER PRIMARY KEY AUTOINCREMENT, seller_id TEXT, title TEXT NOT NULL,
+            rank TEXT, level INTEGER CHECK(level >= 0), operators_count INTEGER CHECK(operators_count >= 0), 
+            renown INTEGER CHECK(renown >= 0), r6_credits INTEGER CHECK(r6_credits >= 0), 
+            price REAL CHECK(price >= 0), description TEXT, 
+            status TEXT DEFAULT 'available' CHECK(status IN ('available', 'sold', 'pending')),
+            images TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(seller_id) REFERENCES users(id))''',
+
+        '''CREATE TABLE IF NOT EXISTS invites
+           (id INTEGER PRIMARY KEY AUTOINCREMENT, inviter_id TEXT, invited_id TEXT,
+            invite_code TEXT UNIQUE, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(inviter_id) REFERENCES users(id))''',
+
+        '''CREATE TABLE IF NOT EXISTS giveaways
+           (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, description TEXT,
+            prize TEXT NOT NULL, winners_count INTEGER CHECK(winners_count > 0), 
+            end_time TIMESTAMP, channel_id TEXT, message_id TEXT, 
+            status TEXT DEFAULT 'active' CHECK(status IN ('active', 'ended', 'cancelled')))''',
+
+        '''CREATE TABLE IF NOT EXISTS settings
+           (key TEXT PRIMARY KEY, value TEXT)''',
+
+        '''CREATE TABLE IF NOT EXISTS autoresponder
+           (id INTEGER PRIMARY KEY AUTOINCREMENT, trigger_phrase TEXT NOT NULL,
+            response TEXT NOT NULL, embed_enabled INTEGER DEFAULT 0,
+            embed_data TEXT, enabled INTEGER DEFAULT 1)''',
+    ]),
+
+    (2, "Hot-path indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_vouches_target_created ON vouches(target_user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_vouches_user_created ON vouches(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_tickets_user_created ON tickets(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_r6_accounts_status_created ON r6_accounts(status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_r6_accounts_seller ON r6_accounts(seller_id)",
+        "CREATE INDEX IF NOT EXISTS idx_invites_inviter ON invites(inviter_id)",
+    ]),
+
+    (3, "Incrementally maintained user_stats", [
+        '''CREATE TABLE IF NOT EXISTS user_stats
+           (user_id TEXT PRIMARY KEY, vouches INTEGER NOT NULL DEFAULT 0,
+            rating_sum INTEGER NOT NULL DEFAULT 0, rating_count INTEGER NOT NULL DEFAULT 0,
+            tickets INTEGER NOT NULL DEFAULT 0, accounts_listed INTEGER NOT NULL DEFAULT 0,
+            invites INTEGER NOT NULL DEFAULT 0, total_trades INTEGER NOT NULL DEFAULT 0,
+            total_earnings REAL NOT NULL DEFAULT 0) WITHOUT ROWID''',
+
+        # Vouch received: counts toward the target's rating, trades and earnings
+        '''CREATE TRIGGER IF NOT EXISTS trg_user_stats_vouch_target_ins AFTER INSERT ON vouches
+           WHEN NEW.target_user_id IS NOT NULL BEGIN
+             INSERT INTO user_stats (user_id, vouches, rating_sum, rating_count, total_trades, total_earnings)
+             VALUES (NEW.target_user_id, 1, COALESCE(NEW.rating, 0), NEW.rating IS NOT NULL, 1, COALESCE(NEW.price, 0))
+             ON CONFLICT(user_id) DO UPDATE SET
+               vouches = vouches + 1,
+               rating_sum = rating_sum + excluded.rating_sum,
+               rating_count = rating_count + excluded.rating_count,
+               total_trades = total_trades + 1,
+               total_earnings = total_earnings + excluded.total_earnings;
+           END''',
+
+        '''CREATE TRIGGER IF NOT EXISTS trg_user_stats_vouch_target_del AFTER DELETE ON vouches
+           WHEN OLD.target_user_id IS NOT NULL BEGIN
+             UPDATE user_stats SET
+               vouches = vouches - 1,
+               rating_sum = rating_sum - COALESCE(OLD.rating, 0),
+               rating_count = rating_count - (OLD.rating IS NOT NULL),
+               total_trades = total_trades - 1,
+               total_earnings = total_earnings - COALESCE(OLD.price, 0)
+             WHERE user_id = OLD.target_user_id;
+           END''',
+
+        # Vouch given: the author took part in the trade too
+        '''CREATE TRIGGER IF NOT EXISTS trg_user_stats_vouch_author_ins AFTER INSERT ON vouches
+           WHEN NEW.user_id IS NOT NULL BEGIN
+             INSERT INTO user_stats (user_id, total_trades) VALUES (NEW.user_id, 1)
+             ON CONFLICT(user_id) DO UPDATE SET total_trades = total_trades + 1;
+           END''',
+
+        '''CREATE TRIGGER IF NOT EXISTS trg_user_stats_vouch_author_del AFTER DELETE ON vouches
+           WHEN OLD.user_id IS NOT NULL BEGIN
+             UPDATE user_stats SET total_trades = total_trades - 1 WHERE user_id = OLD.user_id;
+           END''',
+
+        '''CREATE TRIGGER IF NOT EXISTS trg_user_stats_ticket_ins AFTER INSERT ON tickets
+           WHEN NEW.user_id IS NOT NULL BEGIN
+             INSERT INTO user_stats (user_id, tickets) VALUES (NEW.user_id, 1)
+             ON CONFLICT(user_id) DO UPDATE SET tickets = tickets + 1;
+           END''',
+
+        '''CREATE TRIGGER IF NOT EXISTS trg_user_stats_ticket_del AFTER DELETE ON tickets
+           WHEN OLD.user_id IS NOT NULL BEGIN
+             UPDATE user_stats SET tickets = tickets - 1 WHERE user_id = OLD.user_id;
+           END''',
+
+        '''CREATE TRIGGER IF NOT EXISTS trg_user_stats_listing_ins AFTER INSERT ON r6_accounts
+           WHEN NEW.seller_id IS NOT NULL BEGIN
+             INSERT INTO user_stats (user_id, accounts_listed) VALUES (NEW.seller_id, 1)
+             ON CONFLICT(user_id) DO UPDATE SET accounts_listed = accounts_listed + 1;
+           END''',
+
+        '''CREATE TRIGGER IF NOT EXISTS trg_user_stats_listing_del AFTER DELETE ON r6_accounts
+           WHEN OLD.seller_id IS NOT NULL BEGIN
+             UPDATE user_stats SET accounts_listed = accounts_listed - 1 WHERE user_id = OLD.seller_id;
+           END''',
+
+        '''CREATE TRIGGER IF NOT EXISTS trg_user_stats_invite_ins AFTER INSERT ON invites
+           WHEN NEW.inviter_id IS NOT NULL BEGIN
+             INSERT INTO user_stats (user_id, invites) VALUES (NEW.inviter_id, 1)
+             ON CONFLICT(user_id) DO UPDATE SET invites = invites + 1;
+           END''',
+
+        '''CREATE TRIGGER IF NOT EXISTS trg_user_stats_invite_del AFTER DELETE ON invites
+           WHEN OLD.inviter_id IS NOT NULL BEGIN
+             UPDATE user_stats SET invites = invites - 1 WHERE user_id = OLD.inviter_id;
+           END''',
+    ] + REBUILD_USER_STATS_SQL),
+
+    (4, "Marketplace keyset pagination indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_r6_accounts_status_price ON r6_accounts(status, price)",
+        "CREATE INDEX IF NOT EXISTS idx_r6_accounts_status_level ON r6_accounts(status, level)",
+        "CREATE INDEX IF NOT EXISTS idx_r6_accounts_status_rank_created ON r6_accounts(status, rank, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_r6_accounts_status_rank_price ON r6_accounts(status, rank, price)",
+        "CREATE INDEX IF NOT EXISTS idx_r6_accounts_seller_status_created ON r6_accounts(seller_id, status, created_at)",
+        # Superseded by the seller/status/created_at index above
+        "DROP INDEX IF EXISTS idx_r6_accounts_seller",
+    ]),
+
+    # Only available listings are indexed, so sold/pending ones drop out of search
+    (5, "Full-text search over listing titles and descriptions", [
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS r6_accounts_fts USING fts5
+           (title, description, content='r6_accounts', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2')''',
+
+        '''CREATE TRIGGER IF NOT EXISTS trg_r6_accounts_fts_ins AFTER INSERT ON r6_accounts
+           WHEN NEW.status = 'available' BEGIN
+             INSERT INTO r6_accounts_fts (rowid, title, description)
+             VALUES (NEW.id, NEW.title, COALESCE(NEW.description, ''));
+           END''',
+
+        '''CREATE TRIGGER IF NOT EXISTS trg_r6_accounts_fts_del AFTER DELETE ON r6_accounts
+           WHEN OLD.status = 'available' BEGIN
+             INSERT INTO r6_accounts_fts (r6_accounts_fts, rowid, title, description)
+             VALUES ('delete', OLD.id, OLD.title, COALESCE(OLD.description, ''));
+           END''',
+
+        '''CREATE TRIGGER IF NOT EXISTS trg_r6_accounts_fts_upd_old AFTER UPDATE OF title, description, status ON r6_accounts
+           WHEN OLD.status = 'available' BEGIN
+             INSERT INTO r6_accounts_fts (r6_accounts_fts, rowid, title, description)
+             VALUES ('delete', OLD.id, OLD.title, COALESCE(OLD.description, ''));
+           END''',
+
+        '''CREATE TRIGGER IF NOT EXISTS trg_r6_accounts_fts_upd_new AFTER UPDATE OF title, description, status ON r6_accounts
+           WHEN NEW.status = 'available' BEGIN
+             INSERT INTO r6_accounts_fts (rowid, title, description)
+             VALUES (NEW.id, NEW.title, COALESCE(NEW.description, ''));
+           END''',
+
+        """INSERT INTO r6_accounts_fts (rowid, title, description)
+           SELECT id, title, COALESCE(description, '') FROM r6_accounts WHERE status = 'available'""",
+    ]),
+
+    # Cheap per-table change counters used for ETags and cross-worker invalidation
+    (6, "Per-table change counters", [
+        '''CREATE TABLE IF NOT EXISTS table_versions
+           (name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID''',
+    ] + [
+        f"INSERT OR IGNORE INTO table_versions (name) VALUES ('{table}')"
+        for table in VERSIONED_TABLES
+    ] + [
+        f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+              UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+            END'''
+        for table in VERSIONED_TABLES for event in ("INSERT", "UPDATE", "DELETE")
+    ]),
+
+    (7, "Export date-range indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_r6_accounts_seller_created ON r6_accounts(seller_id, created_at)",
+    ]),
+
+    (8, "Autoresponder match options and change counter", [
+        "ALTER TABLE autoresponder ADD COLUMN case_sensitive INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE autoresponder ADD COLUMN whole_word INTEGER NOT NULL DEFAULT 1",
+    ] + _version_counter("autoresponder")),
+
+    (9, "Giveaway entries, winners and draw audit columns", [
+        '''CREATE TABLE IF NOT EXISTS giveaway_entries
+           (giveaway_id INTEGER NOT NULL, user_id TEXT NOT NULL,
+            entered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (giveaway_id, user_id),
+            FOREIGN KEY(giveaway_id) REFERENCES giveaways(id)) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS giveaway_winners
+           (giveaway_id INTEGER NOT NULL, position INTEGER NOT NULL, user_id TEXT NOT NULL,
+            PRIMARY KEY (giveaway_id, position),
+            FOREIGN KEY(giveaway_id) REFERENCES giveaways(id)) WITHOUT ROWID''',
+        "ALTER TABLE giveaways ADD COLUMN draw_seed TEXT",
+        "ALTER TABLE giveaways ADD COLUMN entry_count INTEGER",
+        "ALTER TABLE giveaways ADD COLUMN ended_at TIMESTAMP",
+        "CREATE INDEX IF NOT EXISTS idx_giveaways_status_end ON giveaways(status, end_time)",
+    ]),
+
+    (10, "Bucketed invite leaderboard counters", [
+        '''CREATE TABLE IF NOT EXISTS invite_counts
+           (bucket TEXT NOT NULL, inviter_id TEXT NOT NULL, invites INTEGER NOT NULL,
+            PRIMARY KEY (bucket, inviter_id)) WITHOUT ROWID''',
+        "CREATE INDEX IF NOT EXISTS idx_invite_counts_rank ON invite_counts(bucket, invites DESC, inviter_id)",
+        # How many inviters hold each count, so a rank sums a handful of distinct counts
+        '''CREATE TABLE IF NOT EXISTS invite_score_counts
+           (bucket TEXT NOT NULL, invites INTEGER NOT NULL, users INTEGER NOT NULL,
+            PRIMARY KEY (bucket, invites)) WITHOUT ROWID''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_invite_counts_ins AFTER INSERT ON invite_counts BEGIN
+              {_bump_score("NEW", 1)}
+            END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_invite_counts_upd AFTER UPDATE OF invites ON invite_counts BEGIN
+              {_bump_score("OLD", -1)}
+              {_bump_score("NEW", 1)}
+            END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_invite_counts_del AFTER DELETE ON invite_counts BEGIN
+              {_bump_score("OLD", -1)}
+            END''',
+        f'''INSERT INTO invite_counts (bucket, inviter_id, invites)
+           SELECT bucket, inviter_id, COUNT(*) FROM (
+             {" UNION ALL ".join(f"SELECT {bucket.format(row='invites')} AS bucket, inviter_id FROM invites WHERE inviter_id IS NOT NULL" for bucket in INVITE_BUCKETS)}
+           ) GROUP BY bucket, inviter_id''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_invites_count_ins AFTER INSERT ON invites
+            WHEN NEW.inviter_id IS NOT NULL BEGIN
+              {_count_invite("NEW")}
+            END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_invites_count_del AFTER DELETE ON invites
+            WHEN OLD.inviter_id IS NOT NULL BEGIN
+              {_uncount_invite("OLD")}
+            END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_invites_uncount_upd AFTER UPDATE OF inviter_id, created_at ON invites
+            WHEN OLD.inviter_id IS NOT NULL BEGIN
+              {_uncount_invite("OLD")}
+            END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_invites_count_upd AFTER UPDATE OF inviter_id, created_at ON invites
+            WHEN NEW.inviter_id IS NOT NULL BEGIN
+              {_count_invite("NEW")}
+            END''',
+    ]),
+
+    (11, "Settings change counter", _version_counter("settings")),
+
+    (12, "Content-addressed listing images", [
+        '''CREATE TABLE IF NOT EXISTS images
+           (digest TEXT PRIMARY KEY, mimetype TEXT NOT NULL, size INTEGER NOT NULL,
+            uploader_id TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP) WITHOUT ROWID''',
+    ]),
+
+    (13, "Webhook event log and premium expiry", [
+        '''CREATE TABLE IF NOT EXISTS webhook_events
+           (id INTEGER PRIMARY KEY AUTOINCREMENT, idempotency_key TEXT NOT NULL UNIQUE,
+            source TEXT NOT NULL, event_type TEXT NOT NULL, payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'processed', 'failed', 'ignored')),
+            result TEXT, received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, processed_at TIMESTAMP)''',
+        "CREATE INDEX IF NOT EXISTS idx_webhook_events_pending ON webhook_events(id) WHERE status = 'pending'",
+        "ALTER TABLE users ADD COLUMN premium_until TIMESTAMP",
+    ]),
+
+    (14, "Seller reputation index", [
+        '''CREATE TABLE IF NOT EXISTS seller_reputation
+           (seller_id TEXT PRIMARY KEY, vouch_count INTEGER NOT NULL DEFAULT 0,
+            rating_sum INTEGER NOT NULL DEFAULT 0, volume REAL NOT NULL DEFAULT 0,
+            decayed_score REAL NOT NULL DEFAULT 0, decayed_volume REAL NOT NULL DEFAULT 0,
+            bayes_rating REAL NOT NULL DEFAULT 3.5, last_vouch_at TIMESTAMP) WITHOUT ROWID''',
+        '''CREATE INDEX IF NOT EXISTS idx_seller_reputation_trust
+           ON seller_reputation(bayes_rating, decayed_score, seller_id)''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_r6_accounts_reputation_ins AFTER INSERT ON r6_accounts
+           WHEN NEW.seller_id IS NOT NULL BEGIN
+             INSERT OR IGNORE INTO seller_reputation (seller_id) VALUES (NEW.seller_id);
+           END''',
+    ] + REBUILD_SELLER_REPUTATION_SQL),
+
+    (15, "Seller reputation maintained by vouch triggers", [
+        "CREATE INDEX IF NOT EXISTS idx_vouches_author_target ON vouches(user_id, target_user_id)",
+    ] + SELLER_REPUTATION_TRIGGERS + REBUILD_SELLER_REPUTATION_SQL),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def _ensure_version_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version
+                    (version INTEGER PRIMARY KEY, description TEXT,
+                     applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+def get_current_version(conn):
+    """Get the applied schema version, 0 for an empty database"""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+def probe_version(conn):
+    """Read the schema version cached in the database header (no table access)"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def is_current(conn):
+    """Check whether every migration has been applied, trying the cached probe first"""
+    if probe_version(conn) >= LATEST_VERSION:
+        return True
+    return get_current_version(conn) >= LATEST_VERSION
+
+def migrate(conn, target=None):
+    """Apply pending migrations in order, one transaction per step"""
+    target = LATEST_VERSION if target is None else target
+    if get_current_version(conn) >= target:
+        _cache_version(conn)
+        return []
+
+    conn.isolation_level = None
+    _ensure_version_table(conn)
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if version > target:
+            break
+        # Take the write lock before re-checking so concurrent workers apply each step once
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_current_version(conn) >= version:
+                conn.execute("COMMIT")
+                continue
+            # A step is SQL, or a callable for backfills that need Python
+            for step in statements:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                         (version, description))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"Applied migration {version}: {description}")
+        applied.append(version)
+    _cache_version(conn)
+    return applied
+
+def _cache_version(conn):
+    """Mirror the applied version into PRAGMA user_version for cheap startup probes"""
+    conn.execute(f"PRAGMA user_version = {int(get_current_version(conn))}")
+
+def rebuild_user_stats(conn):
+    """Recompute the user_stats summary table from scratch in one transaction"""
+    conn.isolation_level = None
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for sql in REBUILD_USER_STATS_SQL:
+            conn.execute(sql)
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        conn.execute("ROLLBACK")
+        raise
+    return conn.execute("SELECT COUNT(*) FROM user_stats").fetchone()[0]
+
+def rebuild_seller_reputation(conn):
+    """Recompute the seller_reputation table from scratch in one transaction"""
+    conn.isolation_level = None
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for sql in REBUILD_SELLER_REPUTATION_SQL:
+            conn.execute(sql)
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        conn.execute("ROLLBACK")
+        raise
+    return conn.execute("SELECT COUNT(*) FROM seller_reputation").fetchone()[0]
+
+def get_status(conn):
+    """Get (version, description, applied_at) for every known migration"""
+    applied = {}
+    if get_current_version(conn):
+        applied = {row[0]: row[1] for row in
+                   conn.execute("SELECT version, applied_at FROM schema_version")}
+    return [(version, description, applied.get(version)) for version, description, _ in MIGRATIONS]
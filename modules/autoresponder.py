@@ -0,0 +1,207 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import deque
+
+from config import Config
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+class AhoCorasick:
+    """Aho-Corasick automaton matching many patterns in one pass over the text"""
+
+    def __init__(self, patterns):
+        # Node i: goto transitions, failure link, pattern ids ending here (incl. via suffix links)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        self._lengths = {}
+        for pattern_id, pattern in patterns:
+            self._add(pattern_id, pattern)
+        self._link()
+
+    def _add(self, pattern_id, pattern):
+        node = 0
+        for char in pattern:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        self._out[node] += (pattern_id,)
+        self._lengths[pattern_id] = len(pattern)
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                # Merge outputs along the suffix chain so search never walks it
+                self._out[child] += self._out[self._fail[child]]
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def iter_matches(self, text):
+        """Yield (pattern id, start, end) for every occurrence in text"""
+        goto, fail, out, lengths = self._goto, self._fail, self._out, self._lengths
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                end = index + 1
+                for pattern_id in out[node]:
+                    yield pattern_id, end - lengths[pattern_id], end
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+def _fold(text):
+    """Casefold text, with the original index of each folded character
+
+    The offsets are None when folding kept the length, which then means every
+    character folded to exactly one (casefold never drops characters).
+    """
+    folded = text.casefold()
+    if len(folded) == len(text):
+        return folded, None
+    offsets = []
+    for index, char in enumerate(text):
+        offsets.extend([index] * len(char.casefold()))
+    offsets.append(len(text))
+    return folded, offsets
+
+class AutoresponderEngine:
+    """Compiled matcher over all enabled autoresponder triggers"""
+
+    def __init__(self, triggers, version=None):
+        self.version = version
+        self.triggers = {trigger["id"]: trigger for trigger in triggers}
+        # Case-insensitive triggers are matched against casefolded text in a separate automaton
+        self._insensitive = AhoCorasick((t["id"], t["trigger_phrase"].casefold())
+                                        for t in triggers if not t["case_sensitive"])
+        self._sensitive = AhoCorasick((t["id"], t["trigger_phrase"])
+                                      for t in triggers if t["case_sensitive"])
+
+    def __len__(self):
+        return len(self.triggers)
+
+    def match(self, message):
+        """Find the triggers in a message, in order of first occurrence
+
+        Positions index the original message, even where folding changed the
+        length (e.g. "ß" folds to "ss").
+        """
+        found = {}
+        folded, offsets = _fold(message) if len(self._insensitive) else (None, None)
+        for automaton, text, text_offsets in ((self._insensitive, folded, offsets),
+                                              (self._sensitive, message, None)):
+            if not len(automaton):
+                continue
+            for trigger_id, start, end in automaton.iter_matches(text):
+                if trigger_id in found:
+                    continue
+                if text_offsets is not None:
+                    # A match that begins or ends inside one folded character is never a whole word
+                    split = ((start > 0 and text_offsets[start - 1] == text_offsets[start]) or
+                             text_offsets[end - 1] == text_offsets[end])
+                    start, end = text_offsets[start], text_offsets[end]
+                else:
+                    split = False
+                if self.triggers[trigger_id]["whole_word"] and (
+                        split or (start > 0 and _is_word_char(message[start - 1])) or
+                        (end < len(message) and _is_word_char(message[end]))):
+                    continue
+                found[trigger_id] = start
+        return [self._result(trigger_id, start)
+                for trigger_id, start in sorted(found.items(), key=lambda item: item[1])]
+
+    def match_many(self, messages):
+        """Match a batch of messages"""
+        return [self.match(message) for message in messages]
+
+    def _result(self, trigger_id, start):
+        trigger = self.triggers[trigger_id]
+        return {
+            "trigger_id": trigger_id,
+            "trigger": trigger["trigger_phrase"],
+            "response": trigger["response"],
+            "embed": trigger["embed"],
+            "position": start
+        }
+
+def _load_triggers(conn):
+    rows = conn.execute("""SELECT id, trigger_phrase, response, embed_enabled, embed_data,
+                                  case_sensitive, whole_word
+                           FROM autoresponder WHERE enabled = 1""").fetchall()
+    triggers = []
+    for row in rows:
+        if not row["trigger_phrase"]:
+            continue
+        embed = None
+        if row["embed_enabled"] and row["embed_data"]:
+            try:
+                embed = json.loads(row["embed_data"])
+            except ValueError:
+                logger.warning(f"Ignoring invalid embed_data on autoresponder {row['id']}")
+        triggers.append({
+            "id": row["id"], "trigger_phrase": row["trigger_phrase"], "response": row["response"],
+            "embed": embed, "case_sensitive": bool(row["case_sensitive"]),
+            "whole_word": bool(row["whole_word"])
+        })
+    return triggers
+
+def _table_version(conn):
+    row = conn.execute("SELECT version FROM table_versions WHERE name = 'autoresponder'").fetchone()
+    return row[0] if row else 0
+
+_engine = None
+_checked_at = 0.0
+_build_lock = threading.Lock()
+
+def get_engine():
+    """Get the compiled engine, rebuilding it when the autoresponder table changes
+
+    The table's change counter is checked at most every
+    AUTORESPONDER_CHECK_INTERVAL seconds. A rebuilt engine replaces the old one
+    in a single reference swap, so concurrent matches never see a partial build.
+    """
+    global _engine, _checked_at
+    now = time.monotonic()
+    if _engine is not None and now - _checked_at < Config.AUTORESPONDER_CHECK_INTERVAL:
+        return _engine
+
+    with _build_lock:
+        if _engine is not None and time.monotonic() - _checked_at < Config.AUTORESPONDER_CHECK_INTERVAL:
+            return _engine
+        conn = get_db_connection()
+        try:
+            version = _table_version(conn)
+            if _engine is None or _engine.version != version:
+                started = time.perf_counter()
+                engine = AutoresponderEngine(_load_triggers(conn), version)
+                logger.info(f"Compiled {len(engine)} autoresponder triggers in "
+                            f"{(time.perf_counter() - started) * 1000:.1f}ms (v{version})")
+                _engine = engine
+            _checked_at = time.monotonic()
+        except sqlite3.Error as e:
+            logger.error(f"Database error loading autoresponder triggers: {e}")
+            if _engine is None:
+                raise
+        finally:
+            conn.close()
+    return _engine
@@ -0,0 +1,349 @@
+import os
+import heapq
+import random
+import sqlite3
+import logging
+import secrets
+import threading
+from datetime import datetime, timezone
+
+from flask import jsonify
+
+from config import Config
+from database import get_db_connection, open_connection
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# An unfinished draw claimed longer ago than this is presumed abandoned
+CLAIM_TIMEOUT_SECONDS = 300
+
+def parse_end_time(value):
+    """Parse an ISO timestamp (naive means UTC) into an aware UTC datetime"""
+    moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+def draw_winners(entries, winners_count, seed):
+    """Reservoir-sample winners from an entry stream in O(winners_count) memory
+
+    Entries must arrive in a stable order (the entries primary key), so anyone
+    holding the seed and the entry list can re-run the draw and get the same
+    winners. Returns (winners in draw order, number of entries seen).
+    """
+    rng = random.Random(seed)
+    reservoir = []
+    seen = 0
+    for user_id in entries:
+        if seen < winners_count:
+            reservoir.append(user_id)
+        else:
+            slot = rng.randrange(seen + 1)
+            if slot < winners_count:
+                reservoir[slot] = user_id
+        seen += 1
+    return reservoir, seen
+
+def _stream_entries(conn, giveaway_id):
+    cursor = conn.execute("SELECT user_id FROM giveaway_entries WHERE giveaway_id = ? ORDER BY user_id",
+                          (giveaway_id,))
+    while True:
+        rows = cursor.fetchmany(Config.GIVEAWAY_FETCH_SIZE)
+        if not rows:
+            return
+        for row in rows:
+            yield row[0]
+
+def end_giveaway(giveaway_id, conn=None, seed=None):
+    """End a giveaway and draw its winners exactly once
+
+    A single UPDATE claims the giveaway by storing its seed, which also closes
+    entries. The draw then reads a snapshot without holding the write lock, and
+    a short transaction records the winners. Workers that lose the claim read
+    back the current record. A claim left behind by a crashed worker can be
+    taken over after CLAIM_TIMEOUT_SECONDS; the stored seed and the closed
+    entry list make that draw identical. Returns the giveaway's draw record,
+    or None if it does not exist.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = open_connection()
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        claimed = conn.execute("""UPDATE giveaways SET draw_seed = COALESCE(draw_seed, ?), ended_at = CURRENT_TIMESTAMP
+                                  WHERE id = ? AND status = 'active'
+                                    AND (draw_seed IS NULL OR ended_at IS NULL OR ended_at < datetime('now', ?))""",
+                               (seed or secrets.token_hex(16), giveaway_id,
+                                f"-{CLAIM_TIMEOUT_SECONDS} seconds")).rowcount
+        if not claimed:
+            return get_draw(conn, giveaway_id)
+
+        try:
+            conn.execute("BEGIN")
+            try:
+                row = conn.execute("SELECT winners_count, draw_seed FROM giveaways WHERE id = ?",
+                                   (giveaway_id,)).fetchone()
+                seed = row["draw_seed"]
+                winners, entry_count = draw_winners(_stream_entries(conn, giveaway_id),
+                                                    row["winners_count"] or 1, seed)
+            finally:
+                if conn.in_transaction:
+                    conn.execute("COMMIT")
+
+            conn.execute("BEGIN IMMEDIATE")
+            ended = conn.execute("""UPDATE giveaways SET status = 'ended', entry_count = ?,
+                                    ended_at = CURRENT_TIMESTAMP
+                                    WHERE id = ? AND status = 'active' AND draw_seed = ?""",
+                                 (entry_count, giveaway_id, seed)).rowcount
+            if ended:
+                conn.executemany("INSERT INTO giveaway_winners (giveaway_id, position, user_id) VALUES (?, ?, ?)",
+                                 [(giveaway_id, position, user_id) for position, user_id in enumerate(winners, 1)])
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Release the claim so the next attempt need not wait out the timeout
+            try:
+                conn.execute("UPDATE giveaways SET ended_at = NULL WHERE id = ? AND status = 'active'",
+                             (giveaway_id,))
+            except sqlite3.Error as e:
+                logger.warning(f"Could not release the claim on giveaway {giveaway_id}: {e}")
+            raise
+        if ended:
+            logger.info(f"Ended giveaway {giveaway_id}: {len(winners)} winners from {entry_count} entries")
+        return get_draw(conn, giveaway_id)
+    finally:
+        conn.isolation_level = previous_isolation
+        if own_conn:
+            conn.close()
+
+def get_draw(conn, giveaway_id):
+    """Load a giveaway's status and (if ended) its auditable draw record"""
+    row = conn.execute("""SELECT id, title, prize, winners_count, end_time, status, draw_seed,
+                                 entry_count, ended_at
+                          FROM giveaways WHERE id = ?""", (giveaway_id,)).fetchone()
+    if row is None:
+        return None
+    draw = dict(row)
+    draw["winners"] = [r[0] for r in conn.execute(
+        "SELECT user_id FROM giveaway_winners WHERE giveaway_id = ? ORDER BY position", (giveaway_id,))]
+    if row["status"] == "active":
+        draw["entry_count"] = conn.execute("SELECT COUNT(*) FROM giveaway_entries WHERE giveaway_id = ?",
+                                           (giveaway_id,)).fetchone()[0]
+    return draw
+
+def verify_draw(conn, giveaway_id):
+    """Re-run an ended giveaway's draw from its stored seed and compare winners"""
+    draw = get_draw(conn, giveaway_id)
+    if draw is None or draw["status"] != "ended" or not draw["draw_seed"]:
+        return False
+    winners, entry_count = draw_winners(_stream_entries(conn, giveaway_id),
+                                        draw["winners_count"] or 1, draw["draw_seed"])
+    return winners == draw["winners"] and entry_count == draw["entry_count"]
+
+class GiveawayScheduler:
+    """Heap of pending end times served by one thread that sleeps until the next one
+
+    Every worker runs a scheduler; end_giveaway's claim makes the duplicates
+    harmless. Giveaways created by other workers are picked up on the periodic
+    resync.
+    """
+
+    def __init__(self, resync_interval):
+        self.resync_interval = resync_interval
+        self.pid = os.getpid()
+        self._heap = []
+        self._scheduled = {}
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="giveaway-scheduler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def schedule(self, giveaway_id, end_time):
+        """Add or move a giveaway's end time, waking the thread if it is now the earliest"""
+        due = parse_end_time(end_time).timestamp()
+        with self._cond:
+            if self._scheduled.get(giveaway_id) == due:
+                return
+            self._scheduled[giveaway_id] = due
+            heapq.heappush(self._heap, (due, giveaway_id))
+            if self._heap[0] == (due, giveaway_id):
+                self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _resync(self):
+        # Its own connection: the pool is sized for request threads only
+        conn = open_connection()
+        try:
+            rows = conn.execute("""SELECT id, end_time FROM giveaways
+                                   WHERE status = 'active' AND end_time IS NOT NULL
+                                   ORDER BY end_time""").fetchall()
+        finally:
+            conn.close()
+        for row in rows:
+            try:
+                self.schedule(row["id"], row["end_time"])
+            except ValueError:
+                logger.warning(f"Giveaway {row['id']} has an unparseable end_time: {row['end_time']}")
+
+    def _pop_due(self, now):
+        """Pop every giveaway due by now, skipping entries superseded by a reschedule"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, giveaway_id = heapq.heappop(self._heap)
+            if self._scheduled.get(giveaway_id) == when:
+                del self._scheduled[giveaway_id]
+                due.append(giveaway_id)
+        return due
+
+    def _run(self):
+        next_resync = 0.0
+        while True:
+            now = datetime.now(timezone.utc).timestamp()
+            if now >= next_resync:
+                try:
+                    self._resync()
+                except Exception as e:
+                    # Keep the thread alive; the next resync tries again
+                    logger.exception(f"Giveaway scheduler resync failed: {e}")
+                next_resync = now + self.resync_interval
+
+            with self._cond:
+                if self._stopped:
+                    return
+                due = self._pop_due(datetime.now(timezone.utc).timestamp())
+                if not due:
+                    wake_at = min(self._heap[0][0], next_resync) if self._heap else next_resync
+                    self._cond.wait(max(0.0, wake_at - datetime.now(timezone.utc).timestamp()))
+                    continue
+
+            for giveaway_id in due:
+                try:
+                    end_giveaway(giveaway_id)
+                except Exception as e:
+                    logger.exception(f"Failed to end giveaway {giveaway_id}: {e}")
+                    # Retry on the next resync
+                    next_resync = 0.0
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Get (starting if needed) this process's giveaway scheduler"""
+    global _scheduler
+    pid = os.getpid()
+    if _scheduler is None or _scheduler.pid != pid:
+        with _scheduler_lock:
+            if _scheduler is None or _scheduler.pid != pid:
+                _scheduler = GiveawayScheduler(Config.GIVEAWAY_RESYNC_INTERVAL).start()
+    return _scheduler
+
+class GiveawayService:
+    @staticmethod
+    def create_giveaway(data):
+        """Create a giveaway and schedule its end"""
+        from services import validate_input
+        conn = None
+        try:
+            if not data:
+                return jsonify({"error": "No data provided"}), 400
+            
+            errors = validate_input(data, ["title", "prize", "winners_count", "end_time"])
+            if errors:
+                return jsonify({"error": "Validation failed", "details": errors}), 400
+            
+            try:
+                winners_count = int(data["winners_count"])
+                end_time = parse_end_time(data["end_time"])
+                if winners_count < 1:
+                    return jsonify({"error": "winners_count must be at least 1"}), 400
+            except (ValueError, TypeError):
+                return jsonify({"error": "Invalid winners_count or end_time"}), 400
+            
+            end_time_text = end_time.strftime(TIMESTAMP_FORMAT)
+            conn = get_db_connection()
+            c = conn.cursor()
+            c.execute("""INSERT INTO giveaways (title, description, prize, winners_count, end_time, channel_id)
+                         VALUES (?, ?, ?, ?, ?, ?)""",
+                      (data["title"], data.get("description", ""), data["prize"], winners_count,
+                       end_time_text, data.get("channel_id")))
+            giveaway_id = c.lastrowid
+            conn.commit()
+            
+            if Config.GIVEAWAY_SCHEDULER:
+                get_scheduler().schedule(giveaway_id, end_time_text)
+            return jsonify({"success": True, "giveaway_id": giveaway_id, "end_time": end_time_text})
+            
+        except sqlite3.Error as e:
+            logger.error(f"Database error creating giveaway: {e}")
+            return jsonify({"error": "Database error"}), 500
+        finally:
+            if conn:
+                conn.close()
+    
+    @staticmethod
+    def enter_giveaway(giveaway_id, user_id):
+        """Enter a user into an active giveaway (entering twice is a no-op)"""
+        conn = None
+        try:
+            conn = get_db_connection()
+            c = conn.cursor()
+            c.execute("""INSERT OR IGNORE INTO giveaway_entries (giveaway_id, user_id)
+                         SELECT id, ? FROM giveaways
+                         WHERE id = ? AND status = 'active' AND draw_seed IS NULL AND end_time > ?""",
+                      (user_id, giveaway_id, datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)))
+            entered = c.rowcount > 0
+            conn.commit()
+            
+            if not entered:
+                exists = c.execute("""SELECT 1 FROM giveaway_entries WHERE giveaway_id = ? AND user_id = ?""",
+                                   (giveaway_id, user_id)).fetchone()
+                if not exists:
+                    return jsonify({"error": "Giveaway is not open for entries"}), 409
+            return jsonify({"success": True, "entered": entered})
+            
+        except sqlite3.Error as e:
+            logger.error(f"Database error entering giveaway: {e}")
+            return jsonify({"error": "Database error"}), 500
+        finally:
+            if conn:
+                conn.close()
+    
+    @staticmethod
+    def end_giveaway(giveaway_id):
+        """End a giveaway now; repeated calls return the original draw"""
+        try:
+            draw = end_giveaway(giveaway_id)
+            if draw is None:
+                return jsonify({"error": "Giveaway not found"}), 404
+            return jsonify(draw)
+        except sqlite3.Error as e:
+            logger.error(f"Database error ending giveaway: {e}")
+            return jsonify({"error": "Database error"}), 500
+    
+    @staticmethod
+    def get_giveaway(giveaway_id):
+        """Get a giveaway's status and draw record"""
+        conn = None
+        try:
+            conn = get_db_connection()
+            draw = get_draw(conn, giveaway_id)
+            if draw is None:
+                return jsonify({"error": "Giveaway not found"}), 404
+            return jsonify(draw)
+        except sqlite3.Error as e:
+            logger.error(f"Database error getting giveaway: {e}")
+            return jsonify({"error": "Database error"}), 500
+        finally:
+            if conn:
+                conn.close()
@@ -0,0 +1,193 @@
+import os
+import math
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+from flask import request, session, jsonify
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+class RateLimitConfigError(ValueError):
+    """Raised for malformed RATE_LIMITS entries"""
+
+def parse_rules(spec):
+    """Parse "endpoint:scope=count/period,..." into {endpoint: ((scope, capacity, rate), ...)}
+
+    scope is "user" (falls back to the client IP when logged out) or "ip";
+    period is seconds or one of second/minute/hour/day. Each rule is a token
+    bucket holding count tokens that refills at count/period per second.
+    """
+    rules = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            target, limit = entry.split("=")
+            endpoint, scope = target.split(":")
+            count, period = limit.split("/")
+            count = int(count)
+            seconds = _PERIODS[period] if period in _PERIODS else float(period)
+        except (ValueError, KeyError):
+            raise RateLimitConfigError(f"Invalid rate limit rule: {entry!r}")
+        if scope not in ("user", "ip") or count < 1 or seconds <= 0:
+            raise RateLimitConfigError(f"Invalid rate limit rule: {entry!r}")
+        rules.setdefault(endpoint.strip(), []).append((scope, count, count / seconds))
+    return {endpoint: tuple(endpoint_rules) for endpoint, endpoint_rules in rules.items()}
+
+class MemoryBucketStore:
+    """Per-process token buckets: two floats per key, least recently used evicted first
+
+    An evicted key simply starts again with a full bucket, so the bound on
+    memory only ever errs towards letting a quiet client through.
+    """
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"allowed": 0, "limited": 0, "evictions": 0}
+
+    def take(self, key, capacity, rate, now=None):
+        """Take one token; returns 0 if allowed, else seconds until a token is available"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(capacity), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                    self.stats["evictions"] += 1
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                self.stats["allowed"] += 1
+                return 0
+            self.stats["limited"] += 1
+            return (1 - bucket[0]) / rate
+
+    def get_stats(self):
+        return {**self.stats, "keys": len(self._buckets)}
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file shared by every worker on the host
+
+    Kept out of the main database so limiter writes never contend with app
+    writes. Each check is one atomic upsert; idle (full) buckets are swept
+    periodically so the table stays proportional to active clients.
+    """
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self, path, max_idle):
+        self.path = path
+        self.max_idle = max_idle
+        self._local = threading.local()
+        self._checks = 0
+        self.stats = {"allowed": 0, "limited": 0, "errors": 0}
+        conn = self._connection()
+        conn.execute("""CREATE TABLE IF NOT EXISTS rate_buckets
+                        (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) WITHOUT ROWID""")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, capacity, rate, now=None):
+        """Take one token; returns 0 if allowed, else seconds until a token is available"""
+        now = time.time() if now is None else now
+        conn = self._connection()
+        try:
+            # The WHERE leaves an empty bucket untouched, so no row comes back
+            row = conn.execute("""INSERT INTO rate_buckets (key, tokens, updated) VALUES (?1, ?2 - 1, ?4)
+                                  ON CONFLICT (key) DO UPDATE
+                                    SET tokens = MIN(?2, tokens + (?4 - updated) * ?3) - 1, updated = ?4
+                                    WHERE MIN(?2, tokens + (?4 - updated) * ?3) >= 1
+                                  RETURNING tokens""", (key, capacity, rate, now)).fetchone()
+            if row is None:
+                tokens, updated = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?",
+                                               (key,)).fetchone()
+                self.stats["limited"] += 1
+                return (1 - min(capacity, tokens + (now - updated) * rate)) / rate
+            self.stats["allowed"] += 1
+            self._checks += 1
+            if self._checks % self.SWEEP_EVERY == 0:
+                conn.execute("DELETE FROM rate_buckets WHERE updated < ?", (now - self.max_idle,))
+            return 0
+        except sqlite3.Error as e:
+            # Fail open: a limiter outage must not take the endpoints down with it
+            self.stats["errors"] += 1
+            logger.error(f"Rate limit store error: {e}")
+            return 0
+
+    def get_stats(self):
+        return dict(self.stats)
+
+def client_ip():
+    """Client address, trusting RATE_LIMIT_TRUSTED_PROXIES hops of X-Forwarded-For"""
+    hops = Config.RATE_LIMIT_TRUSTED_PROXIES
+    if hops:
+        forwarded = [part.strip() for part in request.headers.get("X-Forwarded-For", "").split(",") if part.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.remote_addr or "unknown"
+
+class RateLimiter:
+    """Per-endpoint token buckets checked before the view runs"""
+
+    def __init__(self, rules, store):
+        self.rules = rules
+        self.store = store
+
+    def check(self):
+        rules = self.rules.get(request.endpoint)
+        if rules is None:
+            return None
+        ip = None
+        for scope, capacity, rate in rules:
+            user = session.get("user") if scope == "user" else None
+            if user:
+                key = f"{request.endpoint}:u:{user['id']}"
+            else:
+                ip = ip or client_ip()
+                key = f"{request.endpoint}:ip:{ip}"
+            retry_after = self.store.take(key, capacity, rate)
+            if retry_after:
+                response = jsonify({"error": "Too many requests", "retry_after": round(retry_after, 1)})
+                response.status_code = 429
+                response.headers["Retry-After"] = str(math.ceil(retry_after))
+                return response
+        return None
+
+    def get_stats(self):
+        return self.store.get_stats()
+
+def create_store():
+    """Build the bucket store named by RATE_LIMIT_STORAGE ("memory" or "sqlite:///path")"""
+    storage = Config.RATE_LIMIT_STORAGE
+    if storage.startswith("sqlite:///"):
+        return SQLiteBucketStore(storage[len("sqlite:///"):], max_idle=Config.RATE_LIMIT_MAX_IDLE)
+    if storage != "memory":
+        raise RateLimitConfigError(f"Unknown RATE_LIMIT_STORAGE: {storage}")
+    return MemoryBucketStore(Config.RATE_LIMIT_MAX_KEYS)
+
+def init_app(app):
+    """Install the limiter as a before_request hook; returns it (or None when disabled)"""
+    if not Config.RATE_LIMIT_ENABLED:
+        return None
+    limiter = RateLimiter(parse_rules(Config.RATE_LIMITS), create_store())
+    app.before_request(limiter.check)
+    app.extensions["rate_limiter"] = limiter
+    return limiter
@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+
+# Bayesian average: every seller starts with PRIOR_VOTES imaginary PRIOR_RATING vouches
+PRIOR_VOTES = 5
+PRIOR_RATING = 3.5
+
+# Time decay is stored "forward-weighted": a vouch at time t adds 2 ** ((t - EPOCH) / HALF_LIFE)
+# times its value, so nothing is rewritten as time passes and the stored totals rank
+# sellers exactly as their decayed values would. Divide by decay_weight(now) to read a
+# present-day value. Weights overflow a double after ~1000 half-lives (about 84 years at
+# 30 days, less for large prices), so EPOCH must be moved forward and the table rebuilt
+# (manage.py rebuild-reputation) long before then.
+HALF_LIFE_DAYS = 30
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+# Only an author's first few vouches for a seller count, so one buyer cannot farm a
+# rating; self-vouches never count.
+MAX_VOUCHES_PER_AUTHOR = 3
+
+# The seller_reputation triggers and rebuild live in migrations.py as plain SQL with
+# these values written out; changing any of them needs a migration that recreates
+# the triggers and rebuilds the table.
+
+def _to_datetime(value):
+    if value is None:
+        return datetime.now(timezone.utc)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def decay_weight(when=None):
+    """Forward weight of an event at when (datetime or SQLite timestamp, default now)"""
+    elapsed = (_to_datetime(when) - EPOCH).total_seconds()
+    return 2.0 ** (elapsed / (HALF_LIFE_DAYS * 86400))
+
+def present_value(forward_value, now=None):
+    """Convert a forward-weighted total into its decayed value as of now"""
+    return (forward_value or 0) / decay_weight(now)
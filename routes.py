@@ -1,14 +1,37 @@
-from flask import render_template, session, redirect, url_for, request, jsonify, flash
-from auth import require_login, authenticate_with_discord
+from flask import render_template, session, redirect, url_for, request, jsonify, flash, Response, send_file, abort
+from auth import require_login, require_admin, authenticate_with_discord
 from config import Config
-from services import DashboardService, TicketService, VouchService, MarketplaceService
+from cache import get_cache_stats
+from http_cache import conditional, init_app as init_http_cache
+from database import get_pool_stats
+from settings import settings as app_settings
+from lazy import lazy_import
+import metrics
+import ratelimit
+import os
+import hmac
+import sqlite3
 import logging
 
+# Imported on first use to keep cold starts fast
+services = lazy_import("services")
+importers = lazy_import("importers")
+exports = lazy_import("exports")
+write_queue = lazy_import("write_queue")
+autoresponder = lazy_import("modules.autoresponder")
+images = lazy_import("images")
+giveaways = lazy_import("modules.giveaways")
+webhooks = lazy_import("webhooks")
+
 logger = logging.getLogger(__name__)
 
 def register_routes(app):
     """Register all application routes"""
     
+    metrics.init_app(app)
+    init_http_cache(app)
+    limiter = ratelimit.init_app(app)
+    
     @app.route("/")
     def index():
         if session.get("user"):
@@ -57,7 +80,7 @@ def register_routes(app):
     @require_login
     def dashboard():
         user = session.get("user")
-        stats = DashboardService.get_user_stats(user["id"])
+        stats = services.DashboardService.get_user_stats(user["id"])
         return render_template("dashboard.html", user=user, stats=stats)
 
     # Tickets Routes
@@ -65,7 +88,7 @@ def register_routes(app):
     @require_login
     def tickets():
         user = session.get("user")
-        user_tickets = TicketService.get_user_tickets(user["id"])
+        user_tickets = services.TicketService.get_user_tickets(user["id"])
         return render_template("tickets.html", user=user, tickets=user_tickets)
 
     @app.route("/api/tickets/create", methods=["POST"])
@@ -73,14 +96,14 @@ def register_routes(app):
     def create_ticket():
         data = request.get_json()
         user = session.get("user")
-        return TicketService.create_ticket(user["id"], data)
+        return services.TicketService.create_ticket(user["id"], data)
 
     # Vouches Routes
     @app.route("/vouches")
     @require_login
     def vouches():
         user = session.get("user")
-        user_vouches = VouchService.get_user_vouches(user["id"])
+        user_vouches = services.VouchService.get_user_vouches(user["id"])
         return render_template("vouches.html", user=user, vouches=user_vouches)
 
     @app.route("/api/vouches/create", methods=["POST"])
@@ -88,7 +111,7 @@ def register_routes(app):
     def create_vouch():
         data = request.get_json()
         user = session.get("user")
-        return VouchService.create_vouch(user["id"], data)
+        return services.VouchService.create_vouch(user["id"], data)
 
     # Marketplace Routes
     @app.route("/marketplace")
@@ -98,13 +121,209 @@ def register_routes(app):
 
     @app.route("/api/marketplace/accounts", methods=["GET", "POST"])
     @require_login
+    @conditional("r6_accounts", "vouches")
     def marketplace_accounts():
         if request.method == "POST":
             data = request.get_json()
             user = session.get("user")
-            return MarketplaceService.create_account_listing(user["id"], data)
+            return services.MarketplaceService.create_account_listing(user["id"], data)
         else:
-            return MarketplaceService.get_accounts()
+            return services.MarketplaceService.get_accounts(request.args)
+
+    @app.route("/api/marketplace/accounts/import", methods=["POST"])
+    @require_login
+    def import_marketplace_accounts():
+        user = session.get("user")
+        upload = request.files.get("file")
+        try:
+            if upload:
+                fmt = importers.detect_format(request.args.get("format"), upload.mimetype, upload.filename)
+                stream = upload.stream
+            else:
+                fmt = importers.detect_format(request.args.get("format"), request.content_type)
+                stream = request.stream
+        except importers.ImportFormatError as e:
+            return jsonify({"error": str(e)}), 400
+        return services.MarketplaceService.import_account_listings(user["id"], stream, fmt)
+
+    @app.route("/api/marketplace/accounts/<int:listing_id>/images", methods=["POST"])
+    @require_login
+    def upload_listing_images(listing_id):
+        user = session.get("user")
+        return services.MarketplaceService.add_listing_images(user["id"], listing_id,
+                                                              request.files.getlist("images"))
+
+    @app.route("/media/<digest>")
+    @app.route("/media/<digest>/<variant>")
+    def media(digest, variant=None):
+        # Content-addressed, so the URL names the bytes: strong ETag, Range and
+        # immutable caching. A variant not rendered yet falls back to the
+        # original, which must not be cached under the variant's URL.
+        if not images.DIGEST_PATTERN.match(digest) or (variant and variant not in images.VARIANTS):
+            abort(404)
+        path = images.image_path(digest, variant)
+        fallback = variant is not None and not os.path.exists(path)
+        if fallback:
+            variant, path = None, images.image_path(digest)
+        try:
+            with open(path, "rb") as f:
+                mimetype = "image/jpeg" if variant else images.sniff_mimetype(f.read(16))
+        except OSError:
+            abort(404)
+        
+        response = send_file(path, mimetype=mimetype, conditional=True,
+                             etag=f"{digest}-{variant or 'original'}")
+        # Uploads are sniffed, but browsers must not second-guess the type either
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        if fallback:
+            response.headers["Cache-Control"] = "public, no-cache"
+        else:
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+    @app.route("/api/marketplace/search")
+    @require_login
+    @conditional("r6_accounts")
+    def marketplace_search():
+        return services.MarketplaceService.search_accounts(request.args)
+
+    # Autoresponder Routes
+    @app.route("/api/autoresponder/match", methods=["POST"])
+    @require_login
+    def autoresponder_match():
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Expected a JSON object"}), 400
+        messages = data.get("messages")
+        message = data.get("message")
+        if messages is None and not isinstance(message, str):
+            return jsonify({"error": "message or messages is required"}), 400
+        if messages is not None and (not isinstance(messages, list) or
+                                     not all(isinstance(m, str) for m in messages)):
+            return jsonify({"error": "messages must be a list of strings"}), 400
+        if messages is not None and len(messages) > Config.AUTORESPONDER_MAX_BATCH:
+            return jsonify({"error": f"At most {Config.AUTORESPONDER_MAX_BATCH} messages per batch"}), 400
+        
+        try:
+            engine = autoresponder.get_engine()
+        except sqlite3.Error:
+            return jsonify({"error": "Database error"}), 500
+        if messages is not None:
+            return jsonify({"results": engine.match_many(messages), "version": engine.version})
+        return jsonify({"matches": engine.match(message), "version": engine.version})
+
+    # Leaderboard Routes
+    @app.route("/api/leaderboard/invites")
+    @require_login
+    @conditional("invites", per_user=True,
+                 key=lambda: services.current_invite_bucket(request.args))
+    def invite_leaderboard():
+        user = session.get("user")
+        return services.LeaderboardService.get_invite_leaderboard(user["id"], request.args)
+
+    # Giveaway Routes
+    @app.route("/api/giveaways", methods=["POST"])
+    @require_login
+    @require_admin
+    def create_giveaway():
+        return giveaways.GiveawayService.create_giveaway(request.get_json(silent=True))
+
+    @app.route("/api/giveaways/<int:giveaway_id>")
+    @require_login
+    def get_giveaway(giveaway_id):
+        return giveaways.GiveawayService.get_giveaway(giveaway_id)
+
+    @app.route("/api/giveaways/<int:giveaway_id>/enter", methods=["POST"])
+    @require_login
+    def enter_giveaway(giveaway_id):
+        user = session.get("user")
+        return giveaways.GiveawayService.enter_giveaway(giveaway_id, user["id"])
+
+    @app.route("/api/giveaways/<int:giveaway_id>/end", methods=["POST"])
+    @require_login
+    @require_admin
+    def end_giveaway(giveaway_id):
+        return giveaways.GiveawayService.end_giveaway(giveaway_id)
+
+    # Webhook Routes
+    @app.route("/webhooks/sellhub", methods=["POST"])
+    def sellhub_webhook():
+        if (request.content_length or 0) > Config.WEBHOOK_MAX_BYTES:
+            return jsonify({"error": "Payload too large"}), 413
+        # Chunked bodies carry no Content-Length, so the limit is enforced while reading
+        body = webhooks.read_limited(request.stream, Config.WEBHOOK_MAX_BYTES)
+        if body is None:
+            return jsonify({"error": "Payload too large"}), 413
+        return webhooks.receive_sellhub(request.headers, body)
+
+    # Settings Routes
+    @app.route("/api/settings", methods=["GET"])
+    @require_login
+    @require_admin
+    def get_settings():
+        keys = request.args.get("keys")
+        return jsonify(app_settings.get_many(keys.split(",") if keys else None))
+
+    @app.route("/api/settings", methods=["POST"])
+    @require_login
+    @require_admin
+    def update_settings():
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data:
+            return jsonify({"error": "Expected a JSON object of settings"}), 400
+        try:
+            app_settings.set_many(data)
+        except sqlite3.Error as e:
+            logger.error(f"Database error updating settings: {e}")
+            return jsonify({"error": "Database error"}), 500
+        return jsonify({"success": True, "updated": len(data)})
+
+    # Export Routes
+    @app.route("/api/export/<kind>")
+    @require_login
+    def export(kind):
+        user = session.get("user")
+        try:
+            kind, fmt, since, until = exports.parse_export_request(kind, request.args)
+        except exports.ExportError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        response = Response(exports.stream_export(user["id"], kind, fmt, since, until),
+                            mimetype=exports.EXPORT_FORMATS[fmt])
+        response.headers["Content-Disposition"] = f"attachment; filename={kind}.{fmt}"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    @app.route("/api/cache/stats")
+    @require_login
+    @require_admin
+    def cache_stats():
+        return jsonify(get_cache_stats())
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        # Never public: without a token configured there is no way to scrape
+        if not Config.METRICS_TOKEN:
+            return jsonify({"error": "Metrics are disabled; set METRICS_TOKEN"}), 404
+        if not hmac.compare_digest(request.headers.get("Authorization", "").encode(),
+                                   f"Bearer {Config.METRICS_TOKEN}".encode()):
+            return jsonify({"error": "Unauthorized"}), 401
+        
+        gauges = {"iceai_db_pool": get_pool_stats(),
+                  "iceai_startup_seconds": app.config.get("STARTUP_TIMINGS", {})}
+        for name, stats in get_cache_stats().items():
+            gauges[f"iceai_cache_{name}"] = stats
+        gauges["iceai_settings"] = app_settings.get_stats()
+        # Scraping must not start background threads, so only report ones already running
+        processor = webhooks.running_processor()
+        if processor is not None:
+            gauges["iceai_webhooks"] = processor.get_stats()
+        if limiter is not None:
+            gauges["iceai_rate_limiter"] = limiter.get_stats()
+        writer = write_queue.running_write_queue()
+        if writer is not None:
+            gauges["iceai_write_queue"] = writer.get_stats()
+        return Response(metrics.render_metrics(gauges), mimetype="text/plain; version=0.0.4")
 
     # Simple template routes
     template_routes = [
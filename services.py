@@ -1,10 +1,32 @@
+import re
+import json
+import math
 import sqlite3
 import logging
+from datetime import datetime, timezone
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from flask import jsonify
+from config import Config
 from database import get_db_connection
+from cache import stats_cache, listings_cache
+from http_cache import get_data_version
+from listings import (ListingQueryError, parse_listing_query, build_listing_sql,
+                      encode_cursor, row_to_listing, parse_search_query, build_search_sql,
+                      highlight_snippet)
+from importers import ImportFormatError, iter_rows
+import images
+from write_queue import WriteQueueFull, get_write_queue
 
 logger = logging.getLogger(__name__)
 
+INSERT_LISTING_SQL = """INSERT INTO r6_accounts 
+                        (seller_id, title, rank, level, operators_count, renown, r6_credits, price, description) 
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+LISTING_FIELDS = ("title", "rank", "level", "price", "operators", "renown", "credits", "description")
+# Largest integer SQLite can store
+MAX_INTEGER = 2 ** 63 - 1
+
 def validate_input(data, required_fields):
     """Validate input data"""
     errors = []
@@ -13,46 +35,133 @@ def validate_input(data, required_fields):
             errors.append(f"{field} is required")
     return errors
 
+def execute_insert(sql, params):
+    """Run an INSERT and return its row id, group-committed when write-behind is on"""
+    write_queue = get_write_queue()
+    if write_queue is not None:
+        future = write_queue.submit(sql, params)
+        try:
+            return future.result(timeout=Config.WRITE_RESULT_TIMEOUT)
+        except FutureTimeoutError:
+            # Withdraw the insert so a 503 never hides a row written later; one the
+            # writer already started is in a transaction about to finish, so wait
+            if future.cancel():
+                raise
+            return future.result()
+    
+    conn = get_db_connection()
+    try:
+        c = conn.cursor()
+        c.execute(sql, params)
+        conn.commit()
+        return c.lastrowid
+    finally:
+        conn.close()
+
+def validate_listing(data):
+    """Validate listing fields, returning (insert values, error, details)"""
+    if not data:
+        return None, "No data provided", None
+    if not isinstance(data, dict):
+        return None, "Expected a JSON object", None
+    
+    # Objects and arrays cannot be stored in a column (NDJSON rows may carry them)
+    nested = [f"{field} must be a single value" for field in LISTING_FIELDS
+              if isinstance(data.get(field), (dict, list))]
+    if nested:
+        return None, "Validation failed", nested
+        
+    errors = validate_input(data, ["title", "rank", "level", "price"])
+    if errors:
+        return None, "Validation failed", errors
+        
+    # Validate numeric fields
+    try:
+        level = int(data["level"])
+        price = float(data["price"])
+        operators = int(data.get("operators", 0))
+        renown = int(data.get("renown", 0))
+        credits = int(data.get("credits", 0))
+        
+        if any(val < 0 for val in [level, price, operators, renown, credits]):
+            return None, "Numeric values must be non-negative", None
+        if any(val > MAX_INTEGER for val in [level, operators, renown, credits]) or not math.isfinite(price):
+            return None, "Numeric values are too large", None
+            
+    except (ValueError, TypeError, OverflowError):
+        return None, "Invalid numeric values", None
+        
+    return (str(data["title"]), str(data["rank"]), level, operators, renown, credits, price,
+            str(data.get("description") or "")), None, None
+
+def _empty_stats():
+    """Default dashboard stats for users with no activity"""
+    return {"vouches": 0, "tickets": 0, "invites": 0, "accounts_listed": 0,
+            "total_trades": 0, "total_earnings": 0, "avg_rating": 0, "member_since": "2024"}
+
+# Leaderboard windows -> (strftime pattern for the current period, period validator)
+INVITE_WINDOWS = {
+    "all": (None, None),
+    "week": ("%Y-W%W", re.compile(r"^\d{4}-W\d{2}$")),
+    "month": ("%Y-%m", re.compile(r"^\d{4}-\d{2}$")),
+}
+LEADERBOARD_MAX_LIMIT = 100
+
+def invite_bucket(window, period=None):
+    """Map a leaderboard window (and optional period) to its invite_counts bucket"""
+    if window not in INVITE_WINDOWS:
+        raise ValueError(f"window must be one of: {', '.join(INVITE_WINDOWS)}")
+    pattern, validator = INVITE_WINDOWS[window]
+    if pattern is None:
+        return "all"
+    if period is None:
+        period = datetime.now(timezone.utc).strftime(pattern)
+    elif not validator.match(period):
+        raise ValueError(f"Invalid {window} period: {period}")
+    return f"{window}:{period}"
+
+def current_invite_bucket(params):
+    """The bucket a leaderboard request resolves to now, or None if its parameters are invalid"""
+    try:
+        return invite_bucket(params.get("window", "all"), params.get("period"))
+    except ValueError:
+        return None
+
 class DashboardService:
     @staticmethod
     def get_user_stats(user_id):
         """Get user statistics for dashboard"""
+        cached = stats_cache.get(str(user_id))
+        if cached is not None:
+            return dict(cached)
+        
         try:
             conn = get_db_connection()
             c = conn.cursor()
             
-            stats = {}
-            
-            # Get counts with fallback to 0
-            queries = {
-                "vouches": "SELECT COUNT(*) FROM vouches WHERE target_user_id = ?",
-                "tickets": "SELECT COUNT(*) FROM tickets WHERE user_id = ?",
-                "accounts_listed": "SELECT COUNT(*) FROM r6_accounts WHERE seller_id = ?",
-            }
+            # Single primary-key lookup; user_stats is maintained by triggers
+            c.execute("""SELECT vouches, rating_sum, rating_count, tickets, accounts_listed,
+                                invites, total_trades, total_earnings
+                         FROM user_stats WHERE user_id = ?""", (user_id,))
+            row = c.fetchone()
             
-            for key, query in queries.items():
-                c.execute(query, (user_id,))
-                stats[key] = c.fetchone()[0] or 0
-            
-            # Get average rating
-            c.execute("SELECT AVG(rating) FROM vouches WHERE target_user_id = ?", (user_id,))
-            avg_rating = c.fetchone()[0]
-            stats["avg_rating"] = round(float(avg_rating), 1) if avg_rating else 0
-            
-            # Set defaults
-            stats.update({
-                "invites": 0,
-                "total_trades": 0,
-                "total_earnings": 0,
+            stats = _empty_stats() if row is None else {
+                "vouches": row["vouches"],
+                "tickets": row["tickets"],
+                "accounts_listed": row["accounts_listed"],
+                "invites": row["invites"],
+                "total_trades": row["total_trades"],
+                "total_earnings": round(row["total_earnings"], 2),
+                "avg_rating": round(row["rating_sum"] / row["rating_count"], 1) if row["rating_count"] else 0,
                 "member_since": "2024"
-            })
+            }
             
-            return stats
+            stats_cache.set(str(user_id), stats)
+            return dict(stats)
             
         except sqlite3.Error as e:
             logger.error(f"Database error in dashboard: {e}")
-            return {"vouches": 0, "tickets": 0, "invites": 0, "accounts_listed": 0,
-                   "total_trades": 0, "total_earnings": 0, "avg_rating": 0, "member_since": "2024"}
+            return _empty_stats()
         finally:
             if conn:
                 conn.close()
@@ -84,21 +193,19 @@ class TicketService:
             if errors:
                 return jsonify({"error": "Validation failed", "details": errors}), 400
                 
-            conn = get_db_connection()
-            c = conn.cursor()
-            c.execute("INSERT INTO tickets (user_id, ticket_type, subject, description) VALUES (?, ?, ?, ?)",
-                      (user_id, data["type"], data["subject"], data["description"]))
-            ticket_id = c.lastrowid
-            conn.commit()
+            ticket_id = execute_insert(
+                "INSERT INTO tickets (user_id, ticket_type, subject, description) VALUES (?, ?, ?, ?)",
+                (user_id, data["type"], data["subject"], data["description"]))
+            stats_cache.delete(str(user_id))
             
             return jsonify({"success": True, "ticket_id": ticket_id})
             
+        except (WriteQueueFull, FutureTimeoutError):
+            logger.warning("Write queue saturated creating ticket")
+            return jsonify({"error": "Server busy, please retry"}), 503
         except sqlite3.Error as e:
             logger.error(f"Database error creating ticket: {e}")
             return jsonify({"error": "Database error"}), 500
-        finally:
-            if conn:
-                conn.close()
 
 class VouchService:
     @staticmethod
@@ -134,43 +241,108 @@ class VouchService:
                     return jsonify({"error": "Rating must be between 1 and 5"}), 400
             except (ValueError, TypeError):
                 return jsonify({"error": "Invalid rating format"}), 400
+            
+            try:
+                price = float(data.get("price") or 0)
+                if price < 0 or not math.isfinite(price):
+                    return jsonify({"error": "Price must be a non-negative number"}), 400
+            except (ValueError, TypeError):
+                return jsonify({"error": "Invalid price format"}), 400
                 
+            # Triggers on vouches update seller_reputation in the same transaction
+            vouch_id = execute_insert(
+                """INSERT INTO vouches (user_id, target_user_id, message, rating, trade_type, account_rank, price, payment_method) 
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (user_id, data["target"], data["message"], rating, 
+                 data.get("trade_type", ""), data.get("account_rank", ""), 
+                 price, data.get("payment_method", "")))
+            stats_cache.delete(str(user_id), str(data["target"]))
+            
+            return jsonify({"success": True, "vouch_id": vouch_id})
+            
+        except (WriteQueueFull, FutureTimeoutError):
+            logger.warning("Write queue saturated creating vouch")
+            return jsonify({"error": "Server busy, please retry"}), 503
+        except sqlite3.Error as e:
+            logger.error(f"Database error creating vouch: {e}")
+            return jsonify({"error": "Database error"}), 500
+
+class MarketplaceService:
+    @staticmethod
+    def get_accounts(params=None):
+        """Get a keyset-paginated, filtered page of available R6 accounts"""
+        try:
+            query = parse_listing_query(params or {})
+        except ListingQueryError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Keyed on the same change counters as the ETag, so a cached page is
+        # never older than the version it is served under
+        cache_key = (query, get_data_version("r6_accounts", "vouches"))
+        cached = listings_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+        
+        conn = None
+        try:
             conn = get_db_connection()
             c = conn.cursor()
-            c.execute("""INSERT INTO vouches (user_id, target_user_id, message, rating, trade_type, account_rank, price, payment_method) 
-                         VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                      (user_id, data["target"], data["message"], rating, 
-                       data.get("trade_type", ""), data.get("account_rank", ""), 
-                       data.get("price", 0), data.get("payment_method", "")))
-            conn.commit()
+            filters, sort, cursor, limit = query
+            sql, args = build_listing_sql(filters, sort, cursor, limit)
+            c.execute(sql, args)
+            rows = c.fetchall()
             
-            return jsonify({"success": True})
+            page = rows[:limit]
+            next_cursor = encode_cursor(sort, page[-1]) if len(rows) > limit else None
+            result = {
+                "accounts": [row_to_listing(row) for row in page],
+                "next_cursor": next_cursor,
+                "sort": sort
+            }
+            
+            listings_cache.set(cache_key, result)
+            return jsonify(result)
             
         except sqlite3.Error as e:
-            logger.error(f"Database error creating vouch: {e}")
+            logger.error(f"Database error getting accounts: {e}")
             return jsonify({"error": "Database error"}), 500
         finally:
             if conn:
                 conn.close()
-
-class MarketplaceService:
+    
     @staticmethod
-    def get_accounts():
-        """Get available R6 accounts"""
+    def search_accounts(params):
+        """Full-text search available R6 accounts, ranked by relevance"""
+        try:
+            match, filters, limit = parse_search_query(params)
+        except ListingQueryError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        cache_key = ("search", match, filters, limit, get_data_version("r6_accounts"))
+        cached = listings_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+        
+        conn = None
         try:
             conn = get_db_connection()
             c = conn.cursor()
-            c.execute("SELECT * FROM r6_accounts WHERE status = 'available' ORDER BY created_at DESC LIMIT 100")
-            accounts = c.fetchall()
+            sql, args = build_search_sql(match, filters, limit, Config.SEARCH_CANDIDATE_LIMIT)
+            c.execute(sql, args)
+            
+            accounts = []
+            for row in c.fetchall():
+                account = row_to_listing(row)
+                account["snippet"] = highlight_snippet(row["snippet"])
+                account["score"] = round(-row["score"], 4)
+                accounts.append(account)
             
-            return jsonify([{
-                "id": a[0], "title": a[2], "rank": a[3], "level": a[4],
-                "operators": a[5], "renown": a[6], "credits": a[7], 
-                "price": a[8], "description": a[9], "created_at": a[11]
-            } for a in accounts])
+            result = {"accounts": accounts, "query": params.get("q")}
+            listings_cache.set(cache_key, result)
+            return jsonify(result)
             
         except sqlite3.Error as e:
-            logger.error(f"Database error getting accounts: {e}")
+            logger.error(f"Database error searching accounts: {e}")
             return jsonify({"error": "Database error"}), 500
         finally:
             if conn:
@@ -179,36 +351,21 @@ class MarketplaceService:
     @staticmethod
     def create_account_listing(user_id, data):
         """Create a new account listing"""
+        conn = None
         try:
-            if not data:
-                return jsonify({"error": "No data provided"}), 400
-                
-            errors = validate_input(data, ["title", "rank", "level", "price"])
-            if errors:
-                return jsonify({"error": "Validation failed", "details": errors}), 400
-                
-            # Validate numeric fields
-            try:
-                level = int(data["level"])
-                price = float(data["price"])
-                operators = int(data.get("operators", 0))
-                renown = int(data.get("renown", 0))
-                credits = int(data.get("credits", 0))
-                
-                if any(val < 0 for val in [level, price, operators, renown, credits]):
-                    return jsonify({"error": "Numeric values must be non-negative"}), 400
-                    
-            except (ValueError, TypeError):
-                return jsonify({"error": "Invalid numeric values"}), 400
+            values, error, details = validate_listing(data)
+            if error:
+                body = {"error": error}
+                if details:
+                    body["details"] = details
+                return jsonify(body), 400
                 
             conn = get_db_connection()
             c = conn.cursor()
-            c.execute("""INSERT INTO r6_accounts 
-                         (seller_id, title, rank, level, operators_count, renown, r6_credits, price, description) 
-                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                      (user_id, data["title"], data["rank"], level, 
-                       operators, renown, credits, price, data.get("description", "")))
+            c.execute(INSERT_LISTING_SQL, (user_id, *values))
             conn.commit()
+            stats_cache.delete(str(user_id))
+            listings_cache.clear()
             return jsonify({"success": True})
             
         except sqlite3.Error as e:
@@ -216,4 +373,189 @@ class MarketplaceService:
             return jsonify({"error": "Database error"}), 500
         finally:
             if conn:
-                conn.close()
\ No newline at end of file
+                conn.close()
+    
+    @staticmethod
+    def import_account_listings(user_id, stream, fmt):
+        """Bulk-import listings from a CSV/NDJSON stream in chunked transactions"""
+        imported = 0
+        failed = 0
+        errors = []
+        batch = []
+        conn = None
+        
+        def flush():
+            nonlocal imported
+            c = conn.cursor()
+            c.executemany(INSERT_LISTING_SQL, batch)
+            conn.commit()
+            imported += len(batch)
+            batch.clear()
+        
+        try:
+            conn = get_db_connection()
+            for row_no, data, error in iter_rows(stream, fmt):
+                if imported + len(batch) + failed >= Config.IMPORT_MAX_ROWS:
+                    errors.append({"row": row_no, "error": f"Import limited to {Config.IMPORT_MAX_ROWS} rows"})
+                    break
+                
+                if not error:
+                    values, error, details = validate_listing(data)
+                    if details:
+                        error = f"{error}: {', '.join(details)}"
+                if error:
+                    failed += 1
+                    # Keep the error report bounded regardless of upload size
+                    if len(errors) < Config.IMPORT_MAX_ERRORS:
+                        errors.append({"row": row_no, "error": error})
+                    continue
+                
+                batch.append((user_id, *values))
+                if len(batch) >= Config.IMPORT_BATCH_SIZE:
+                    flush()
+            
+            if batch:
+                flush()
+            
+            return jsonify({"success": failed == 0, "imported": imported, "failed": failed, "errors": errors})
+            
+        except ImportFormatError as e:
+            return jsonify({"error": str(e), "imported": imported}), 400
+        except sqlite3.Error as e:
+            logger.error(f"Database error importing listings: {e}")
+            return jsonify({"error": "Database error", "imported": imported}), 500
+        finally:
+            if imported:
+                stats_cache.delete(str(user_id))
+                listings_cache.clear()
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def add_listing_images(user_id, listing_id, uploads):
+        """Store uploaded screenshots for a seller's listing and queue their thumbnails"""
+        if not uploads:
+            return jsonify({"error": "No images provided"}), 400
+        
+        conn = None
+        stored = []
+        committed = False
+        try:
+            conn = get_db_connection()
+            c = conn.cursor()
+            # Cheap checks first so a request that cannot succeed stores nothing
+            c.execute("SELECT seller_id, images FROM r6_accounts WHERE id = ?", (listing_id,))
+            row = c.fetchone()
+            if row is None or row["seller_id"] != str(user_id):
+                return jsonify({"error": "Listing not found"}), 404
+            if len(images.parse_image_list(row["images"])) + len(uploads) > Config.IMAGE_MAX_PER_LISTING:
+                return jsonify({"error": f"At most {Config.IMAGE_MAX_PER_LISTING} images per listing"}), 400
+            
+            # Files are written before taking the write lock, which is held only
+            # for the re-read and update so concurrent uploads cannot drop each other's images
+            for upload in uploads:
+                try:
+                    stored.append(images.store_upload(upload.stream))
+                except images.ImageError as e:
+                    return jsonify({"error": str(e), "filename": upload.filename}), 400
+            
+            previous_isolation = conn.isolation_level
+            conn.isolation_level = None
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = conn.execute("SELECT seller_id, images FROM r6_accounts WHERE id = ?",
+                                       (listing_id,)).fetchone()
+                    if row is None or row["seller_id"] != str(user_id):
+                        conn.execute("ROLLBACK")
+                        return jsonify({"error": "Listing not found"}), 404
+                    if not all(images.is_stored(digest) for digest, *_ in stored):
+                        # A failed upload of the same file removed it after we deduplicated onto it
+                        conn.execute("ROLLBACK")
+                        return jsonify({"error": "Upload conflicted with another request; please retry"}), 409
+                    digests = images.parse_image_list(row["images"])
+                    added = [digest for digest in dict.fromkeys(digest for digest, *_ in stored)
+                             if digest not in digests]
+                    if len(digests) + len(added) > Config.IMAGE_MAX_PER_LISTING:
+                        conn.execute("ROLLBACK")
+                        return jsonify({"error": f"At most {Config.IMAGE_MAX_PER_LISTING} images per listing"}), 400
+                    
+                    conn.executemany("""INSERT OR IGNORE INTO images (digest, mimetype, size, uploader_id)
+                                        VALUES (?, ?, ?, ?)""",
+                                     [(digest, mimetype, size, str(user_id)) for digest, mimetype, size, _ in stored])
+                    digests.extend(added)
+                    conn.execute("UPDATE r6_accounts SET images = ? WHERE id = ?", (json.dumps(digests), listing_id))
+                    conn.execute("COMMIT")
+                except sqlite3.Error:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.isolation_level = previous_isolation
+            committed = True
+            listings_cache.clear()
+            
+            for digest in dict.fromkeys(digest for digest, _, _, _ in stored):
+                images.schedule_variants(digest)
+            
+            return jsonify({"success": True,
+                            "images": [images.image_urls(digest) for digest in digests],
+                            "deduplicated": sum(1 for *_, created in stored if not created)})
+            
+        except OSError as e:
+            logger.error(f"Storage error saving listing images: {e}")
+            return jsonify({"error": "Could not store images"}), 500
+        except sqlite3.Error as e:
+            logger.error(f"Database error adding listing images: {e}")
+            return jsonify({"error": "Database error"}), 500
+        finally:
+            if not committed and conn:
+                # Files this request created but never attached to anything
+                images.remove_orphans([digest for digest, *_, created in stored if created], conn)
+            if conn:
+                conn.close()
+
+class LeaderboardService:
+    @staticmethod
+    def get_invite_leaderboard(user_id, params):
+        """Get the top inviters for a window plus the current user's rank"""
+        try:
+            bucket = invite_bucket(params.get("window", "all"), params.get("period"))
+            limit = min(max(int(params.get("limit", 10)), 1), LEADERBOARD_MAX_LIMIT)
+        except (ValueError, TypeError) as e:
+            return jsonify({"error": str(e)}), 400
+        
+        conn = None
+        try:
+            conn = get_db_connection()
+            c = conn.cursor()
+            
+            # Walks idx_invite_counts_rank from the top; ties share a rank
+            c.execute("""SELECT inviter_id, invites FROM invite_counts
+                         WHERE bucket = ? ORDER BY invites DESC, inviter_id LIMIT ?""", (bucket, limit))
+            leaders = []
+            for position, row in enumerate(c.fetchall(), 1):
+                tied = leaders and leaders[-1]["invites"] == row["invites"]
+                leaders.append({"rank": leaders[-1]["rank"] if tied else position,
+                                "user_id": row["inviter_id"], "invites": row["invites"]})
+            
+            return jsonify({"bucket": bucket, "leaders": leaders,
+                            "me": LeaderboardService._get_invite_rank(c, bucket, user_id)})
+            
+        except sqlite3.Error as e:
+            logger.error(f"Database error getting invite leaderboard: {e}")
+            return jsonify({"error": "Database error"}), 500
+        finally:
+            if conn:
+                conn.close()
+    
+    @staticmethod
+    def _get_invite_rank(c, bucket, user_id):
+        """Rank = 1 + inviters with more invites, summed over distinct invite counts"""
+        c.execute("SELECT invites FROM invite_counts WHERE bucket = ? AND inviter_id = ?", (bucket, str(user_id)))
+        row = c.fetchone()
+        if row is None:
+            return {"rank": None, "invites": 0}
+        c.execute("""SELECT COALESCE(SUM(users), 0) FROM invite_score_counts
+                     WHERE bucket = ? AND invites > ?""", (bucket, row["invites"]))
+        return {"rank": c.fetchone()[0] + 1, "invites": row["invites"]}
@@ -0,0 +1,120 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+from config import Config
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+_TRUE = {"1", "true", "yes", "on"}
+_FALSE = {"0", "false", "no", "off", ""}
+
+def _to_bool(value):
+    lowered = value.strip().lower()
+    if lowered in _TRUE:
+        return True
+    if lowered in _FALSE:
+        return False
+    raise ValueError(f"Not a boolean: {value!r}")
+
+# Typed accessors: type name -> parser for the stored TEXT value
+CASTS = {"str": str, "int": int, "float": float, "bool": _to_bool, "json": json.loads}
+
+def _serialize(value):
+    """Store bools as 1/0, containers as JSON and everything else as text"""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return str(value)
+
+class SettingsCache:
+    """Read-through copy of the settings table shared by every request in a worker
+
+    The whole table is loaded at once. Reads hit the in-memory snapshot and
+    only compare the settings change counter (a single-row primary-key read)
+    every SETTINGS_CHECK_INTERVAL seconds, so a write from any worker is seen
+    everywhere within that window.
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._values = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"reloads": 0, "checks": 0}
+
+    def _snapshot(self):
+        values = self._values
+        if values is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return values
+
+        with self._lock:
+            if self._values is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._values
+            conn = get_db_connection()
+            try:
+                # Version first: a write landing in between only causes one extra reload
+                row = conn.execute("SELECT version FROM table_versions WHERE name = 'settings'").fetchone()
+                version = row[0] if row else 0
+                self.stats["checks"] += 1
+                if self._values is None or version != self._version:
+                    self._values = {r["key"]: r["value"] for r in conn.execute("SELECT key, value FROM settings")}
+                    self._version = version
+                    self.stats["reloads"] += 1
+                self._checked_at = time.monotonic()
+            except sqlite3.Error as e:
+                logger.error(f"Database error loading settings: {e}")
+                if self._values is None:
+                    raise
+            finally:
+                conn.close()
+            return self._values
+
+    def get(self, key, default=None, cast="str"):
+        """Get a setting parsed with CASTS[cast], or default when unset or unparseable"""
+        value = self._snapshot().get(key)
+        if value is None:
+            return default
+        try:
+            return CASTS[cast](value)
+        except (ValueError, TypeError):
+            logger.warning(f"Setting {key}={value!r} is not a valid {cast}")
+            return default
+
+    def get_many(self, keys=None):
+        """Get several raw settings (all of them when keys is None) from one snapshot"""
+        values = self._snapshot()
+        if keys is None:
+            return dict(values)
+        return {key: values.get(key) for key in keys}
+
+    def set_many(self, updates):
+        """Write settings in one transaction; a value of None deletes the key"""
+        conn = get_db_connection()
+        try:
+            with conn:
+                conn.executemany("""INSERT INTO settings (key, value) VALUES (?, ?)
+                                    ON CONFLICT (key) DO UPDATE SET value = excluded.value""",
+                                 [(key, _serialize(value)) for key, value in updates.items() if value is not None])
+                conn.executemany("DELETE FROM settings WHERE key = ?",
+                                 [(key,) for key, value in updates.items() if value is None])
+        finally:
+            conn.close()
+        self.invalidate()
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def invalidate(self):
+        """Force the next read to re-check the change counter"""
+        self._checked_at = 0.0
+
+    def get_stats(self):
+        return {**self.stats, "version": self._version, "keys": len(self._values or {})}
+
+settings = SettingsCache(Config.SETTINGS_CHECK_INTERVAL)
@@ -0,0 +1,35 @@
+"""Shared app for tests that go through routes or the connection pool
+
+The pool and background workers are per-process singletons, so every test
+module shares one app on one temporary database.
+"""
+import os
+import logging
+import tempfile
+
+from config import Config
+
+_app = None
+
+def make_app():
+    """Create (once per process) an app on a fresh temporary database"""
+    global _app
+    if _app is None:
+        Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix="iceai-test-"), "test.db")
+        Config.IMAGE_STORAGE_PATH = os.path.join(os.path.dirname(Config.DATABASE_PATH), "media")
+        Config.DISCORD_CLIENT_ID = Config.DISCORD_CLIENT_ID or "test"
+        Config.DISCORD_CLIENT_SECRET = Config.DISCORD_CLIENT_SECRET or "test"
+        Config.DISCORD_REDIRECT_URI = Config.DISCORD_REDIRECT_URI or "http://localhost/callback"
+        Config.SELLHUB_SECRET = "test-secret"
+        Config.RATE_LIMIT_ENABLED = False
+        Config.START_BACKGROUND_WORKERS = False
+
+        from main import create_app
+        _app = create_app()
+        logging.getLogger("webhooks").setLevel(logging.ERROR)
+    return _app
+
+def login(client, user_id, username="tester"):
+    """Put a logged-in user into the test client's session"""
+    with client.session_transaction() as session:
+        session["user"] = {"id": user_id, "username": username}
@@ -0,0 +1,60 @@
+"""Autoresponder trigger matching:
+
+    python -m pytest tests
+"""
+import random
+import unittest
+
+from modules.autoresponder import AhoCorasick, AutoresponderEngine
+
+def trigger(trigger_id, phrase, case_sensitive=False, whole_word=True):
+    return {"id": trigger_id, "trigger_phrase": phrase, "response": f"response {trigger_id}", "embed": None,
+            "case_sensitive": case_sensitive, "whole_word": whole_word}
+
+def positions(engine, message):
+    return [(result["trigger_id"], result["position"]) for result in engine.match(message)]
+
+class AhoCorasickTest(unittest.TestCase):
+    def test_matches_agree_with_brute_force(self):
+        rng = random.Random(15)
+        for _ in range(50):
+            patterns = list(enumerate({"".join(rng.choice("ab") for _ in range(rng.randint(1, 4)))
+                                       for _ in range(6)}))
+            text = "".join(rng.choice("abc") for _ in range(60))
+            expected = sorted((pattern_id, start, start + len(pattern))
+                              for pattern_id, pattern in patterns
+                              for start in range(len(text)) if text.startswith(pattern, start))
+            self.assertEqual(sorted(AhoCorasick(patterns).iter_matches(text)), expected)
+
+    def test_overlapping_and_nested_patterns(self):
+        automaton = AhoCorasick([(1, "he"), (2, "she"), (3, "his"), (4, "hers")])
+        self.assertEqual(sorted(automaton.iter_matches("ushers")), [(1, 2, 4), (2, 1, 4), (4, 2, 6)])
+
+class AutoresponderEngineTest(unittest.TestCase):
+    def test_whole_word_and_substring_triggers(self):
+        engine = AutoresponderEngine([trigger(1, "price"), trigger(2, "ice", whole_word=False)])
+        self.assertEqual(positions(engine, "what's the price?"), [(1, 11), (2, 13)])
+        self.assertEqual(positions(engine, "prices"), [(2, 2)])
+
+    def test_case_sensitive_triggers(self):
+        engine = AutoresponderEngine([trigger(1, "Hi", case_sensitive=True), trigger(2, "hello")])
+        self.assertEqual(positions(engine, "hi HELLO Hi"), [(2, 3), (1, 9)])
+
+    def test_results_in_order_of_first_occurrence(self):
+        engine = AutoresponderEngine([trigger(1, "b"), trigger(2, "a")])
+        self.assertEqual(positions(engine, "a b a b"), [(2, 0), (1, 2)])
+
+    def test_positions_index_the_original_message(self):
+        # "İ" lowercases and "ß" casefolds to two characters; positions must not drift
+        engine = AutoresponderEngine([trigger(1, "price"), trigger(2, "strasse")])
+        self.assertEqual(positions(engine, "İİİ price"), [(1, 4)])
+        self.assertEqual(positions(engine, "die Straße price"), [(2, 4), (1, 11)])
+
+    def test_match_inside_a_folded_character_is_not_a_whole_word(self):
+        engine = AutoresponderEngine([trigger(1, "s")])
+        self.assertEqual(positions(engine, "ß"), [])
+        engine = AutoresponderEngine([trigger(2, "s", whole_word=False)])
+        self.assertEqual(positions(engine, "ß"), [(2, 0)])
+
+if __name__ == "__main__":
+    unittest.main()
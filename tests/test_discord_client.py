@@ -0,0 +1,87 @@
+"""DiscordClient retry behaviour against the local Discord stub:
+
+    python -m pytest tests
+"""
+import socket
+import unittest
+
+import requests
+
+from benchmarks.stub_discord import StubDiscord
+from discord_client import DiscordClient
+
+def make_client(base_url, max_retries=2):
+    return DiscordClient(base_url, timeout=2, max_retries=max_retries, max_retry_wait=0.05,
+                         pool_size=2, user_cache_ttl=0)
+
+class TokenExchangeTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubDiscord(single_use_codes=True).__enter__()
+        self.client = make_client(self.stub.base_url)
+
+    def tearDown(self):
+        self.stub.__exit__(None, None, None)
+
+    def test_exchange_succeeds(self):
+        response = self.client.exchange_code("1001")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["access_token"], "1001")
+        self.assertEqual(self.stub.calls["/oauth2/token"], 1)
+
+    def test_gateway_error_is_not_retried(self):
+        # The code may already be consumed; a retry would only turn this into invalid_grant
+        self.stub.fail("/oauth2/token", 502)
+        response = self.client.exchange_code("1002")
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(self.stub.calls["/oauth2/token"], 1)
+
+    def test_rate_limit_is_retried(self):
+        self.stub.fail("/oauth2/token", 429, headers={"Retry-After": "0.01"})
+        response = self.client.exchange_code("1003")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stub.calls["/oauth2/token"], 2)
+
+    def test_rate_limit_gives_up_when_wait_too_long(self):
+        self.stub.fail("/oauth2/token", 429, headers={"Retry-After": "30"})
+        response = self.client.exchange_code("1004")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.stub.calls["/oauth2/token"], 1)
+
+class GetCurrentUserTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubDiscord().__enter__()
+        self.client = make_client(self.stub.base_url)
+
+    def tearDown(self):
+        self.stub.__exit__(None, None, None)
+
+    def test_gateway_errors_are_retried(self):
+        self.stub.fail("/users/@me", 502)
+        self.stub.fail("/users/@me", 503)
+        user = self.client.get_current_user("2001")
+        self.assertEqual(user["id"], "2001")
+        self.assertEqual(self.stub.calls["/users/@me"], 3)
+
+    def test_gives_up_after_max_retries(self):
+        self.stub.fail("/users/@me", 503, times=5)
+        self.assertIsNone(self.client.get_current_user("2002"))
+        self.assertEqual(self.stub.calls["/users/@me"], 3)
+
+class ConnectionErrorTest(unittest.TestCase):
+    def setUp(self):
+        # A port nothing listens on: every connect is refused before anything is sent
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        self.client = make_client(f"http://127.0.0.1:{port}/api", max_retries=1)
+
+    def test_refused_connect_is_retried_then_raised(self):
+        attempts = []
+        send = self.client.session.request
+        self.client.session.request = lambda *args, **kwargs: attempts.append(1) or send(*args, **kwargs)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.client.exchange_code("3001")
+        self.assertEqual(len(attempts), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""Giveaway draws: reproducibility and the end-once claim:
+
+    python -m pytest tests
+"""
+import random
+import sqlite3
+import unittest
+
+import migrations
+from modules.giveaways import draw_winners, end_giveaway, get_draw, verify_draw
+
+class DrawWinnersTest(unittest.TestCase):
+    def test_same_seed_same_winners(self):
+        entries = [f"user{i}" for i in range(1000)]
+        first = draw_winners(iter(entries), 5, "seed")
+        self.assertEqual(draw_winners(iter(entries), 5, "seed"), first)
+        self.assertNotEqual(draw_winners(iter(entries), 5, "other")[0], first[0])
+        self.assertEqual(first[1], 1000)
+
+    def test_fewer_entries_than_winners(self):
+        self.assertEqual(draw_winners(iter(["a", "b"]), 5, "seed"), (["a", "b"], 2))
+        self.assertEqual(draw_winners(iter([]), 1, "seed"), ([], 0))
+
+    def test_every_entry_can_win(self):
+        entries = [str(i) for i in range(10)]
+        won = {winner for seed in range(500) for winner in draw_winners(iter(entries), 1, seed)[0]}
+        self.assertEqual(won, set(entries))
+
+class EndGiveawayTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        migrations.migrate(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def create(self, entries, winners_count=3):
+        giveaway_id = self.conn.execute(
+            "INSERT INTO giveaways (title, prize, winners_count, end_time) VALUES ('t', 'p', ?, '2099-01-01 00:00:00')",
+            (winners_count,)).lastrowid
+        users = [f"user{i}" for i in range(entries)]
+        random.Random(16).shuffle(users)
+        self.conn.executemany("INSERT INTO giveaway_entries (giveaway_id, user_id) VALUES (?, ?)",
+                              [(giveaway_id, user_id) for user_id in users])
+        self.conn.commit()
+        return giveaway_id
+
+    def test_draw_is_recorded_and_verifiable(self):
+        giveaway_id = self.create(200)
+        draw = end_giveaway(giveaway_id, self.conn, seed="fixed")
+        self.assertEqual(draw["status"], "ended")
+        self.assertEqual(draw["entry_count"], 200)
+        # Entries are drawn in primary-key order, whatever order they were inserted in
+        expected, _ = draw_winners(iter(sorted(f"user{i}" for i in range(200))), 3, "fixed")
+        self.assertEqual(draw["winners"], expected)
+        self.assertTrue(verify_draw(self.conn, giveaway_id))
+
+    def test_second_end_returns_the_first_draw(self):
+        giveaway_id = self.create(50)
+        first = end_giveaway(giveaway_id, self.conn, seed="one")
+        self.assertEqual(end_giveaway(giveaway_id, self.conn, seed="two"), first)
+
+    def test_tampered_winners_fail_verification(self):
+        giveaway_id = self.create(50)
+        end_giveaway(giveaway_id, self.conn)
+        self.conn.execute("UPDATE giveaway_winners SET user_id = 'intruder' WHERE giveaway_id = ? AND position = 1",
+                          (giveaway_id,))
+        self.assertFalse(verify_draw(self.conn, giveaway_id))
+
+    def test_live_claim_is_respected(self):
+        giveaway_id = self.create(10)
+        self.conn.execute("UPDATE giveaways SET draw_seed = 'theirs', ended_at = CURRENT_TIMESTAMP WHERE id = ?",
+                          (giveaway_id,))
+        self.conn.commit()
+        draw = end_giveaway(giveaway_id, self.conn, seed="mine")
+        self.assertEqual((draw["status"], draw["draw_seed"], draw["winners"]), ("active", "theirs", []))
+
+    def test_abandoned_claim_is_finished_with_its_seed(self):
+        giveaway_id = self.create(10)
+        self.conn.execute("""UPDATE giveaways SET draw_seed = 'theirs', ended_at = datetime('now', '-1 hour')
+                             WHERE id = ?""", (giveaway_id,))
+        self.conn.commit()
+        draw = end_giveaway(giveaway_id, self.conn, seed="mine")
+        self.assertEqual((draw["status"], draw["draw_seed"]), ("ended", "theirs"))
+        self.assertTrue(verify_draw(self.conn, giveaway_id))
+
+    def test_missing_giveaway(self):
+        self.assertIsNone(end_giveaway(12345, self.conn))
+        self.assertIsNone(get_draw(self.conn, 12345))
+
+if __name__ == "__main__":
+    unittest.main()
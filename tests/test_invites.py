@@ -0,0 +1,82 @@
+"""Bucketed invite leaderboard counters:
+
+    python -m pytest tests
+"""
+import random
+import sqlite3
+import unittest
+
+import migrations
+from services import LeaderboardService, invite_bucket
+
+def recount(conn):
+    """invite_counts computed from scratch, the way migration 10 backfills it"""
+    buckets = " UNION ALL ".join(f"SELECT {bucket.format(row='invites')} AS bucket, inviter_id FROM invites "
+                                 f"WHERE inviter_id IS NOT NULL" for bucket in migrations.INVITE_BUCKETS)
+    return conn.execute(f"SELECT bucket, inviter_id, COUNT(*) FROM ({buckets}) "
+                        f"GROUP BY bucket, inviter_id ORDER BY bucket, inviter_id").fetchall()
+
+class InviteCountsTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        migrations.migrate(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def counts(self):
+        return self.conn.execute("SELECT bucket, inviter_id, invites FROM invite_counts "
+                                 "ORDER BY bucket, inviter_id").fetchall()
+
+    def random_writes(self, rng, count):
+        inviters = [f"user{i}" for i in range(6)] + [None]
+        days = [f"2024-{month:02d}-{day:02d} 12:00:00" for month in (1, 2, 3) for day in (1, 8, 15, 29)]
+        ids = []
+        for _ in range(count):
+            action = rng.random()
+            if ids and action < 0.2:
+                self.conn.execute("DELETE FROM invites WHERE id = ?", (ids.pop(rng.randrange(len(ids))),))
+            elif ids and action < 0.4:
+                self.conn.execute("UPDATE invites SET inviter_id = ?, created_at = ? WHERE id = ?",
+                                  (rng.choice(inviters), rng.choice(days), rng.choice(ids)))
+            else:
+                ids.append(self.conn.execute("INSERT INTO invites (inviter_id, created_at) VALUES (?, ?)",
+                                             (rng.choice(inviters), rng.choice(days))).lastrowid)
+        self.conn.commit()
+
+    def test_triggers_match_a_recount(self):
+        self.random_writes(random.Random(17), 500)
+        self.assertEqual([tuple(row) for row in self.counts()], [tuple(row) for row in recount(self.conn)])
+
+    def test_score_counts_track_invite_counts(self):
+        self.random_writes(random.Random(18), 300)
+        expected = self.conn.execute("""SELECT bucket, invites, COUNT(*) FROM invite_counts
+                                        GROUP BY bucket, invites ORDER BY bucket, invites""").fetchall()
+        actual = self.conn.execute("SELECT bucket, invites, users FROM invite_score_counts "
+                                   "ORDER BY bucket, invites").fetchall()
+        self.assertEqual([tuple(row) for row in actual], [tuple(row) for row in expected])
+
+    def test_rank_counts_inviters_strictly_ahead(self):
+        self.random_writes(random.Random(19), 300)
+        cursor = self.conn.cursor()
+        for bucket, inviter_id, invites in self.counts():
+            ahead = sum(1 for row in self.counts() if row["bucket"] == bucket and row["invites"] > invites)
+            self.assertEqual(LeaderboardService._get_invite_rank(cursor, bucket, inviter_id),
+                             {"rank": ahead + 1, "invites": invites})
+        self.assertEqual(LeaderboardService._get_invite_rank(cursor, "all", "nobody"), {"rank": None, "invites": 0})
+
+class InviteBucketTest(unittest.TestCase):
+    def test_windows_and_periods(self):
+        self.assertEqual(invite_bucket("all"), "all")
+        self.assertEqual(invite_bucket("week", "2024-W05"), "week:2024-W05")
+        self.assertEqual(invite_bucket("month", "2024-02"), "month:2024-02")
+        self.assertTrue(invite_bucket("week").startswith("week:"))
+
+    def test_invalid_windows_and_periods(self):
+        for window, period in (("year", None), ("week", "2024-05"), ("month", "2024-W05"), ("month", "24-1")):
+            with self.assertRaises(ValueError, msg=(window, period)):
+                invite_bucket(window, period)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+"""Marketplace keyset cursors:
+
+    python -m pytest tests
+"""
+import base64
+import json
+import sqlite3
+import unittest
+
+import migrations
+from listings import (LISTING_SORTS, TRUSTED_SORT, ListingQueryError, build_listing_sql,
+                      decode_cursor, encode_cursor, parse_listing_query)
+
+ROW = {"id": 42, "created_at": "2024-06-01 10:00:00", "price": 19.5, "level": 120,
+       "seller_rating": 4.25, "seller_activity": 3.0, "seller_id": "s1"}
+
+def forge(*parts):
+    raw = json.dumps(list(parts)).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+class CursorTest(unittest.TestCase):
+    def test_round_trip_every_sort(self):
+        for sort, (column, _) in LISTING_SORTS.items():
+            value, last_id = decode_cursor(sort, encode_cursor(sort, ROW))
+            expected = [ROW["seller_rating"], ROW["seller_activity"], ROW["seller_id"]] \
+                if sort == TRUSTED_SORT else ROW[column]
+            self.assertEqual((value, last_id), (expected, 42), sort)
+
+    def test_cursor_is_bound_to_its_sort(self):
+        with self.assertRaises(ListingQueryError):
+            decode_cursor("oldest", encode_cursor("newest", ROW))
+
+    def test_garbage_is_rejected(self):
+        for cursor in ("", "!!!", "bm90IGpzb24", forge("newest", "x"), forge("newest", "x", 1, 2)):
+            with self.assertRaises(ListingQueryError, msg=cursor):
+                decode_cursor("newest", cursor)
+
+    def test_sort_value_types_are_checked(self):
+        tampered = [
+            ("newest", None), ("newest", 5), ("price_asc", "1; DROP"), ("price_asc", True),
+            ("price_desc", None), ("level_desc", 1.5), ("level_desc", [1]),
+            (TRUSTED_SORT, [4.0, 1.0]), (TRUSTED_SORT, [4.0, "x", "s1"]), (TRUSTED_SORT, [4.0, 1.0, None]),
+        ]
+        for sort, value in tampered:
+            with self.assertRaises(ListingQueryError, msg=(sort, value)):
+                decode_cursor(sort, forge(sort, value, 1))
+
+    def test_id_type_is_checked(self):
+        for last_id in ("1", 1.0, None, True):
+            with self.assertRaises(ListingQueryError, msg=last_id):
+                decode_cursor("newest", forge("newest", "2024-06-01", last_id))
+
+class PaginationTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        migrations.migrate(self.conn)
+        for i in range(25):
+            self.conn.execute("INSERT INTO r6_accounts (seller_id, title, level, price) VALUES (?, ?, ?, ?)",
+                              ("s1", f"listing {i}", i % 7, None if i % 5 == 0 else float(i % 4)))
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def walk(self, sort):
+        seen, cursor = [], None
+        while True:
+            filters, sort, cursor, limit = parse_listing_query({"sort": sort, "limit": 4, "cursor": cursor})
+            rows = self.conn.execute(*build_listing_sql(filters, sort, cursor, limit)).fetchall()
+            seen.extend(row["id"] for row in rows[:limit])
+            if len(rows) <= limit:
+                return seen
+            cursor = encode_cursor(sort, rows[limit - 1])
+
+    def test_pages_cover_every_row_once(self):
+        for sort in ("newest", "oldest", "level_desc"):
+            self.assertEqual(sorted(self.walk(sort)), list(range(1, 26)), sort)
+
+    def test_rows_without_a_price_are_not_paged_by_price(self):
+        for sort in ("price_asc", "price_desc"):
+            ids = self.walk(sort)
+            self.assertEqual(len(ids), len(set(ids)))
+            self.assertEqual(sorted(ids), [i + 1 for i in range(25) if i % 5], sort)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""Schema migrations and the trigger-maintained user_stats table:
+
+    python -m pytest tests
+"""
+import math
+import random
+import sqlite3
+import unittest
+
+import migrations
+
+STATS_COLUMNS = ("user_id", "vouches", "rating_sum", "rating_count", "tickets", "accounts_listed",
+                 "invites", "total_trades", "total_earnings")
+
+def user_stats(conn):
+    # Rows that triggers drove back to zero are equivalent to missing ones in a rebuild
+    rows = conn.execute(f"SELECT {', '.join(STATS_COLUMNS)} FROM user_stats ORDER BY user_id").fetchall()
+    return [row for row in rows if any(row[1:])]
+
+def random_writes(conn, rng, count):
+    """Insert and delete vouches, tickets, listings and invites among a few users"""
+    users = [f"user{i}" for i in range(8)] + [None]
+    tables = {"vouches": [], "tickets": [], "r6_accounts": [], "invites": []}
+    for _ in range(count):
+        table = rng.choice(list(tables))
+        if tables[table] and rng.random() < 0.3:
+            row_id = tables[table].pop(rng.randrange(len(tables[table])))
+            conn.execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
+        elif table == "vouches":
+            tables[table].append(conn.execute(
+                "INSERT INTO vouches (user_id, target_user_id, rating, price) VALUES (?, ?, ?, ?)",
+                (rng.choice(users), rng.choice(users), rng.choice([None, 1, 3, 5]),
+                 rng.choice([None, 0, 9.99, 250]))).lastrowid)
+        elif table == "tickets":
+            tables[table].append(conn.execute(
+                "INSERT INTO tickets (user_id, ticket_type, subject, description) VALUES (?, 'support', 's', 'd')",
+                (rng.choice(users),)).lastrowid)
+        elif table == "r6_accounts":
+            tables[table].append(conn.execute("INSERT INTO r6_accounts (seller_id, title) VALUES (?, 'listing')",
+                                              (rng.choice(users),)).lastrowid)
+        else:
+            tables[table].append(conn.execute("INSERT INTO invites (inviter_id, invited_id) VALUES (?, ?)",
+                                              (rng.choice(users), rng.choice(users))).lastrowid)
+    conn.commit()
+
+class UserStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def assertMatchesRebuild(self):
+        incremental = user_stats(self.conn)
+        migrations.rebuild_user_stats(self.conn)
+        rebuilt = user_stats(self.conn)
+        self.assertEqual([row[:-1] for row in incremental], [row[:-1] for row in rebuilt])
+        for got, want in zip(incremental, rebuilt):
+            self.assertTrue(math.isclose(got[-1], want[-1], abs_tol=1e-6), (got, want))
+
+    def test_triggers_match_rebuild(self):
+        migrations.migrate(self.conn)
+        random_writes(self.conn, random.Random(3), 600)
+        self.assertMatchesRebuild()
+
+    def test_rebuild_is_idempotent(self):
+        migrations.migrate(self.conn)
+        random_writes(self.conn, random.Random(4), 100)
+        migrations.rebuild_user_stats(self.conn)
+        first = user_stats(self.conn)
+        migrations.rebuild_user_stats(self.conn)
+        self.assertEqual(user_stats(self.conn), first)
+
+class MigrateTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_empty_database_reaches_latest(self):
+        applied = migrations.migrate(self.conn)
+        self.assertEqual(applied, [version for version, _, _ in migrations.MIGRATIONS])
+        self.assertTrue(migrations.is_current(self.conn))
+        self.assertEqual(migrations.get_current_version(self.conn), migrations.LATEST_VERSION)
+        self.assertEqual(migrations.migrate(self.conn), [])
+
+    def test_baseline_with_data_is_backfilled(self):
+        # A database that only ever had the initial schema, filled before any trigger existed
+        migrations.migrate(self.conn, target=1)
+        random_writes(self.conn, random.Random(5), 400)
+        self.conn.execute("INSERT INTO r6_accounts (seller_id, title) VALUES ('quiet', 'No vouches')")
+        self.conn.commit()
+
+        migrations.migrate(self.conn)
+        self.assertTrue(migrations.is_current(self.conn))
+
+        backfilled = user_stats(self.conn)
+        migrations.rebuild_user_stats(self.conn)
+        self.assertEqual(backfilled, user_stats(self.conn))
+
+        reputation = self.conn.execute("SELECT * FROM seller_reputation ORDER BY seller_id").fetchall()
+        migrations.rebuild_seller_reputation(self.conn)
+        self.assertEqual(reputation, self.conn.execute("SELECT * FROM seller_reputation ORDER BY seller_id").fetchall())
+        self.assertIn(("quiet",), self.conn.execute("SELECT seller_id FROM seller_reputation").fetchall())
+
+        invites = self.conn.execute("SELECT COUNT(*) FROM invites WHERE inviter_id IS NOT NULL").fetchone()[0]
+        self.assertEqual(self.conn.execute("SELECT SUM(invites) FROM invite_counts WHERE bucket = 'all'").fetchone()[0],
+                         invites)
+
+    def test_status_lists_every_migration(self):
+        migrations.migrate(self.conn, target=2)
+        status = migrations.get_status(self.conn)
+        self.assertEqual([version for version, _, _ in status], [version for version, _, _ in migrations.MIGRATIONS])
+        self.assertEqual([version for version, _, applied_at in status if applied_at], [1, 2])
+        self.assertFalse(migrations.is_current(self.conn))
+
+if __name__ == "__main__":
+    unittest.main()
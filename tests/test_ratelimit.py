@@ -0,0 +1,125 @@
+"""Rate limit rules and token bucket stores:
+
+    python -m pytest tests
+"""
+import os
+import tempfile
+import unittest
+
+from flask import Flask
+
+from config import Config
+from ratelimit import (MemoryBucketStore, RateLimitConfigError, SQLiteBucketStore, client_ip,
+                       parse_rules)
+
+class ParseRulesTest(unittest.TestCase):
+    def test_rules_become_capacity_and_rate(self):
+        rules = parse_rules("callback:ip=10/minute, vouch:user=5/3600,vouch:ip=20/hour")
+        self.assertEqual(rules["callback"], (("ip", 10, 10 / 60),))
+        self.assertEqual(rules["vouch"], (("user", 5, 5 / 3600), ("ip", 20, 20 / 3600)))
+
+    def test_malformed_rules_are_rejected(self):
+        for spec in ("callback=10/minute", "callback:ip=10", "callback:host=1/second",
+                     "callback:ip=0/second", "callback:ip=1/fortnight", "callback:ip=1/-5"):
+            with self.assertRaises(RateLimitConfigError, msg=spec):
+                parse_rules(spec)
+
+class BucketStoreContract:
+    """Behaviour every store must share; subclasses provide make_store"""
+
+    def test_burst_then_limited(self):
+        store = self.make_store()
+        self.assertEqual([store.take("k", 3, 1.0, now=100.0) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(store.take("k", 3, 1.0, now=100.0), 1.0)
+
+    def test_refills_at_rate_up_to_capacity(self):
+        store = self.make_store()
+        for _ in range(2):
+            store.take("k", 2, 0.5, now=0.0)
+        self.assertAlmostEqual(store.take("k", 2, 0.5, now=1.0), 1.0)
+        self.assertEqual(store.take("k", 2, 0.5, now=2.0), 0)
+        # A long idle period refills to capacity, not beyond it
+        self.assertEqual([store.take("k", 2, 0.5, now=1000.0) for _ in range(2)], [0, 0])
+        self.assertGreater(store.take("k", 2, 0.5, now=1000.0), 0)
+
+    def test_keys_are_independent(self):
+        store = self.make_store()
+        store.take("a", 1, 0.1, now=0.0)
+        self.assertGreater(store.take("a", 1, 0.1, now=0.0), 0)
+        self.assertEqual(store.take("b", 1, 0.1, now=0.0), 0)
+
+    def test_stats_count_decisions(self):
+        store = self.make_store()
+        store.take("k", 1, 1.0, now=0.0)
+        store.take("k", 1, 1.0, now=0.0)
+        stats = store.get_stats()
+        self.assertEqual((stats["allowed"], stats["limited"]), (1, 1))
+
+class MemoryBucketStoreTest(BucketStoreContract, unittest.TestCase):
+    def make_store(self, max_keys=100):
+        return MemoryBucketStore(max_keys)
+
+    def test_least_recently_used_key_is_evicted(self):
+        store = self.make_store(max_keys=2)
+        store.take("a", 1, 0.01, now=0.0)
+        store.take("b", 1, 0.01, now=0.0)
+        store.take("a", 1, 0.01, now=0.0)
+        store.take("c", 1, 0.01, now=0.0)
+        self.assertEqual(store.get_stats()["evictions"], 1)
+        # a was used more recently than b, so it is still empty while b starts over full
+        self.assertGreater(store.take("a", 1, 0.01, now=0.0), 0)
+        self.assertEqual(store.take("b", 1, 0.01, now=0.0), 0)
+
+class SQLiteBucketStoreTest(BucketStoreContract, unittest.TestCase):
+    def make_store(self):
+        self.path = os.path.join(tempfile.mkdtemp(prefix="iceai-test-"), "limits.db")
+        return SQLiteBucketStore(self.path, max_idle=60)
+
+    def test_buckets_are_shared_between_stores(self):
+        # Two stores on one file stand in for two gunicorn workers
+        first = self.make_store()
+        second = SQLiteBucketStore(self.path, max_idle=60)
+        self.assertEqual(first.take("k", 2, 0.01, now=0.0), 0)
+        self.assertEqual(second.take("k", 2, 0.01, now=0.0), 0)
+        self.assertGreater(first.take("k", 2, 0.01, now=0.0), 0)
+
+    def test_idle_buckets_are_swept(self):
+        store = self.make_store()
+        store.take("idle", 1, 1.0, now=0.0)
+        for i in range(SQLiteBucketStore.SWEEP_EVERY):
+            store.take(f"busy{i}", 1, 1.0, now=1000.0)
+        rows = store._connection().execute("SELECT key FROM rate_buckets WHERE key = 'idle'").fetchall()
+        self.assertEqual(rows, [])
+
+    def test_store_errors_fail_open(self):
+        store = self.make_store()
+        store._connection().execute("DROP TABLE rate_buckets")
+        self.assertEqual(store.take("k", 1, 1.0, now=0.0), 0)
+        self.assertEqual(store.get_stats()["errors"], 1)
+
+class ClientIpTest(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.hops = Config.RATE_LIMIT_TRUSTED_PROXIES
+
+    def tearDown(self):
+        Config.RATE_LIMIT_TRUSTED_PROXIES = self.hops
+
+    def ip(self, forwarded=None, hops=0):
+        Config.RATE_LIMIT_TRUSTED_PROXIES = hops
+        headers = {"X-Forwarded-For": forwarded} if forwarded else {}
+        with self.app.test_request_context(headers=headers, environ_base={"REMOTE_ADDR": "10.0.0.1"}):
+            return client_ip()
+
+    def test_forwarded_header_ignored_without_trusted_proxies(self):
+        self.assertEqual(self.ip("203.0.113.9"), "10.0.0.1")
+
+    def test_trusted_hop_is_used_not_the_spoofable_first_entry(self):
+        self.assertEqual(self.ip("1.2.3.4, 203.0.113.9", hops=1), "203.0.113.9")
+        self.assertEqual(self.ip("1.2.3.4, 203.0.113.9, 10.1.1.1", hops=2), "203.0.113.9")
+
+    def test_short_header_falls_back_to_peer(self):
+        self.assertEqual(self.ip("203.0.113.9", hops=2), "10.0.0.1")
+
+if __name__ == "__main__":
+    unittest.main()
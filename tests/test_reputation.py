@@ -0,0 +1,85 @@
+"""Trigger-maintained seller_reputation against a full rebuild:
+
+    python -m pytest tests
+"""
+import math
+import random
+import sqlite3
+import unittest
+
+import migrations
+import reputation
+
+COLUMNS = ("seller_id", "vouch_count", "rating_sum", "volume", "decayed_score",
+           "decayed_volume", "bayes_rating", "last_vouch_at")
+
+def snapshot(conn):
+    return conn.execute(f"SELECT {', '.join(COLUMNS)} FROM seller_reputation ORDER BY seller_id").fetchall()
+
+class SellerReputationTest(unittest.TestCase):
+    def setUp(self):
+        # A plain connection, as the sqlite3 shell or a bot process would use
+        self.conn = sqlite3.connect(":memory:")
+        migrations.migrate(self.conn)
+        self.conn.isolation_level = None
+
+    def tearDown(self):
+        self.conn.close()
+
+    def vouch(self, author, seller, rating=5, price=10.0, created_at="2024-03-01 12:00:00"):
+        return self.conn.execute(
+            "INSERT INTO vouches (user_id, target_user_id, rating, price, created_at) VALUES (?, ?, ?, ?, ?)",
+            (author, seller, rating, price, created_at)).lastrowid
+
+    def assertMatchesRebuild(self):
+        incremental = snapshot(self.conn)
+        migrations.rebuild_seller_reputation(self.conn)
+        rebuilt = snapshot(self.conn)
+        self.assertEqual(len(incremental), len(rebuilt))
+        for got, want in zip(incremental, rebuilt):
+            self.assertEqual(got[:3] + got[7:], want[:3] + want[7:])
+            for a, b in zip(got[3:7], want[3:7]):
+                self.assertTrue(math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9), (got, want))
+
+    def test_weight_matches_python(self):
+        self.vouch("a", "s", rating=5, price=0, created_at="2024-05-30 00:00:00")
+        score = self.conn.execute("SELECT decayed_score FROM seller_reputation WHERE seller_id = 's'").fetchone()[0]
+        self.assertAlmostEqual(score, reputation.decay_weight("2024-05-30 00:00:00"))
+
+    def test_author_cap_and_self_vouches(self):
+        for _ in range(5):
+            self.vouch("a", "s", rating=1)
+        self.vouch("s", "s", rating=5)
+        count, rating_sum, bayes = self.conn.execute(
+            "SELECT vouch_count, rating_sum, bayes_rating FROM seller_reputation WHERE seller_id = 's'").fetchone()
+        self.assertEqual((count, rating_sum), (reputation.MAX_VOUCHES_PER_AUTHOR, 3))
+        self.assertAlmostEqual(bayes, (reputation.PRIOR_VOTES * reputation.PRIOR_RATING + 3) / 8)
+
+    def test_delete_promotes_next_vouch(self):
+        ids = [self.vouch("a", "s", rating=rating) for rating in (5, 5, 5, 1)]
+        self.conn.execute("DELETE FROM vouches WHERE id = ?", (ids[0],))
+        row = self.conn.execute("SELECT vouch_count, rating_sum FROM seller_reputation WHERE seller_id = 's'").fetchone()
+        self.assertEqual(row, (3, 11))
+
+    def test_delete_last_vouch_resets_totals(self):
+        vouch_id = self.vouch("a", "s", price=1e9, created_at="2030-01-01 00:00:00")
+        self.conn.execute("DELETE FROM vouches WHERE id = ?", (vouch_id,))
+        self.assertEqual(snapshot(self.conn), [("s", 0, 0, 0.0, 0.0, 0.0, reputation.PRIOR_RATING, None)])
+
+    def test_random_writes_match_rebuild(self):
+        rng = random.Random(23)
+        self.conn.execute("INSERT INTO r6_accounts (seller_id, title) VALUES ('quiet', 'No vouches yet')")
+        ids = []
+        for _ in range(400):
+            if ids and rng.random() < 0.3:
+                self.conn.execute("DELETE FROM vouches WHERE id = ?", (ids.pop(rng.randrange(len(ids))),))
+                continue
+            day = rng.randrange(0, 900)
+            ids.append(self.vouch(f"u{rng.randrange(6)}", f"u{rng.randrange(4)}", rating=rng.randint(1, 5),
+                                  price=rng.choice([None, 0, 12.5, 300]),
+                                  created_at="2024-01-01 00:00:00+00:00" if day == 0
+                                  else f"{2024 + day // 365}-{1 + day % 365 // 31:02d}-{1 + day % 28:02d} 10:00:00"))
+        self.assertMatchesRebuild()
+
+if __name__ == "__main__":
+    unittest.main()
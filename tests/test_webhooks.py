@@ -0,0 +1,103 @@
+"""SellHub webhook intake and batch processing:
+
+    python -m pytest tests
+"""
+import io
+import hmac
+import json
+import uuid
+import hashlib
+import unittest
+
+from support import make_app
+
+import webhooks
+from config import Config
+from database import open_connection
+
+def sign(body):
+    return "sha256=" + hmac.new(Config.SELLHUB_SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+def order_event(discord_id, event_id=None):
+    return {"id": event_id or uuid.uuid4().hex, "event": "order.completed", "data": {"discord_id": discord_id}}
+
+class WebhookTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = make_app().test_client()
+
+    def setUp(self):
+        self.conn = open_connection(Config.DATABASE_PATH)
+        self.conn.isolation_level = None
+
+    def tearDown(self):
+        self.conn.close()
+
+    def deliver(self, event, signature=None, headers=None):
+        body = json.dumps(event).encode()
+        headers = {Config.SELLHUB_SIGNATURE_HEADER: signature or sign(body), **(headers or {})}
+        return self.client.post("/webhooks/sellhub", data=body, headers=headers,
+                                content_type="application/json")
+
+    def drain(self):
+        """Apply pending events now; the background processor may race us, with the same outcome"""
+        processor = webhooks.get_processor()
+        while processor.process_batch(self.conn):
+            pass
+
+    def events_for(self, discord_id):
+        return self.conn.execute("SELECT status, result FROM webhook_events WHERE payload LIKE ? ORDER BY id",
+                                 (f'%"{discord_id}"%',)).fetchall()
+
+    def premium_days(self, discord_id):
+        row = self.conn.execute("SELECT julianday(premium_until) - julianday('now') FROM users WHERE id = ?",
+                                (discord_id,)).fetchone()
+        return None if row is None else round(row[0])
+
+    def test_bad_signature_is_rejected(self):
+        discord_id = uuid.uuid4().hex
+        response = self.deliver(order_event(discord_id), signature="sha256=" + "0" * 64)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.events_for(discord_id), [])
+
+    def test_missing_signature_is_rejected(self):
+        body = json.dumps(order_event("nobody")).encode()
+        response = self.client.post("/webhooks/sellhub", data=body, content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_oversized_chunked_body_is_rejected(self):
+        body = b"x" * (Config.WEBHOOK_MAX_BYTES + 1)
+        response = self.client.post("/webhooks/sellhub", input_stream=io.BytesIO(body),
+                                    headers={"Transfer-Encoding": "chunked", Config.SELLHUB_SIGNATURE_HEADER: sign(body)},
+                                    environ_overrides={"wsgi.input_terminated": True})
+        self.assertEqual(response.status_code, 413)
+
+    def test_replay_with_new_idempotency_key_applies_once(self):
+        discord_id = uuid.uuid4().hex
+        event = order_event(discord_id)
+        for key in ("first", "second", "third"):
+            self.assertEqual(self.deliver(event, headers={"Idempotency-Key": f"{key}-{discord_id}"}).status_code, 200)
+        self.drain()
+        self.assertEqual([tuple(row) for row in self.events_for(discord_id)], [("processed", "premium_granted")])
+        self.assertEqual(self.premium_days(discord_id), Config.SELLHUB_PREMIUM_DAYS)
+
+    def test_failing_event_does_not_undo_its_batch(self):
+        good, bad, other = (uuid.uuid4().hex for _ in range(3))
+        events = [order_event(good),
+                  {"id": uuid.uuid4().hex, "event": "order.completed", "data": {"listing_id": "abc", "tag": bad}},
+                  order_event(other)]
+        # One transaction, so all three are pending together and land in one batch
+        self.conn.execute("BEGIN")
+        for event in events:
+            self.conn.execute(webhooks.INSERT_EVENT_SQL, (webhooks.idempotency_key("sellhub", {}, event),
+                                                          "sellhub", event["event"], json.dumps(event)))
+        self.conn.execute("COMMIT")
+        self.drain()
+        self.assertEqual(self.events_for(good)[0]["status"], "processed")
+        self.assertEqual(self.events_for(bad)[0]["status"], "failed")
+        self.assertEqual(self.events_for(other)[0]["status"], "processed")
+        self.assertEqual(self.premium_days(good), Config.SELLHUB_PREMIUM_DAYS)
+        self.assertEqual(self.premium_days(other), Config.SELLHUB_PREMIUM_DAYS)
+
+if __name__ == "__main__":
+    unittest.main()
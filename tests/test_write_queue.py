@@ -0,0 +1,73 @@
+"""Write-behind group commit:
+
+    python -m pytest tests
+"""
+import os
+import time
+import sqlite3
+import tempfile
+import unittest
+
+import migrations
+from write_queue import WriteBehindQueue
+
+INSERT = "INSERT INTO vouches (user_id, target_user_id, rating) VALUES (?, ?, ?)"
+
+class WriteBehindQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(prefix="iceai-test-"), "queue.db")
+        self.conn = sqlite3.connect(self.path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        migrations.migrate(self.conn)
+        self.writer = WriteBehindQueue(self.path, maxsize=100, max_batch=50, max_linger=0.05, put_timeout=1)
+
+    def tearDown(self):
+        self.writer.close(timeout=5)
+        self.conn.close()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM vouches").fetchone()[0]
+
+    def test_inserts_are_group_committed(self):
+        futures = [self.writer.submit(INSERT, (f"author{i}", "seller", 5)) for i in range(40)]
+        rowids = [future.result(timeout=5) for future in futures]
+        self.assertEqual(len(set(rowids)), 40)
+        self.assertEqual(self.count(), 40)
+        stats = self.writer.get_stats()
+        self.assertEqual(stats["committed"], 40)
+        self.assertLess(stats["batches"], 40)
+
+    def test_failing_row_does_not_fail_its_batch(self):
+        good = self.writer.submit(INSERT, ("a", "seller", 5))
+        bad = self.writer.submit(INSERT, ("b", "seller", 9))
+        overflow = self.writer.submit(INSERT, ("c", "seller", 2 ** 70))
+        after = self.writer.submit(INSERT, ("d", "seller", 4))
+        self.assertIsInstance(good.result(timeout=5), int)
+        self.assertIsInstance(after.result(timeout=5), int)
+        with self.assertRaises(sqlite3.IntegrityError):
+            bad.result(timeout=5)
+        with self.assertRaises(OverflowError):
+            overflow.result(timeout=5)
+        self.assertEqual([row[0] for row in self.conn.execute("SELECT user_id FROM vouches ORDER BY id")], ["a", "d"])
+
+    def test_cancelled_insert_never_runs(self):
+        # Hold the write lock so the batch waits in BEGIN IMMEDIATE with its futures unclaimed
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            kept = self.writer.submit(INSERT, ("kept", "seller", 5))
+            dropped = self.writer.submit(INSERT, ("dropped", "seller", 5))
+            time.sleep(0.2)
+            self.assertTrue(dropped.cancel())
+        finally:
+            self.conn.execute("COMMIT")
+        kept.result(timeout=5)
+        self.assertEqual([row[0] for row in self.conn.execute("SELECT user_id FROM vouches")], ["kept"])
+
+    def test_close_flushes_queued_inserts(self):
+        futures = [self.writer.submit(INSERT, (f"author{i}", "seller", 3)) for i in range(10)]
+        self.writer.close(timeout=5)
+        self.assertTrue(all(future.done() for future in futures))
+        self.assertEqual(self.count(), 10)
+
+if __name__ == "__main__":
+    unittest.main()
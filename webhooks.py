@@ -1 +1,249 @@
-# SellHub and social media webhooks
\ No newline at end of file
+# SellHub and social media webhooks
+import os
+import hmac
+import json
+import hashlib
+import sqlite3
+import logging
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from flask import jsonify
+
+from config import Config
+from database import open_connection
+from cache import listings_cache
+from services import execute_insert
+from write_queue import WriteQueueFull
+
+logger = logging.getLogger(__name__)
+
+INSERT_EVENT_SQL = """INSERT INTO webhook_events (idempotency_key, source, event_type, payload)
+                      VALUES (?, ?, ?, ?) ON CONFLICT (idempotency_key) DO NOTHING"""
+
+class WebhookEventError(ValueError):
+    """Raised by a handler for an event it cannot apply; the event is marked failed"""
+
+def verify_signature(secret, body, signature):
+    """Check a hex HMAC-SHA256 of the raw body in constant time ("sha256=" prefix optional)"""
+    if not secret or not signature:
+        return False
+    if signature.startswith("sha256="):
+        signature = signature[len("sha256="):]
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.strip().lower())
+
+def read_limited(stream, limit):
+    """Read a request body of at most limit bytes, or None if it is longer"""
+    chunks, size = [], 0
+    while size <= limit:
+        chunk = stream.read(limit + 1 - size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    return b"".join(chunks) if size <= limit else None
+
+def idempotency_key(source, headers, event):
+    """Prefer the signed event id, so retries of one event collapse to one row
+
+    The Idempotency-Key header is not covered by the signature, so it is only
+    a fallback: otherwise a replayed body with a fresh header would apply twice.
+    """
+    key = event.get("id") or headers.get("Idempotency-Key")
+    if not key:
+        key = hashlib.sha256(json.dumps(event, sort_keys=True).encode()).hexdigest()
+    return f"{source}:{key}"
+
+def _custom_fields(data):
+    fields = data.get("custom_fields") or {}
+    return fields if isinstance(fields, dict) else {}
+
+def _handle_order(conn, data):
+    """A paid order either sells a marketplace listing or grants premium to a Discord user"""
+    fields = _custom_fields(data)
+    listing_id = fields.get("listing_id") or data.get("listing_id")
+    discord_id = fields.get("discord_id") or data.get("discord_id")
+
+    if listing_id is not None:
+        try:
+            listing_id = int(listing_id)
+        except (TypeError, ValueError):
+            raise WebhookEventError(f"Invalid listing_id: {listing_id!r}")
+        cursor = conn.execute("UPDATE r6_accounts SET status = 'sold' WHERE id = ? AND status = 'available'",
+                              (listing_id,))
+        if cursor.rowcount == 0:
+            logger.warning(f"Order for listing {listing_id} which is missing or not available")
+        return "listing_sold"
+
+    if discord_id:
+        try:
+            days = int(data.get("premium_days") or Config.SELLHUB_PREMIUM_DAYS)
+        except (TypeError, ValueError):
+            raise WebhookEventError("Invalid premium_days")
+        # Extends from the current expiry when still active, else from now
+        conn.execute("""INSERT INTO users (id, premium_until) VALUES (?, datetime('now', ?))
+                        ON CONFLICT (id) DO UPDATE SET premium_until =
+                          datetime(MAX(COALESCE(premium_until, datetime('now')), datetime('now')), ?)""",
+                     (str(discord_id), f"+{days} days", f"+{days} days"))
+        return "premium_granted"
+
+    raise WebhookEventError("Order has neither listing_id nor discord_id")
+
+def _handle_refund(conn, data):
+    """A refunded listing sale puts the listing back on the market"""
+    listing_id = _custom_fields(data).get("listing_id") or data.get("listing_id")
+    if listing_id is None:
+        return "ignored"
+    try:
+        listing_id = int(listing_id)
+    except (TypeError, ValueError):
+        raise WebhookEventError(f"Invalid listing_id: {listing_id!r}")
+    conn.execute("UPDATE r6_accounts SET status = 'available' WHERE id = ? AND status = 'sold'", (listing_id,))
+    return "listing_relisted"
+
+# SellHub event type -> handler(conn, data) returning a short outcome label
+EVENT_HANDLERS = {
+    "order.completed": _handle_order,
+    "order.paid": _handle_order,
+    "order.refunded": _handle_refund,
+}
+
+class WebhookProcessor:
+    """Background thread applying pending webhook events in grouped transactions
+
+    Each batch is claimed and applied inside one IMMEDIATE transaction, so with
+    a processor in every worker an event is still applied exactly once. Every
+    event runs in a savepoint: a failing event is marked failed without
+    undoing the rest of its batch.
+    """
+
+    def __init__(self, path, batch_size, poll_interval):
+        self.path = path
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.pid = os.getpid()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {"processed": 0, "failed": 0, "ignored": 0, "batches": 0}
+        self._thread = threading.Thread(target=self._run, name="webhook-processor", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """Wake the processor for newly acknowledged events"""
+        self._wakeup.set()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def process_batch(self, conn):
+        """Apply up to batch_size pending events; returns how many were handled"""
+        # Cheap read first so idle polls never take the write lock
+        if conn.execute("SELECT 1 FROM webhook_events WHERE status = 'pending' LIMIT 1").fetchone() is None:
+            return 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("""SELECT id, event_type, payload FROM webhook_events
+                                   WHERE status = 'pending' ORDER BY id LIMIT ?""",
+                                (self.batch_size,)).fetchall()
+            outcomes = []
+            for row in rows:
+                handler = EVENT_HANDLERS.get(row["event_type"])
+                if handler is None:
+                    outcomes.append(("ignored", None, row["id"]))
+                    continue
+                conn.execute("SAVEPOINT event")
+                try:
+                    data = json.loads(row["payload"]).get("data") or {}
+                    outcome = handler(conn, data if isinstance(data, dict) else {})
+                    conn.execute("RELEASE event")
+                    outcomes.append(("processed", outcome, row["id"]))
+                except Exception as e:
+                    # Any bad payload (e.g. a listing_id too large to bind) fails only its event
+                    conn.execute("ROLLBACK TO event")
+                    conn.execute("RELEASE event")
+                    outcomes.append(("failed", (str(e) or type(e).__name__)[:500], row["id"]))
+            conn.executemany("""UPDATE webhook_events SET status = ?, result = ?, processed_at = CURRENT_TIMESTAMP
+                                WHERE id = ?""", outcomes)
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+        if rows:
+            self._count("batches")
+            for status, _, _ in outcomes:
+                self._count(status)
+            if any(status == "processed" and result.startswith("listing_") for status, result, _ in outcomes):
+                listings_cache.clear()
+        return len(rows)
+
+    def _run(self):
+        conn = None
+        try:
+            while True:
+                try:
+                    if conn is None:
+                        conn = open_connection(self.path)
+                        conn.isolation_level = None
+                    # Keep draining while full batches come back
+                    while self.process_batch(conn) == self.batch_size:
+                        pass
+                except Exception as e:
+                    # Keep the thread alive; the batch is retried on the next poll
+                    logger.exception(f"Webhook batch failed: {e}")
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+_processor = None
+_processor_lock = threading.Lock()
+
+def get_processor():
+    """Get (starting if needed) this process's webhook processor"""
+    global _processor
+    pid = os.getpid()
+    if _processor is None or _processor.pid != pid:
+        with _processor_lock:
+            if _processor is None or _processor.pid != pid:
+                _processor = WebhookProcessor(Config.DATABASE_PATH, Config.WEBHOOK_BATCH_SIZE,
+                                              Config.WEBHOOK_POLL_INTERVAL)
+    return _processor
+
+def running_processor():
+    """This process's webhook processor if one has been started, else None"""
+    processor = _processor
+    return processor if processor is not None and processor.pid == os.getpid() else None
+
+def receive_sellhub(headers, body):
+    """Verify, record and acknowledge a SellHub delivery; processing happens later"""
+    if not verify_signature(Config.SELLHUB_SECRET, body, headers.get(Config.SELLHUB_SIGNATURE_HEADER)):
+        return jsonify({"error": "Invalid signature"}), 401
+    try:
+        event = json.loads(body)
+        if not isinstance(event, dict):
+            raise ValueError("not an object")
+    except ValueError:
+        return jsonify({"error": "Invalid JSON payload"}), 400
+
+    event_type = event.get("event") or event.get("type") or "unknown"
+    try:
+        execute_insert(INSERT_EVENT_SQL, (idempotency_key("sellhub", headers, event), "sellhub",
+                                          str(event_type), body.decode("utf-8", "replace")))
+    except (WriteQueueFull, FutureTimeoutError):
+        # SellHub retries non-2xx deliveries, so shedding load here loses nothing
+        return jsonify({"error": "Server busy"}), 503
+    except sqlite3.Error as e:
+        logger.error(f"Database error recording webhook: {e}")
+        return jsonify({"error": "Database error"}), 500
+
+    get_processor().notify()
+    return jsonify({"received": True})
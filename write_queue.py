@@ -0,0 +1,178 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from concurrent.futures import Future
+
+from config import Config
+from database import open_connection
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class WriteQueueFull(Exception):
+    """Raised when the write-behind queue stays full past the put timeout"""
+
+def _claim(future):
+    """Mark a queued future running; False if its caller cancelled it (or it already resolved)"""
+    if future.running():
+        return True
+    if future.done():
+        return False
+    return future.set_running_or_notify_cancel()
+
+class WriteBehindQueue:
+    """Single writer thread that group-commits queued inserts
+
+    Each submitted statement gets a Future resolving to its lastrowid. Batches
+    are committed in one transaction once max_batch items are queued or the
+    oldest has waited max_linger seconds; each statement runs in a savepoint so
+    one failing row does not fail its batch. A caller that gives up waiting can
+    cancel its future while it is still queued, and the statement never runs.
+    """
+
+    def __init__(self, path, maxsize, max_batch, max_linger, put_timeout):
+        self.path = path
+        self.max_batch = max_batch
+        self.max_linger = max_linger
+        self.put_timeout = put_timeout
+        self.pid = os.getpid()
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "committed": 0, "failed": 0, "batches": 0, "rejected": 0}
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql, params):
+        """Queue an insert, blocking up to put_timeout when the queue is full"""
+        future = Future()
+        try:
+            self._queue.put((sql, params, future), timeout=self.put_timeout)
+        except queue.Full:
+            self._count("rejected")
+            raise WriteQueueFull("Write queue is full")
+        self._count("submitted")
+        return future
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _collect(self):
+        """Block for the first item, then gather more until the batch or linger limit"""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_linger
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _commit(self, conn, batch):
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql, params, future in batch:
+                if not _claim(future):
+                    continue
+                conn.execute("SAVEPOINT item")
+                try:
+                    cursor = conn.execute(sql, params)
+                    conn.execute("RELEASE item")
+                    results.append((future, cursor.lastrowid, None))
+                except Exception as e:
+                    # Bad parameters (e.g. an int too big to bind) fail only their own row
+                    conn.execute("ROLLBACK TO item")
+                    conn.execute("RELEASE item")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"Write-behind batch of {len(batch)} failed: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Nothing was committed: fail every caller, including those not reached yet
+            results = [(future, None, e) for _, _, future in batch if _claim(future)]
+
+        self._count("batches")
+        for future, rowid, error in results:
+            if error is None:
+                self._count("committed")
+                future.set_result(rowid)
+            else:
+                self._count("failed")
+                future.set_exception(error)
+
+    def _run(self):
+        conn = None
+        try:
+            while True:
+                batch, stopping = self._collect()
+                if batch:
+                    try:
+                        if conn is None:
+                            conn = open_connection(self.path)
+                            conn.isolation_level = None
+                        self._commit(conn, batch)
+                    except Exception as e:
+                        # Keep the writer alive; every queued insert depends on it
+                        logger.exception(f"Write-behind writer error: {e}")
+                        for _, _, future in batch:
+                            if _claim(future):
+                                self._count("failed")
+                                future.set_exception(e)
+                if stopping:
+                    break
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def close(self, timeout=None):
+        """Flush everything queued so far and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+def get_write_queue():
+    """Get the write-behind queue for the current process, or None when disabled"""
+    global _write_queue
+    if not Config.WRITE_BEHIND:
+        return None
+    pid = os.getpid()
+    if _write_queue is None or _write_queue.pid != pid:
+        with _write_queue_lock:
+            if _write_queue is None or _write_queue.pid != pid:
+                _write_queue = WriteBehindQueue(Config.DATABASE_PATH, Config.WRITE_QUEUE_SIZE,
+                                                Config.WRITE_BATCH_SIZE, Config.WRITE_LINGER_MS / 1000,
+                                                Config.WRITE_QUEUE_PUT_TIMEOUT)
+    return _write_queue
+
+def running_write_queue():
+    """This process's write-behind queue if one has been started, else None"""
+    writer = _write_queue
+    return writer if writer is not None and writer.pid == os.getpid() else None
+
+@atexit.register
+def shutdown_write_queue():
+    """Flush pending writes at interpreter shutdown"""
+    if _write_queue is not None and _write_queue.pid == os.getpid():
+        _write_queue.close(timeout=Config.WRITE_QUEUE_PUT_TIMEOUT + 5)